@@ -18,31 +18,48 @@ from kivy.uix.spinner import Spinner, SpinnerOption
 from kivy.uix.popup import Popup
 from kivy.uix.scrollview import ScrollView
 from kivy.clock import Clock
-from kivy.graphics import Color, RoundedRectangle, Rectangle, Line
+from kivy.graphics import Color, RoundedRectangle, Rectangle, Line, InstructionGroup
 from kivy.core.window import Window
 from kivymd.app import MDApp
-from kivymd.uix.snackbar import Snackbar
-from kivymd.uix.button import MDIconButton
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 # --- IMPORTS FROM UTILS ---
 from utils.database import MobileDatabase
+from utils.db_worker import DatabaseWorker
+from utils.office_cache import OfficeCache
+from utils.outbox import Outbox
+from utils.startup import StartupPipeline
+from utils.session import SessionStore
 from utils.wifi_detector import WiFiDetector
 from utils.notifications import NotificationManager
-from kivymd.uix.button import MDFillRoundFlatIconButton
+from utils.realtime import QueueFeed, advance_position, create_transport
+from utils.poll_scheduler import PollScheduler
+from utils.metrics import metrics
+from utils.eta import WaitTimeModel, format_eta
 from kivy.core.text import LabelBase
 
 load_dotenv()
 
+logger = logging.getLogger('qserveu')
+
 # Force Window Size (Mobile Ratio)
 Window.size = (360, 640)
 Window.clearcolor = (0.96, 0.97, 0.98, 1)
 
 
-LabelBase.register(name="Poppins",
-                   fn_regular="Poppins-Regular.ttf",
-                   fn_bold="Poppins-Bold.ttf")
+def show_snackbar(text):
+    # kivymd's snackbar module is heavy and never needed before the first tap: load it on first use
+    from kivymd.uix.snackbar import Snackbar
+    Snackbar(text=text).open()
+
+
+def register_fonts():
+    LabelBase.register(name="Poppins",
+                       fn_regular="Poppins-Regular.ttf",
+                       fn_bold="Poppins-Bold.ttf")
 
 # 2. Define your theme color (from previous chat)
 THEME_COLOR = (10/255, 135/255, 84/255, 1)
@@ -57,17 +74,20 @@ class RoundedButton(Button):
         self.background_color = (0, 0, 0, 0)
         self.custom_bg_color = bg_color
         self.radius = radius
+        # Instructions are created once; update_rect only mutates them
+        with self.canvas.before:
+            self.rect_color = Color(*bg_color)
+            self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=radius)
         self.bind(pos=self.update_rect, size=self.update_rect, state=self.update_rect)
 
     def update_rect(self, *args):
-        self.canvas.before.clear()
-        with self.canvas.before:
-            if self.state == 'down':
-                r, g, b, a = self.custom_bg_color
-                Color(r * 0.8, g * 0.8, b * 0.8, a)
-            else:
-                Color(*self.custom_bg_color)
-            RoundedRectangle(pos=self.pos, size=self.size, radius=self.radius)
+        self.bg_rect.pos = self.pos
+        self.bg_rect.size = self.size
+        if self.state == 'down':
+            r, g, b, a = self.custom_bg_color
+            self.rect_color.rgba = (r * 0.8, g * 0.8, b * 0.8, a)
+        else:
+            self.rect_color.rgba = self.custom_bg_color
 
 class CustomSpinnerOption(SpinnerOption):
     """Styles the dropdown list items"""
@@ -96,17 +116,19 @@ class RoundedSpinner(Spinner):
         self.background_down = ''
         self.background_color = (0, 0, 0, 0)
         self.custom_bg_color = bg_color
+        with self.canvas.before:
+            self.rect_color = Color(*bg_color)
+            self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[9])
         self.bind(pos=self.update_rect, size=self.update_rect, state=self.update_rect)
 
     def update_rect(self, *args):
-        self.canvas.before.clear()
-        with self.canvas.before:
-            if self.state == 'down':
-                r, g, b, a = self.custom_bg_color
-                Color(r * 0.8, g * 0.8, b * 0.8, a)
-            else:
-                Color(*self.custom_bg_color)
-            RoundedRectangle(pos=self.pos, size=self.size, radius=[9])
+        self.bg_rect.pos = self.pos
+        self.bg_rect.size = self.size
+        if self.state == 'down':
+            r, g, b, a = self.custom_bg_color
+            self.rect_color.rgba = (r * 0.8, g * 0.8, b * 0.8, a)
+        else:
+            self.rect_color.rgba = self.custom_bg_color
 
 class RoundedInput(TextInput):
     def __init__(self, **kwargs):
@@ -121,6 +143,18 @@ class RoundedInput(TextInput):
         self.foreground_color = (0, 0, 0, 1)
         self.hint_text_color = (0.5, 0.5, 0.5, 1)
         self.padding = [20, 15, 20, 15]
+
+        # Built once and placed *under* TextInput's own canvas.before rules,
+        # so its cursor and text colour instructions keep working
+        self.bg_group = InstructionGroup()
+        self.fill_color = Color(1, 1, 1, 1)
+        self.fill_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[25])
+        self.border_color = Color(0.6, 0.6, 0.6, 1)
+        self.border_line = Line(rounded_rectangle=(self.x, self.y, self.width, self.height, 25), width=1)
+        for instruction in (self.fill_color, self.fill_rect, self.border_color, self.border_line):
+            self.bg_group.add(instruction)
+        self.canvas.before.insert(0, self.bg_group)
+
         self.bind(pos=self.update_graphics, size=self.update_graphics, focus=self.on_focus)
         Clock.schedule_once(self.update_graphics)
 
@@ -128,16 +162,15 @@ class RoundedInput(TextInput):
         self.update_graphics()
 
     def update_graphics(self, *args):
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(1, 1, 1, 1)
-            RoundedRectangle(pos=self.pos, size=self.size, radius=[25])
-            if self.focus:
-                Color(*THEME_COLOR)
-                Line(rounded_rectangle=(self.x, self.y, self.width, self.height, 25), width=1.3)
-            else:
-                Color(0.6, 0.6, 0.6, 1)
-                Line(rounded_rectangle=(self.x, self.y, self.width, self.height, 25), width=1)
+        self.fill_rect.pos = self.pos
+        self.fill_rect.size = self.size
+        self.border_line.rounded_rectangle = (self.x, self.y, self.width, self.height, 25)
+        if self.focus:
+            self.border_color.rgba = THEME_COLOR
+            self.border_line.width = 1.3
+        else:
+            self.border_color.rgba = (0.6, 0.6, 0.6, 1)
+            self.border_line.width = 1
 
 # ==================== BASE SCREEN ====================
 
@@ -153,6 +186,49 @@ class BaseScreen(Screen):
         self.bg_rect.size = self.size
         self.bg_rect.pos = self.pos
 
+class MetricsOverlay(Label):
+    """Debug overlay (QSERVEU_METRICS_OVERLAY=1): fps and the slowest traced operations"""
+
+    def __init__(self, **kwargs):
+        super().__init__(font_size='9sp', color=(0, 0, 0, 0.85), halign='left', valign='top',
+                         size_hint=(None, None), **kwargs)
+        self.bind(size=lambda *args: setattr(self, 'text_size', self.size))
+        Window.bind(size=self.fit)
+        self.fit(Window, Window.size)
+        Clock.schedule_interval(self.refresh, 1)
+
+    def fit(self, window, size):
+        self.size = size
+        self.pos = (4, -4)
+
+    def refresh(self, dt):
+        self.text = '\n'.join([f"fps {Clock.get_fps():.0f}"] + metrics.summary_lines())
+
+# ==================== SCREEN MANAGER ====================
+
+class LazyScreenManager(ScreenManager):
+    """Builds each registered screen the first time it is navigated to"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = {}
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def ensure_screen(self, name):
+        factory = self.factories.pop(name, None)
+        if factory is not None:
+            self.add_widget(factory())
+
+    def get_screen(self, name):
+        self.ensure_screen(name)
+        return super().get_screen(name)
+
+    def on_current(self, instance, value):
+        self.ensure_screen(value)
+        super().on_current(instance, value)
+
 # ==================== SCREENS ====================
 
 class LoadingScreen(Screen):
@@ -177,30 +253,31 @@ class LoadingScreen(Screen):
         )
         self.add_widget(logo)
 
-        Clock.schedule_once(lambda dt: setattr(self.manager, 'current', 'login'), 3.3)
-
     # 3. This function ensures the background stretches when the window changes
     def update_bg(self, *args):
         self.bg_rect.size = self.size
         self.bg_rect.pos = self.pos
 
-        # 3. Loading Time set to 4 seconds
-        # You can change '4' to any number of seconds you want
-        Clock.schedule_once(lambda dt: setattr(self.manager, 'current', 'login'), 3)
+    def finish(self, target='login'):
+        """Called by the startup pipeline once warm-up is done"""
+        if self.manager and self.manager.current == self.name:
+            self.manager.current = target
 
 
 class LoginScreen(BaseScreen):
-    def __init__(self, db, **kwargs):
+    def __init__(self, worker, **kwargs):
         super().__init__(**kwargs)
         self.name = 'login'
-        self.db = db
+        self.worker = worker
+        self.busy_event = None
+        self.busy_dots = 0
         layout = BoxLayout(orientation='vertical', padding=30, spacing=20)
         logo = Label(font_name='Poppins', text='QServeU', font_size='42sp', color=(0.2, 0.7, 0.4, 1), bold=True, size_hint=(1, 0.15))
         subtitle = Label(font_name='Poppins',text='Student Portal', font_size='16sp', color=(0.5, 0.5, 0.5, 1), size_hint=(1, 0.05))
         self.student_num = RoundedInput(hint_text='Email / Student ID', multiline=False, size_hint=(1, None), height=55)
         self.password = RoundedInput(hint_text='Password', password=True, multiline=False, size_hint=(1, None), height=55)
-        login_btn = RoundedButton(text='LOGIN', size_hint=(1, None), height=60, bold=True, bg_color=(0.2, 0.7, 0.4, 1))
-        login_btn.bind(on_press=self.do_login)
+        self.login_btn = RoundedButton(text='LOGIN', size_hint=(1, None), height=60, bold=True, bg_color=(0.2, 0.7, 0.4, 1))
+        self.login_btn.bind(on_press=self.do_login)
         register_btn = Button(text='Register Here', size_hint=(1, None), height=45, background_normal='',
                               background_color=(0, 0, 0, 0), color=(0.2, 0.7, 0.4, 1))
         register_btn.bind(on_press=lambda x: setattr(self.manager, 'current', 'register'))
@@ -211,7 +288,7 @@ class LoginScreen(BaseScreen):
         layout.add_widget(self.student_num)
         layout.add_widget(self.password)
         layout.add_widget(Label(size_hint=(1, 0.05)))
-        layout.add_widget(login_btn)
+        layout.add_widget(self.login_btn)
         layout.add_widget(register_btn)
         layout.add_widget(Label(size_hint=(1, 0.15)))
         self.add_widget(layout)
@@ -220,23 +297,55 @@ class LoginScreen(BaseScreen):
         identifier = self.student_num.text.strip()
         password = self.password.text
         if not identifier or not password:
-            Snackbar(text="Please fill all fields").open()
+            show_snackbar("Please fill all fields")
             return
-        result = self.db.login_student(identifier, password)
+        # Runs in the background; disable the button so a slow network can't queue double logins
+        self.set_busy(True)
+        self.worker.submit('login_student', identifier, password,
+                           on_result=self.on_login_result, on_error=self.on_login_error, tag=self.name)
+
+    def set_busy(self, busy):
+        """Animated 'SIGNING IN...' label while the lookup and bcrypt check run off-thread"""
+        self.login_btn.disabled = busy
+        if self.busy_event:
+            self.busy_event.cancel()
+            self.busy_event = None
+        if busy:
+            self.busy_dots = 0
+            self.login_btn.text = 'SIGNING IN'
+            self.busy_event = Clock.schedule_interval(self.animate_busy, 0.3)
+        else:
+            self.login_btn.text = 'LOGIN'
+
+    def animate_busy(self, dt):
+        self.busy_dots = (self.busy_dots + 1) % 4
+        self.login_btn.text = 'SIGNING IN' + '.' * self.busy_dots
+
+    def on_login_result(self, result):
+        self.set_busy(False)
         if result['success']:
             app = App.get_running_app()
             app.current_student = result['student']
-            Snackbar(text="Login successful!").open()
+            app.session.save(result['student'], selected_office=app.selected_office)
+            show_snackbar("Login successful!")
             self.manager.current = 'choose_office'
         else:
-            Snackbar(text=result['message']).open()
+            show_snackbar(result['message'])
+
+    def on_login_error(self, error):
+        self.set_busy(False)
+        show_snackbar("Login error")
+
+    def on_leave(self):
+        self.worker.cancel(self.name)
+        self.set_busy(False)
 
 
 class RegisterScreen(BaseScreen):
-    def __init__(self, db, **kwargs):
+    def __init__(self, worker, **kwargs):
         super().__init__(**kwargs)
         self.name = 'register'
-        self.db = db
+        self.worker = worker
         scroll = ScrollView()
         layout = BoxLayout(orientation='vertical', padding=30, spacing=15, size_hint_y=None)
         layout.bind(minimum_height=layout.setter('height'))
@@ -272,8 +381,8 @@ class RegisterScreen(BaseScreen):
 
         # --- BUTTONS ---
         # 3. ADDED font_size='15sp' TO REGISTER BUTTON
-        register_btn = RoundedButton(text='REGISTER', size_hint=(1, None), height=60, bold=True, font_size='12sp')
-        register_btn.bind(on_press=self.do_register)
+        self.register_btn = RoundedButton(text='REGISTER', size_hint=(1, None), height=60, bold=True, font_size='12sp')
+        self.register_btn.bind(on_press=self.do_register)
 
         # 4. ADDED font_size='15sp' TO BACK BUTTON
         back_btn = Button(text='Back to Login', size_hint=(1, None), height=45, background_normal='',
@@ -282,7 +391,7 @@ class RegisterScreen(BaseScreen):
 
         widgets = [title, self.student_num, self.fullname, self.email, self.course,
                    self.year, self.password, self.confirm,
-                   Label(size_hint=(1, None), height=20), register_btn, back_btn,
+                   Label(size_hint=(1, None), height=20), self.register_btn, back_btn,
                    Label(size_hint=(1, None), height=40)]
 
         for w in widgets:
@@ -294,19 +403,19 @@ class RegisterScreen(BaseScreen):
     def do_register(self, instance):
         # 1. Validation
         if not all([self.fullname.text, self.student_num.text, self.password.text, self.email.text]):
-            Snackbar(text="Fill all required fields").open()
+            show_snackbar("Fill all required fields")
             return
 
         if "@" not in self.email.text or "." not in self.email.text:
-            Snackbar(text="Invalid Email Address").open()
+            show_snackbar("Invalid Email Address")
             return
 
         if self.course.text == 'Select Course' or self.year.text == 'Select Year Level':
-            Snackbar(text="Please select course and year").open()
+            show_snackbar("Please select course and year")
             return
 
         if self.password.text != self.confirm.text:
-            Snackbar(text="Passwords don't match").open()
+            show_snackbar("Passwords don't match")
             return
 
         # 2. Data Preparation
@@ -319,21 +428,35 @@ class RegisterScreen(BaseScreen):
             'year_level': self.year.text
         }
 
-        # 3. Send to DB
-        result = self.db.register_student(student_data)
+        # 3. Send to DB (in the background)
+        self.register_btn.disabled = True
+        # Writes are untagged: leaving the screen must not cancel them
+        self.worker.submit('register_student', student_data,
+                           on_result=self.on_register_result, on_error=self.on_register_error)
 
+    def on_register_result(self, result):
+        self.register_btn.disabled = False
         if result['success']:
-            Snackbar(text="Registration successful! Please login.").open()
-            self.manager.current = 'login'
+            show_snackbar("Registration successful! Please login.")
+            if self.manager.current == self.name:
+                self.manager.current = 'login'
         else:
-            Snackbar(text=result['message']).open()
+            show_snackbar(result['message'])
+
+    def on_register_error(self, error):
+        self.register_btn.disabled = False
+        show_snackbar("Registration failed")
+
+    def on_leave(self):
+        self.worker.cancel(self.name)
+        self.register_btn.disabled = False
 
 
 class ChooseOfficeScreen(BaseScreen):
-    def __init__(self, db, **kwargs):
+    def __init__(self, worker, **kwargs):
         super().__init__(**kwargs)
         self.name = 'choose_office'
-        self.db = db
+        self.worker = worker
         layout = BoxLayout(orientation='vertical', padding=25, spacing=25)
         header = Label(font_name='Poppins', text='Choose Office', font_size='28sp', color=(0.2, 0.7, 0.4, 1),
                       bold=True, size_hint=(1, 0.15))
@@ -344,8 +467,25 @@ class ChooseOfficeScreen(BaseScreen):
         self.add_widget(layout)
 
     def on_enter(self):
+        cache = self.worker.db.office_cache
+        if cache is not None and cache.is_warm():
+            # Render the device copy instantly, then revalidate in the background
+            self.show_offices(cache.get_all())
+            self.worker.submit('refresh_offices', on_result=self.on_offices_refreshed, tag=self.name)
+            return
+        self.office_container.clear_widgets()
+        self.office_container.add_widget(Label(font_name='Poppins', text="Loading offices...", color=(0.5, 0.5, 0.5, 1)))
+        self.worker.submit('get_offices', on_result=self.show_offices, tag=self.name)
+
+    def on_offices_refreshed(self, changed):
+        if changed:
+            self.show_offices(self.worker.db.office_cache.get_all())
+
+    def on_leave(self):
+        self.worker.cancel(self.name)
+
+    def show_offices(self, offices):
         self.office_container.clear_widgets()
-        offices = self.db.get_offices()
         if not offices:
              self.office_container.add_widget(Label(font_name='Poppins', text="No offices found", color=(0,0,0,1)))
              return
@@ -361,17 +501,17 @@ class ChooseOfficeScreen(BaseScreen):
         app.selected_office = office
         if 'queue_prefix' not in app.selected_office:
              app.selected_office['queue_prefix'] = office['name'][0].upper()
+        app.session.update(selected_office=app.selected_office)
         self.manager.current = 'home'
 
 
 class HomeScreen(BaseScreen):
-    def __init__(self, db, wifi, notifier, **kwargs):
+    def __init__(self, worker, wifi, notifier, **kwargs):
         super().__init__(**kwargs)
         self.name = 'home'
-        self.db = db
+        self.worker = worker
         self.wifi = wifi
         self.notifier = notifier
-        self.wifi_check_event = None
         layout = BoxLayout(orientation='vertical')
 
         # --- Top Panel ---
@@ -387,6 +527,7 @@ class HomeScreen(BaseScreen):
         top_panel.bind(size=update_top, pos=update_top)
 
         # --- Header Row (Home Icon/Text + Status) ---
+        from kivymd.uix.button import MDIconButton
         header_row = BoxLayout(size_hint=(1, 0.5), orientation='horizontal')
 
         # 1. Left Side: Home Icon + Text
@@ -468,14 +609,14 @@ class HomeScreen(BaseScreen):
 
         # --- Middle & Bottom Sections (Unchanged) ---
         middle = BoxLayout(orientation='vertical', size_hint=(1, 0.6), padding=25, spacing=20)
-        request_btn = RoundedButton(text='REQUEST QUEUE', size_hint=(1, None), height=65,
+        self.request_btn = RoundedButton(text='REQUEST QUEUE', size_hint=(1, None), height=65,
                                    bg_color=(0.2, 0.7, 0.4, 1), bold=True, font_size='18sp')
-        request_btn.bind(on_press=self.request_queue)
+        self.request_btn.bind(on_press=self.request_queue)
         update_btn = RoundedButton(text='UPDATE CREDENTIALS', size_hint=(1, None), height=65,
                                   bg_color=(0.3, 0.6, 0.8, 1), bold=True, font_size='17sp')
         update_btn.bind(on_press=lambda x: setattr(self.manager, 'current', 'update_credentials'))
         middle.add_widget(Label(size_hint=(1, 0.3)))
-        middle.add_widget(request_btn)
+        middle.add_widget(self.request_btn)
         middle.add_widget(update_btn)
         middle.add_widget(Label(size_hint=(1, 0.3)))
         bottom_nav = self.create_bottom_nav(home_active=True)
@@ -495,6 +636,8 @@ class HomeScreen(BaseScreen):
                 Color(1, 1, 1, 1)
                 Rectangle(size=instance.size, pos=instance.pos)
         bottom_nav.bind(size=update_nav_bg, pos=update_nav_bg)
+        from kivymd.uix.button import MDIconButton
+
         def create_nav_btn(icon, active, callback):
             container = AnchorLayout(size_hint_x=1)
             color = (0.2, 0.7, 0.4, 1) if active else (0.6, 0.6, 0.6, 1)
@@ -514,48 +657,65 @@ class HomeScreen(BaseScreen):
         if hasattr(app, 'selected_office') and app.selected_office:
             prefix = app.selected_office.get('queue_prefix', 'Q')
             self.office_label.text = prefix
-            if self.wifi_check_event: self.wifi_check_event.cancel()
+            # The monitor pushes SSID changes; the cached value paints the icon right away
             self.check_wifi()
-            self.wifi_check_event = Clock.schedule_interval(self.check_wifi, 2)
+            self.wifi.subscribe(self.check_wifi)
 
     def on_leave(self):
-        if self.wifi_check_event:
-            self.wifi_check_event.cancel()
+        self.wifi.unsubscribe(self.check_wifi)
+        self.worker.cancel(self.name)
+        self.request_btn.disabled = False
 
-    def check_wifi(self, dt=None):
+    @metrics.trace('ui.check_wifi')
+    def check_wifi(self, current_ssid=None):
         app = App.get_running_app()
         if hasattr(app, 'selected_office') and app.selected_office:
             ssid = app.selected_office.get('ssid', '')
-            status = self.wifi.get_connection_status(ssid)
+            status = self.wifi.get_connection_status(ssid, current_ssid)
             connected = status['connected']
             self.wifi_label.icon = "wifi" if connected else "wifi-off"
             self.wifi_label.text_color = (1, 1, 1, 1) if connected else (1, 1, 1, 0.5)
             self.office_label.color = (1, 1, 1, 1) if connected else (1, 1, 1, 0.5)
 
+    @metrics.trace('ui.request_queue')
     def request_queue(self, instance):
         app = App.get_running_app()
         if not hasattr(app, 'selected_office') or not app.selected_office:
-            Snackbar(text="Please select an office first").open()
+            show_snackbar("Please select an office first")
             return
         ssid = app.selected_office.get('ssid', '')
         status = self.wifi.get_connection_status(ssid)
         if not status['connected']:
-             Snackbar(text=f"Please connect to {ssid}").open()
+             show_snackbar(f"Please connect to {ssid}")
              return
-        result = self.db.create_queue(
+        self.request_btn.disabled = True
+        self.worker.submit(
+            'create_queue',
             app.current_student['id'],
             app.selected_office['id'],
-            "General Transaction"
+            "General Transaction",
+            on_result=self.on_queue_created,
+            on_error=self.on_queue_error
         )
+
+    def on_queue_created(self, result):
+        self.request_btn.disabled = False
+        app = App.get_running_app()
         if result['success']:
             app.current_queue = result['queue']
+            app.session.update(queue_created_at=time.time())
             self.notifier.send_notification(
                 "Queue Created",
                 f"Your queue number: {result['queue']['queue_number']}"
             )
-            self.show_success_popup(result['queue']['queue_number'], result['queue']['people_ahead'])
+            if self.manager.current == self.name:
+                self.show_success_popup(result['queue']['queue_number'], result['queue']['people_ahead'])
         else:
-            Snackbar(text=result['message']).open()
+            show_snackbar(result['message'])
+
+    def on_queue_error(self, error):
+        self.request_btn.disabled = False
+        show_snackbar("Could not request a queue")
 
     def show_success_popup(self, queue_number, people_ahead):
         content = BoxLayout(orientation='vertical', padding=20, spacing=15)
@@ -604,6 +764,7 @@ class HomeScreen(BaseScreen):
             popup.dismiss()
             app = App.get_running_app()
             app.current_student = None
+            app.session.clear()
             self.manager.current = 'login'
         yes_btn.bind(on_press=confirm_logout)
         no_btn.bind(on_press=popup.dismiss)
@@ -618,13 +779,145 @@ class HomeScreen(BaseScreen):
 
 
 
+class QueueCard(BoxLayout):
+    """Active queue view: widgets are built once and only the changed properties are patched"""
+
+    GREEN = (0.2, 0.7, 0.4, 1)
+    RED = (0.8, 0.2, 0.2, 1)
+    GREY = (0.5, 0.5, 0.5, 1)
+
+    def __init__(self, on_cancel, on_request_new, **kwargs):
+        super().__init__(orientation='vertical', spacing=10, **kwargs)
+        self.on_cancel = on_cancel
+        self.on_request_new = on_request_new
+        self.queue = None
+        self.view = None
+
+        self.title_label = Label(font_name='Poppins', text='', font_size='32sp', bold=True,
+                                 size_hint=(1, 0.4), halign='center')
+        self.info_label = Label(font_name='Poppins', text='', font_size='18sp', color=(0.5, 0.5, 0.5, 1),
+                                size_hint=(1, 0.3))
+        self.office_label = Label(font_name='Poppins', text='', font_size='16sp', color=(0.3, 0.3, 0.3, 1))
+        self.spacer = Label(size_hint=(1, 0.1))
+        self.action_button = RoundedButton(text='', size_hint=(1, None), height=50)
+        self.action_button.bind(on_press=self.on_action)
+
+        self.add_widget(self.title_label)
+        self.add_widget(self.info_label)
+        self.add_widget(self.office_label)
+
+    @classmethod
+    def build_view(cls, queue):
+        """Everything the card shows, as a comparable tuple: (title, color, info, office, action)"""
+        q_num = queue.get('queue_number', '---')
+        status = queue.get('status', 'waiting')
+
+        # Default Colors
+        color = cls.GREEN
+        top_text = f'Your Queue\n{q_num}'
+        info_text = f"{queue.get('people_ahead', 0)} People Ahead"
+        eta_text = format_eta(queue.get('eta'))
+        if eta_text:
+            info_text += f"\n{eta_text}"
+        action = None
+
+        # 1. HANDLE SERVING
+        if status == 'serving':
+            top_text = f'NOW SERVING\n{q_num}'
+            color = cls.RED
+            info_text = "Please proceed to counter"
+
+        # 2. HANDLE WAITING (Cancel Button)
+        elif status == 'waiting':
+            action = 'cancel'
+
+        # 3. HANDLE CANCELLED (Request New Queue Button)
+        elif status == 'cancelled':
+            top_text = f'CANCELLED\n{q_num}'
+            color = cls.GREY
+            info_text = f"Reason: {queue.get('notes', 'Cancelled by staff')}"
+            action = 'request'
+
+        # Handle Office Name
+        office_data = queue.get('offices')
+        office_name_str = "Office"
+        if isinstance(office_data, dict):
+            office_name_str = office_data.get('name', 'Office')
+
+        return top_text, color, info_text, f"Office: {office_name_str}", action
+
+    def update(self, queue):
+        self.queue = queue
+        view = self.build_view(queue)
+        if view == self.view:
+            return
+        old = self.view or (None,) * 5
+        self.view = view
+        top_text, color, info_text, office_text, action = view
+
+        if top_text != old[0]:
+            self.title_label.text = top_text
+        if color != old[1]:
+            self.title_label.color = color
+        if info_text != old[2]:
+            self.info_label.text = info_text
+        if office_text != old[3]:
+            self.office_label.text = office_text
+        if action != old[4]:
+            self.show_action(action)
+
+    def show_action(self, action):
+        if action is None:
+            self.remove_widget(self.spacer)
+            self.remove_widget(self.action_button)
+            return
+
+        if action == 'cancel':
+            self.action_button.text = "CANCEL QUEUE"
+            self.action_button.bold = True
+            self.action_button.custom_bg_color = (0.9, 0.3, 0.3, 1)  # Red color
+        else:
+            self.action_button.text = "REQUEST NEW QUEUE"
+            self.action_button.bold = False
+            self.action_button.custom_bg_color = self.GREEN
+        self.action_button.update_rect()
+
+        if self.action_button.parent is None:
+            self.add_widget(self.spacer)
+            self.add_widget(self.action_button)
+
+    def on_action(self, instance):
+        if self.view[4] == 'cancel':
+            self.on_cancel(self.queue['id'])
+        else:
+            self.on_request_new()
+
+
 class QueueStatusScreen(BaseScreen):
-    def __init__(self, db, **kwargs):
+    # What queue_box is showing. While RATING the form is left alone and polling is suspended
+    # until the student submits or skips.
+    VIEW_EMPTY = 'empty'
+    VIEW_ACTIVE = 'active'
+    VIEW_RATING = 'rating'
+    # Rated / skipped queue ids kept in the saved session (only the latest completed queue is ever asked)
+    RATED_MEMORY = 20
+
+    def __init__(self, worker, **kwargs):
         super().__init__(**kwargs)
         self.name = 'queue_status'
-        self.db = db
+        self.worker = worker
         self.current_rating = 0
         self.unrated_queue = None
+        self.view_state = None
+        self.load_request = None
+        self.last_state = None
+
+        # Push updates from Supabase Realtime; polling is only the degraded fallback,
+        # paced by queue position
+        self.poller = PollScheduler(self.auto_refresh)
+        transport = create_transport()
+        self.feed = QueueFeed(transport, on_change=self.on_queue_pushed, on_line=self.on_line_pushed,
+                              on_status=self.on_feed_status) if transport else None
 
         layout = BoxLayout(orientation='vertical')
         top_panel = BoxLayout(orientation='vertical', size_hint=(1, 0.15), padding=10)
@@ -644,7 +937,13 @@ class QueueStatusScreen(BaseScreen):
         middle = BoxLayout(orientation='vertical', size_hint=(1, 0.7), padding=20, spacing=15)
         self.queue_box = BoxLayout(orientation='vertical', spacing=10)
 
+        # Views reused across refreshes instead of being rebuilt every tick
+        self.queue_card = QueueCard(on_cancel=self.confirm_cancel,
+                                    on_request_new=lambda: setattr(self.manager, 'current', 'home'))
+        self.empty_label = Label(text='No Active Queue', font_size='18sp', color=(0.6, 0.6, 0.6, 1))
+
         # Refresh button (initially added, but can be swapped)
+        from kivymd.uix.button import MDFillRoundFlatIconButton
         self.refresh_btn = MDFillRoundFlatIconButton(
             text="REFRESH",
             icon="refresh",  # This pulls the real icon from Material Design
@@ -667,7 +966,6 @@ class QueueStatusScreen(BaseScreen):
         layout.add_widget(middle)
         layout.add_widget(bottom_nav)
         self.add_widget(layout)
-        Clock.schedule_interval(self.auto_refresh, 3)
 
     def create_bottom_nav(self, queue_active=False):
         bottom_nav = BoxLayout(size_hint=(1, 0.15), padding=0, spacing=0)
@@ -680,6 +978,8 @@ class QueueStatusScreen(BaseScreen):
                 Color(1, 1, 1, 1)
                 Rectangle(size=instance.size, pos=instance.pos)
         bottom_nav.bind(size=update_nav_bg, pos=update_nav_bg)
+        from kivymd.uix.button import MDIconButton
+
         def create_nav_btn(icon, active, callback):
             container = AnchorLayout(size_hint_x=1)
             color = (0.2, 0.7, 0.4, 1) if active else (0.6, 0.6, 0.6, 1)
@@ -715,6 +1015,7 @@ class QueueStatusScreen(BaseScreen):
             popup.dismiss()
             app = App.get_running_app()
             app.current_student = None
+            app.session.clear()
             self.manager.current = 'login'
         yes_btn.bind(on_press=confirm_logout)
         no_btn.bind(on_press=popup.dismiss)
@@ -728,32 +1029,149 @@ class QueueStatusScreen(BaseScreen):
         popup.open()
 
     def on_enter(self):
-        self.load_queue()
+        app = App.get_running_app()
+        self.last_state = None
+        if self.feed and app.current_student:
+            self.feed.watch_student(app.current_student['id'])
+        self.poller.resume()
+
+    def on_leave(self):
+        # The feed stays subscribed so pushes still drive notifications off-screen
+        self.worker.cancel(self.name)
+        self.load_request = None
+        self.poller.pause()
+
+    def on_app_pause(self):
+        """App went to the background: no polling until it comes back"""
+        self.poller.pause()
 
-    def auto_refresh(self, dt):
-        if self.manager.current == 'queue_status':
+    def on_app_resume(self):
+        if self.manager and self.manager.current == self.name:
+            self.poller.resume()
+
+    # ---------------- PUSH / FALLBACK POLLING ----------------
+
+    def on_queue_pushed(self, record):
+        app = App.get_running_app()
+        if not app.current_student:
+            self.feed.stop()
+            return
+        self.load_queue(force=True)
+
+    def on_line_pushed(self, previous, summary):
+        """The office's line moved: work out the new position locally, re-read only when that can't be done"""
+        app = App.get_running_app()
+        if not app.current_student:
+            self.feed.stop()
+            return
+        active_queue, unrated = self.last_state or (None, None)
+        # A fetch still in flight may predate this push
+        queue = advance_position(active_queue, previous, summary) if self.load_request is None else None
+        if queue is None:
+            self.load_queue(force=True)
+            return
+        if queue is active_queue:
+            return
+        model = self.worker.db.wait_model
+        eta = model.estimate(queue['office_id'], queue['people_ahead']) if model else None
+        if eta:
+            queue['eta'] = eta
+        self.last_state = (queue, unrated)
+        self.render_queue_state(self.last_state)
+
+    def on_feed_status(self, connected):
+        logger.info("Realtime %s", 'connected' if connected else 'disconnected')
+        if connected:
+            self.poller.cancel()
+            # Catch anything that changed while we were offline
             self.load_queue()
+        else:
+            self.schedule_poll(changed=True)
+
+    def schedule_poll(self, changed=False):
+        """Arm the next fallback poll from the last known queue; only runs when push is unavailable"""
+        if self.feed and self.feed.connected:
+            self.poller.cancel()
+            return
+        if not self.manager or self.manager.current != self.name:
+            return
+        if self.view_state == self.VIEW_RATING:
+            # Nothing to watch until the form is submitted or skipped
+            self.poller.cancel()
+            return
+        active_queue = self.last_state[0] if self.last_state else None
+        self.poller.schedule(active_queue, changed=changed)
+
+    def auto_refresh(self):
+        if self.manager and self.manager.current == self.name:
+            self.load_queue()
+
+    def fetch_queue_state(self, student_id, fresh=False):
+        """Runs on the DB worker: active queue and pending feedback in one round trip"""
+        if fresh:
+            # A pushed change or our own write: skip anything the response cache still holds
+            self.worker.db.forget_queue_state(student_id)
+        dashboard = self.worker.db.get_student_dashboard(student_id)
+        return self.worker.db.estimate_wait(dashboard['active']), dashboard['unrated']
 
-    def load_queue(self):
+    @metrics.trace('ui.load_queue')
+    def load_queue(self, force=False):
         # 1. Check for Active Queue first
         app = App.get_running_app()
         if not app.current_student: return
 
-        # DEBUG PRINT: Verify this runs every 3 seconds in PyCharm console
-        print("DEBUG: Checking database for updates...")
+        # A slow response must not stack up another fetch behind it.
+        # After our own writes (force=True) the in-flight answer is stale, so drop it instead.
+        if self.load_request is not None:
+            if not force:
+                return
+            self.load_request.cancel()
 
-        active_queue = self.db.get_student_queue(app.current_student['id'])
+        self.load_request = self.worker.submit(
+            self.fetch_queue_state,
+            app.current_student['id'],
+            fresh=force,
+            on_result=self.apply_queue_state,
+            on_error=self.on_load_error,
+            tag=self.name
+        )
+
+    def on_load_error(self, error):
+        self.load_request = None
+        logger.warning("Error loading queue: %s", error)
+        self.schedule_poll()
+
+    @metrics.trace('ui.apply_queue_state')
+    def apply_queue_state(self, state):
+        self.load_request = None
+        app = App.get_running_app()
+        if not app.current_student: return
+
+        # Nothing changed since the last fetch: leave notifications and widgets alone
+        changed = state != self.last_state
+        self.last_state = state
+        if changed:
+            self.render_queue_state(state)
+        self.schedule_poll(changed=changed)
+
+    def render_queue_state(self, state):
+        app = App.get_running_app()
+        active_queue, unrated = state
+        if unrated and unrated.get('id') in self.rated_queue_ids():
+            unrated = None
+
+        if self.feed:
+            waiting = active_queue and active_queue.get('status') == 'waiting'
+            self.feed.watch_office(active_queue['office_id'] if waiting else None)
 
         # --- NEW CODE START ---
         if hasattr(app, 'notifications'):
             app.notifications.update_status(active_queue)
         # --- NEW CODE END ---
 
-        self.queue_box.clear_widgets()
-
         # If there is an active queue, show it
         if active_queue:
-            print(f"DEBUG: Found Queue! People Ahead: {active_queue.get('people_ahead')}")
+            self.view_state = self.VIEW_ACTIVE
             self.refresh_btn.disabled = False
             self.refresh_btn.opacity = 1
             self.show_active_queue_ui(active_queue)
@@ -762,10 +1180,13 @@ class QueueStatusScreen(BaseScreen):
         # ... (rest of the function stays the same)
 
         # 2. If no active queue, check for Unrated Completed Queue
-        unrated = self.db.get_pending_feedback(app.current_student['id'])
-
         if unrated:
+            if self.view_state == self.VIEW_RATING and self.unrated_queue['id'] == unrated['id']:
+                # Form already up for this queue: keep the stars and the comment being typed
+                return
+            self.view_state = self.VIEW_RATING
             self.unrated_queue = unrated
+            self.queue_box.clear_widgets()
             self.show_rating_ui(unrated)
             # Hide refresh button during rating
             self.refresh_btn.disabled = True
@@ -773,82 +1194,22 @@ class QueueStatusScreen(BaseScreen):
             return
 
         # 3. Default: No Active Queue
+        self.view_state = self.VIEW_EMPTY
         self.refresh_btn.disabled = False
         self.refresh_btn.opacity = 1
-        self.queue_box.add_widget(Label(text='No Active Queue', font_size='18sp', color=(0.6, 0.6, 0.6, 1)))
-
-    def show_active_queue_ui(self, queue):
-        q_num = queue.get('queue_number', '---')
-        status = queue.get('status', 'waiting')
+        self.show_view(self.empty_label)
 
-        # Default Colors
-        color = (0.2, 0.7, 0.4, 1)  # Green
-        top_text = f'Your Queue\n{q_num}'
-
-        # Safe count
-        count = queue.get('people_ahead', 0)
-        info_text = f'{count} People Ahead'
-
-        # Special Button Container
-        action_button = None
-
-        # 1. HANDLE SERVING
-        if status == 'serving':
-            top_text = f'NOW SERVING\n{q_num}'
-            color = (0.8, 0.2, 0.2, 1)  # Red
-            info_text = "Please proceed to counter"
-
-        # 2. HANDLE WAITING (Add Cancel Button Here)
-        elif status == 'waiting':
-            # Create a Red Cancel Button
-            action_button = RoundedButton(
-                text="CANCEL QUEUE",
-                size_hint=(1, None),
-                height=50,
-                bg_color=(0.9, 0.3, 0.3, 1),  # Red color
-                bold=True
-            )
-            # Bind to a confirmation popup function
-            action_button.bind(on_press=lambda x: self.confirm_cancel(queue['id']))
-
-        # 3. HANDLE CANCELLED
-        elif status == 'cancelled':
-            top_text = f'CANCELLED\n{q_num}'
-            color = (0.5, 0.5, 0.5, 1)  # Grey
-            reason = queue.get('notes', 'Cancelled by staff')
-            info_text = f"Reason: {reason}"
-
-            # Button to request new queue
-            action_button = RoundedButton(
-                text="REQUEST NEW QUEUE",
-                size_hint=(1, None),
-                height=50,
-                bg_color=(0.2, 0.7, 0.4, 1)
-            )
-            action_button.bind(on_press=lambda x: setattr(self.manager, 'current', 'home'))
-
-        # Display Logic
-        your_queue = Label(font_name='Poppins', text=top_text, font_size='32sp', color=color, bold=True,
-                           size_hint=(1, 0.4), halign='center')
-        people_ahead = Label(font_name='Poppins', text=info_text, font_size='18sp', color=(0.5, 0.5, 0.5, 1),
-                             size_hint=(1, 0.3))
-
-        # Handle Office Name
-        office_data = queue.get('offices')
-        office_name_str = "Office"
-        if isinstance(office_data, dict):
-            office_name_str = office_data.get('name', 'Office')
-        office_name = Label(font_name='Poppins', text=f"Office: {office_name_str}", font_size='16sp',
-                            color=(0.3, 0.3, 0.3, 1))
-
-        self.queue_box.add_widget(your_queue)
-        self.queue_box.add_widget(people_ahead)
-        self.queue_box.add_widget(office_name)
+    def show_view(self, *widgets):
+        """Swap queue_box content only when a different view is needed"""
+        if self.queue_box.children[::-1] == list(widgets):
+            return
+        self.queue_box.clear_widgets()
+        for widget in widgets:
+            self.queue_box.add_widget(widget)
 
-        # Add the Action button if it exists
-        if action_button:
-            self.queue_box.add_widget(Label(size_hint=(1, 0.1)))  # Spacer
-            self.queue_box.add_widget(action_button)
+    def show_active_queue_ui(self, queue):
+        self.show_view(self.queue_card)
+        self.queue_card.update(queue)
 
     def show_rating_ui(self, queue):
         """Display the Star Rating Interface"""
@@ -860,6 +1221,7 @@ class QueueStatusScreen(BaseScreen):
                        font_size='16sp', color=(0.4, 0.4, 0.4, 1), halign='center', size_hint=(1, 0.15))
 
         # Stars Container
+        from kivymd.uix.button import MDIconButton
         stars_box = BoxLayout(size_hint=(1, 0.15), spacing=10, padding=[40, 0, 40, 0])
         self.star_buttons = []
         for i in range(1, 6):
@@ -874,6 +1236,9 @@ class QueueStatusScreen(BaseScreen):
         # Submit Button
         submit_btn = RoundedButton(text="SUBMIT FEEDBACK", size_hint=(1, None), height=55, bg_color=(0.2, 0.7, 0.4, 1), bold=True)
         submit_btn.bind(on_press=self.submit_rating)
+        skip_btn = RoundedButton(text="Skip", size_hint=(1, None), height=45, bg_color=(0.9, 0.9, 0.9, 1))
+        skip_btn.color = (0.4, 0.4, 0.4, 1)
+        skip_btn.bind(on_press=lambda x: self.finish_rating())
 
         self.queue_box.add_widget(lbl_title)
         self.queue_box.add_widget(lbl_sub)
@@ -882,6 +1247,7 @@ class QueueStatusScreen(BaseScreen):
         self.queue_box.add_widget(self.comment_input)
         self.queue_box.add_widget(Label(size_hint=(1, 0.05)))
         self.queue_box.add_widget(submit_btn)
+        self.queue_box.add_widget(skip_btn)
 
     def set_rating(self, rating):
         self.current_rating = rating
@@ -896,23 +1262,48 @@ class QueueStatusScreen(BaseScreen):
 
     def submit_rating(self, instance):
         if self.current_rating == 0:
-            Snackbar(text="Please select a star rating").open()
+            show_snackbar("Please select a star rating")
             return
 
         app = App.get_running_app()
-        result = self.db.submit_feedback(
+        self.worker.submit(
+            'submit_feedback',
             office_id=self.unrated_queue['office_id'],
             student_id=app.current_student['id'],
             queue_id=self.unrated_queue['id'],
             rating=self.current_rating,
-            comment=self.comment_input.text
+            comment=self.comment_input.text,
+            on_result=self.on_feedback_result
         )
 
-        if result['success']:
-            Snackbar(text="Thank you for your feedback!").open()
-            self.load_queue() # Refresh to clear rating screen
+    def on_feedback_result(self, result):
+        if result.get('queued'):
+            show_snackbar(result['message'])
+            self.finish_rating()
+        elif result['success']:
+            show_snackbar("Thank you for your feedback!")
+            self.finish_rating() # Refresh to clear rating screen
         else:
-            Snackbar(text="Error submitting feedback").open()
+            # Form stays as it is so the student can retry
+            show_snackbar("Error submitting feedback")
+
+    def rated_queue_ids(self):
+        """Ratings submitted, saved to the offline outbox or skipped; don't ask for them again"""
+        session = App.get_running_app().session.data or {}
+        return session.get('rated_queue_ids', [])
+
+    def remember_rated(self, queue_id):
+        # In the session file, so a relaunch doesn't ask again for a rating already given
+        rated = [i for i in self.rated_queue_ids() if i != queue_id] + [queue_id]
+        App.get_running_app().session.update(rated_queue_ids=rated[-self.RATED_MEMORY:])
+
+    def finish_rating(self):
+        """Leave the rating state (submitted or skipped) and resume normal refreshing"""
+        if self.unrated_queue:
+            self.remember_rated(self.unrated_queue['id'])
+        self.view_state = None
+        self.last_state = None
+        self.load_queue(force=True)
 
     def confirm_cancel(self, queue_id):
         """Show a popup to confirm cancellation"""
@@ -970,13 +1361,17 @@ class QueueStatusScreen(BaseScreen):
         popup.dismiss()
         app = App.get_running_app()
 
-        result = self.db.cancel_student_queue(queue_id, app.current_student['id'])
+        self.worker.submit('cancel_student_queue', queue_id, app.current_student['id'],
+                           on_result=self.on_cancel_result)
 
-        if result['success']:
-            Snackbar(text="Queue cancelled").open()
-            self.load_queue()  # Refresh UI to show "Cancelled" state
+    def on_cancel_result(self, result):
+        if result.get('queued'):
+            show_snackbar(result['message'])
+        elif result['success']:
+            show_snackbar("Queue cancelled")
+            self.load_queue(force=True)  # Refresh UI to show "Cancelled" state
         else:
-            Snackbar(text=result['message']).open()
+            show_snackbar(result['message'])
 
 
 class UpdateCredentialsScreen(BaseScreen):
@@ -1004,15 +1399,15 @@ class UpdateCredentialsScreen(BaseScreen):
 
         self.password = RoundedInput(hint_text='New Password', password=True, size_hint=(1, None), height=55)
 
-        update_btn = RoundedButton(text='UPDATE', size_hint=(1, None), height=60, bold=True)
-        update_btn.bind(on_press=self.do_update)
+        self.update_btn = RoundedButton(text='UPDATE', size_hint=(1, None), height=60, bold=True)
+        self.update_btn.bind(on_press=self.do_update)
 
         back_btn = Button(text='Back', size_hint=(1, None), height=45, background_normal='',
                          background_color=(0,0,0,0), color=(0.4, 0.4, 0.4, 1))
         back_btn.bind(on_press=lambda x: setattr(self.manager, 'current', 'home'))
 
         for widget in [title, self.student_num, self.fullname, self.course, self.year, self.password,
-                      Label(size_hint=(1, None), height=20), update_btn, back_btn,
+                      Label(size_hint=(1, None), height=20), self.update_btn, back_btn,
                       Label(size_hint=(1, None), height=40)]:
             layout.add_widget(widget)
 
@@ -1037,17 +1432,40 @@ class UpdateCredentialsScreen(BaseScreen):
         new_pass = self.password.text
 
         if not new_name or new_course == 'Select Course' or new_year == 'Select Year Level':
-            Snackbar(text="All fields are required").open()
+            show_snackbar("All fields are required")
             return
 
-        result = app.db.update_student(app.current_student['student_id'], new_name, new_year, new_pass)
+        self.update_btn.disabled = True
+        app.worker.submit('update_student', app.current_student['student_id'], new_name, new_year, new_pass,
+                          on_result=self.on_update_result, on_error=self.on_update_error)
 
-        if result['success']:
+    def on_update_result(self, result):
+        self.update_btn.disabled = False
+        app = App.get_running_app()
+        if result.get('queued'):
+            # Saved to the outbox: show the new profile now, the server copy follows on sync
+            updates = {k: v for k, v in result['updates'].items() if k != 'password_hash'}
+            app.current_student = dict(app.current_student, **updates)
+            app.session.save(app.current_student)
+            show_snackbar(result['message'])
+        elif result['success']:
             app.current_student = result['student']
-            Snackbar(text="Credentials updated successfully!").open()
-            self.manager.current = 'home'
+            app.session.save(result['student'])
+            show_snackbar("Credentials updated successfully!")
         else:
-            Snackbar(text=result['message']).open()
+            show_snackbar(result['message'])
+            return
+        if self.manager.current == self.name:
+            self.manager.current = 'home'
+
+    def on_update_error(self, error):
+        self.update_btn.disabled = False
+        show_snackbar("Update failed")
+
+    def on_leave(self):
+        app = App.get_running_app()
+        app.worker.cancel(self.name)
+        self.update_btn.disabled = False
 
 
 class QServeUApp(MDApp):
@@ -1057,27 +1475,153 @@ class QServeUApp(MDApp):
         self.theme_cls.theme_style = "Light"
         self.theme_cls.primary_palette = "Green"
 
-        sm = ScreenManager(transition=FadeTransition(duration=0.2))
+        sm = LazyScreenManager(transition=FadeTransition(duration=0.2))
 
-        # Initialize Real Utilities
-        self.db = MobileDatabase()
+        # Initialize Real Utilities (network / disk / OS work happens in the startup pipeline)
+        self.startup = StartupPipeline()
+        self.startup.run_inline('fonts', register_fonts)
+
+        self.office_cache = OfficeCache(os.path.join(self.user_data_dir, 'offices.json'))
+        self.outbox = Outbox(os.path.join(self.user_data_dir, 'outbox.db'))
+        self.wait_model = WaitTimeModel(os.path.join(self.user_data_dir, 'wait_model.json'))
+        self.db = MobileDatabase(office_cache=self.office_cache, outbox=self.outbox,
+                                 wait_model=self.wait_model, connect=False)
+        self.worker = DatabaseWorker(self.db)
         self.wifi = WiFiDetector()
         self.notifications = NotificationManager()
+        self.session = SessionStore(self.user_data_dir)
 
         self.current_student = None
         self.selected_office = None
         self.current_queue = None
+        self.flushing_outbox = False
 
+        # Only the splash is built now; the rest are built on first navigation
         sm.add_widget(LoadingScreen())
-        sm.add_widget(LoginScreen(self.db))
-        sm.add_widget(RegisterScreen(self.db))
-        sm.add_widget(ChooseOfficeScreen(self.db))
-        sm.add_widget(HomeScreen(self.db, self.wifi, self.notifications))
-        sm.add_widget(QueueStatusScreen(self.db))
-        sm.add_widget(UpdateCredentialsScreen())
+        sm.register('login', lambda: LoginScreen(self.worker))
+        sm.register('register', lambda: RegisterScreen(self.worker))
+        sm.register('choose_office', lambda: ChooseOfficeScreen(self.worker))
+        sm.register('home', lambda: HomeScreen(self.worker, self.wifi, self.notifications))
+        sm.register('queue_status', lambda: QueueStatusScreen(self.worker))
+        sm.register('update_credentials', lambda: UpdateCredentialsScreen())
+
+        # Splash stays up exactly as long as the warm-up takes
+        self.startup.add('supabase', self.db.connect)
+        self.startup.add('office_cache', self.office_cache.load)
+        self.startup.add('wait_model', self.wait_model.load)
+        self.startup.add('wifi_probe', self.wifi.select_provider)
+        self.startup.add('session', self.session.load)
+        self.startup.run(self.on_startup_done)
 
         return sm
 
+    def on_startup_done(self, pipeline):
+        if os.getenv('QSERVEU_METRICS_OVERLAY'):
+            Window.add_widget(MetricsOverlay())
+        # Offline writes go out when WiFi comes back (see flush_outbox), with a slow timer as a safety net
+        Clock.schedule_interval(self.flush_outbox, 30)
+        self.flush_outbox()
+        self.root.get_screen('loading').finish(self.resume_session(pipeline.results.get('session')))
+        # Revalidate the office list after the splash; the device copy serves until then
+        self.worker.submit('refresh_offices', on_result=self.on_offices_refreshed)
+
+    def on_offices_refreshed(self, changed):
+        if changed and self.root.current == 'choose_office':
+            self.root.get_screen('choose_office').on_offices_refreshed(changed)
+
+    def resume_session(self, session):
+        """Restore a saved login without any auth round trip; returns the screen to open"""
+        if not session:
+            return 'login'
+
+        self.current_student = session['student']
+        self.selected_office = session.get('selected_office')
+        # The profile is re-checked in the background; the UI doesn't wait for it
+        self.worker.submit('get_student_profile', self.current_student['id'],
+                           on_result=self.on_profile_revalidated, on_error=self.on_profile_error)
+
+        if time.time() - session.get('queue_created_at', 0) < 24 * 3600:
+            return 'queue_status'
+        return 'home' if self.selected_office else 'choose_office'
+
+    def on_profile_revalidated(self, student):
+        if not self.current_student:
+            return
+        if student is None:
+            # Account removed or id changed: the saved session is no longer valid
+            self.current_student = None
+            self.session.clear()
+            self.root.current = 'login'
+            show_snackbar("Please sign in again")
+            return
+        if student['id'] == self.current_student['id']:
+            self.current_student = dict(self.current_student, **student)
+            self.session.save(self.current_student)
+
+    def on_profile_error(self, error):
+        # Offline: keep the cached profile, it gets re-checked on the next launch
+        logger.warning("Profile revalidation error: %s", error)
+
+    def on_ssid_changed(self, ssid):
+        if ssid:
+            self.flush_outbox()
+
+    def flush_outbox(self, dt=None):
+        # Even the SQLite count runs on the worker; an empty outbox costs no network call
+        if self.flushing_outbox:
+            return
+        self.flushing_outbox = True
+        self.worker.submit('flush_outbox', on_result=self.on_outbox_flushed, on_error=self.on_outbox_error)
+
+    def on_outbox_error(self, error):
+        self.flushing_outbox = False
+        logger.warning("Outbox error: %s", error)
+
+    def on_outbox_flushed(self, summary):
+        self.flushing_outbox = False
+        if summary['student'] and self.current_student and \
+                summary['student'].get('student_id') == self.current_student.get('student_id'):
+            self.current_student = summary['student']
+        if summary['rejected_cancels']:
+            show_snackbar("Your queue could not be cancelled (already serving)")
+        elif summary['sent']:
+            show_snackbar("Offline changes synced")
+        if summary['sent'] and self.root.current == 'queue_status':
+            self.root.get_screen('queue_status').load_queue(force=True)
+        # Only keep the WiFi monitor busy for the outbox while there is something to send
+        if summary['pending']:
+            self.wifi.subscribe(self.on_ssid_changed)
+        else:
+            self.wifi.unsubscribe(self.on_ssid_changed)
+
+    def dump_metrics(self):
+        """Latency / round-trip histograms for this run, in the app's private data dir"""
+        return metrics.dump(os.path.join(self.user_data_dir, 'metrics.json'))
+
+    def on_pause(self):
+        self.dump_metrics()
+        # Background: stop the status poll and the WiFi monitor (push keeps running)
+        self.wifi.pause()
+        if 'queue_status' in self.root.screen_names:
+            self.root.get_screen('queue_status').on_app_pause()
+        return True
+
+    def on_resume(self):
+        self.wifi.resume()
+        if 'queue_status' in self.root.screen_names:
+            self.root.get_screen('queue_status').on_app_resume()
+
+    def on_stop(self):
+        self.dump_metrics()
+        self.worker.shutdown()
+        self.db.close()
+        self.wifi.stop_monitor()
+
 
 if __name__ == '__main__':
-    QServeUApp().run()
+    # QSERVEU_IMPORT_PROFILE=1 prints the slowest imports instead of starting the app
+    if os.getenv('QSERVEU_IMPORT_PROFILE'):
+        from utils.import_profile import main as profile_imports
+        profile_imports()
+    else:
+        QServeUApp().run()
@@ -0,0 +1,94 @@
+-- QServeU: atomic queue-number allocation
+-- Called from MobileDatabase.create_queue via client.rpc('create_queue_atomic', ...).
+-- Replaces the client-side read/compute/insert sequence with one round trip and
+-- serializes allocation per office so two students can never receive the same number.
+
+create or replace function public.create_queue_atomic(
+    p_student_id public.queues.student_id%TYPE,
+    p_office_id  public.queues.office_id%TYPE,
+    p_purpose    text
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_prefix   text;
+    v_existing text;
+    v_next     int;
+    v_ahead    int;
+    v_row      public.queues;
+begin
+    -- One allocator per office at a time; released automatically at commit.
+    perform pg_advisory_xact_lock(hashtext('qserveu.queue.' || p_office_id::text));
+
+    -- 1. Already Waiting or Serving today? (Cancelled queues don't count)
+    select q.queue_number into v_existing
+      from public.queues q
+     where q.student_id = p_student_id
+       and q.created_at >= current_date
+       and q.status in ('waiting', 'serving')
+     order by q.created_at desc
+     limit 1;
+
+    if found then
+        return jsonb_build_object('success', false,
+                                  'message', 'You are already in queue ' || coalesce(v_existing, '???'));
+    end if;
+
+    -- 2. Office prefix
+    select coalesce(o.queue_prefix, 'Q') into v_prefix
+      from public.offices o
+     where o.id = p_office_id;
+
+    if not found then
+        return jsonb_build_object('success', false, 'message', 'Office not found');
+    end if;
+
+    -- 3. Lowest number that is neither active nor in its 10 minute cooldown.
+    --    Cooldown only applies while the office has active numbers (same rule as the app).
+    with office_numbers as (
+        select q.status,
+               q.completed_at,
+               q.cancelled_at,
+               substring(q.queue_number from length(v_prefix) + 1)::int as num
+          from public.queues q
+         where q.office_id = p_office_id
+           and q.queue_number like v_prefix || '%'
+           and substring(q.queue_number from length(v_prefix) + 1) ~ '^[0-9]+$'
+           and (q.status in ('waiting', 'serving')
+                or (q.status = 'completed' and q.completed_at > now() - interval '10 minutes')
+                or (q.status = 'cancelled' and q.cancelled_at > now() - interval '10 minutes'))
+    ),
+    taken as (
+        select num from office_numbers where status in ('waiting', 'serving')
+        union
+        select num from office_numbers
+         where status in ('completed', 'cancelled')
+           and exists (select 1 from office_numbers where status in ('waiting', 'serving'))
+    )
+    --    No 999 cap: the series always reaches one past the highest taken number.
+    select min(n) into v_next
+      from generate_series(1, (select coalesce(max(num), 0) + 1 from taken)) as n
+     where n not in (select num from taken);
+
+    -- 4. Count Wait
+    select count(*) into v_ahead
+      from public.queues q
+     where q.office_id = p_office_id
+       and q.status = 'waiting';
+
+    -- 5. Insert (lpad truncates longer strings, so numbers past 999 widen instead: A1000)
+    insert into public.queues (student_id, office_id, queue_number, purpose, status, created_at)
+    values (p_student_id, p_office_id,
+            v_prefix || lpad(v_next::text, greatest(3, length(v_next::text)), '0'),
+            p_purpose, 'waiting', now())
+    returning * into v_row;
+
+    return jsonb_build_object('success', true,
+                              'queue', to_jsonb(v_row) || jsonb_build_object('people_ahead', v_ahead));
+end;
+$$;
+
+-- Supports the active-number / cooldown scan and the waiting count above.
+create index if not exists queues_office_status_idx on public.queues (office_id, status);
+create index if not exists queues_student_created_idx on public.queues (student_id, created_at desc);
@@ -0,0 +1,7 @@
+-- QServeU: people-ahead lookups
+-- MobileDatabase.get_people_ahead counts waiting rows of one office created before
+-- the student's row on every refresh. This partial index keeps that an index-only range count.
+
+create index if not exists queues_office_waiting_idx
+    on public.queues (office_id, created_at)
+    where status = 'waiting';
@@ -0,0 +1,57 @@
+-- QServeU: one-call status screen
+-- Called from MobileDatabase.get_student_dashboard via client.rpc('student_dashboard', ...).
+-- Returns the student's active queue (with office name and people ahead) and, when there
+-- is none, their latest completed queue that has no feedback yet.
+
+create or replace function public.student_dashboard(
+    p_student_id public.queues.student_id%TYPE
+)
+returns jsonb
+language sql
+stable
+as $$
+    with latest as (
+        select q.*
+          from public.queues q
+         where q.student_id = p_student_id
+           and q.created_at >= now() - interval '24 hours'
+         order by q.created_at desc
+         limit 1
+    ),
+    active as (
+        select to_jsonb(l)
+               || jsonb_build_object(
+                      'offices', jsonb_build_object('name', o.name),
+                      'people_ahead', case when l.status = 'waiting' then (
+                          select count(*)
+                            from public.queues w
+                           where w.office_id = l.office_id
+                             and w.status = 'waiting'
+                             and w.created_at < l.created_at
+                      ) else 0 end
+                  ) as row
+          from latest l
+          left join public.offices o on o.id = l.office_id
+         where l.status in ('waiting', 'serving', 'cancelled')
+    ),
+    last_completed as (
+        select q.*
+          from public.queues q
+         where q.student_id = p_student_id
+           and q.status = 'completed'
+         order by q.created_at desc
+         limit 1
+    ),
+    unrated as (
+        select to_jsonb(c) || jsonb_build_object('offices', jsonb_build_object('name', o.name)) as row
+          from last_completed c
+          left join public.offices o on o.id = c.office_id
+         where not exists (select 1 from public.feedback f where f.queue_id = c.id)
+    )
+    select jsonb_build_object(
+        'active', (select row from active),
+        'unrated', case when exists (select 1 from active) then null else (select row from unrated) end
+    );
+$$;
+
+create index if not exists feedback_queue_idx on public.feedback (queue_id);
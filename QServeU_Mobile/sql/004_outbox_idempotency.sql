@@ -0,0 +1,6 @@
+-- QServeU: idempotent replays from the mobile outbox
+-- MobileDatabase.flush_outbox upserts queued feedback with on_conflict=queue_id,
+-- so a rating that was sent twice (retry after a lost response) is stored once.
+
+drop index if exists public.feedback_queue_idx;
+create unique index if not exists feedback_queue_unique on public.feedback (queue_id);
@@ -0,0 +1,171 @@
+-- QServeU: persistent per-office queue-number pool
+-- Server-side counterpart of utils/queue_numbers.py. Instead of scanning 1..999 on every
+-- create_queue_atomic call, each office keeps a high-water mark plus a pool of released
+-- numbers stamped with the time their 10 minute cooldown ends. Allocation takes the lowest
+-- pooled number whose cooldown is over (primary-key lookup), else high_water + 1, so an
+-- office can go past 999 (numbers widen: A999 -> A1000) instead of reusing a taken number.
+-- Offices are keyed by office_id::text so this works whatever type offices.id has.
+
+create table if not exists public.queue_number_state (
+    office_key text primary key,
+    high_water int not null default 0
+);
+
+create table if not exists public.queue_number_pool (
+    office_key   text not null,
+    num          int not null,
+    available_at timestamptz not null,
+    primary key (office_key, num)
+);
+
+-- Finished queues give their number back, available again after the cooldown.
+create or replace function public.queue_number_release()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_prefix text;
+    v_digits text;
+begin
+    if old.status in ('waiting', 'serving') and new.status in ('completed', 'cancelled') then
+        select coalesce(o.queue_prefix, 'Q') into v_prefix
+          from public.offices o
+         where o.id = new.office_id;
+
+        v_digits := substring(new.queue_number from length(coalesce(v_prefix, 'Q')) + 1);
+        if v_digits ~ '^[0-9]+$' then
+            insert into public.queue_number_pool (office_key, num, available_at)
+            values (new.office_id::text, v_digits::int,
+                    coalesce(new.completed_at, new.cancelled_at, now()) + interval '10 minutes')
+            on conflict (office_key, num) do update set available_at = excluded.available_at;
+        end if;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists queues_release_number on public.queues;
+create trigger queues_release_number
+    after update of status on public.queues
+    for each row execute function public.queue_number_release();
+
+create or replace function public.create_queue_atomic(
+    p_student_id public.queues.student_id%TYPE,
+    p_office_id  public.queues.office_id%TYPE,
+    p_purpose    text
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_key      text := p_office_id::text;
+    v_prefix   text;
+    v_existing text;
+    v_next     int;
+    v_ahead    int;
+    v_row      public.queues;
+begin
+    -- One allocator per office at a time; released automatically at commit.
+    perform pg_advisory_xact_lock(hashtext('qserveu.queue.' || p_office_id::text));
+
+    -- 1. Already Waiting or Serving today? (Cancelled queues don't count)
+    select q.queue_number into v_existing
+      from public.queues q
+     where q.student_id = p_student_id
+       and q.created_at >= current_date
+       and q.status in ('waiting', 'serving')
+     order by q.created_at desc
+     limit 1;
+
+    if found then
+        return jsonb_build_object('success', false,
+                                  'message', 'You are already in queue ' || coalesce(v_existing, '???'));
+    end if;
+
+    -- 2. Office prefix
+    select coalesce(o.queue_prefix, 'Q') into v_prefix
+      from public.offices o
+     where o.id = p_office_id;
+
+    if not found then
+        return jsonb_build_object('success', false, 'message', 'Office not found');
+    end if;
+
+    -- 3. Number from the pool.
+    --    Cooldown only applies while the office has active numbers (same rule as the app):
+    --    an empty line starts again from 1.
+    if not exists (select 1 from public.queues q
+                    where q.office_id = p_office_id and q.status in ('waiting', 'serving')) then
+        delete from public.queue_number_pool where office_key = v_key;
+        insert into public.queue_number_state (office_key, high_water) values (v_key, 0)
+            on conflict (office_key) do update set high_water = 0;
+
+    elsif not exists (select 1 from public.queue_number_state where office_key = v_key) then
+        -- First call for an office with queues from before this migration: seed the pool
+        -- from its active and cooling-down numbers.
+        with office_numbers as (
+            select q.status,
+                   coalesce(q.completed_at, q.cancelled_at) as finished_at,
+                   substring(q.queue_number from length(v_prefix) + 1)::int as num
+              from public.queues q
+             where q.office_id = p_office_id
+               and q.queue_number like v_prefix || '%'
+               and substring(q.queue_number from length(v_prefix) + 1) ~ '^[0-9]+$'
+               and (q.status in ('waiting', 'serving')
+                    or (q.status = 'completed' and q.completed_at > now() - interval '10 minutes')
+                    or (q.status = 'cancelled' and q.cancelled_at > now() - interval '10 minutes'))
+        )
+        insert into public.queue_number_state (office_key, high_water)
+        select v_key, greatest(coalesce(max(num), 0),
+                               coalesce((select max(p.num) from public.queue_number_pool p
+                                          where p.office_key = v_key), 0))
+          from office_numbers;
+
+        insert into public.queue_number_pool (office_key, num, available_at)
+        select v_key, n,
+               coalesce((select max(finished_at) + interval '10 minutes'
+                           from public.queues q
+                          where q.office_id = p_office_id
+                            and q.status in ('completed', 'cancelled')
+                            and q.queue_number = v_prefix || lpad(n::text, greatest(3, length(n::text)), '0')
+                            and coalesce(q.completed_at, q.cancelled_at) > now() - interval '10 minutes'),
+                        now())
+          from generate_series(1, (select high_water from public.queue_number_state where office_key = v_key)) as n
+         where not exists (select 1 from public.queues q
+                            where q.office_id = p_office_id
+                              and q.status in ('waiting', 'serving')
+                              and q.queue_number = v_prefix || lpad(n::text, greatest(3, length(n::text)), '0'))
+        -- The release trigger may already have pooled numbers for this office
+        on conflict (office_key, num) do nothing;
+    end if;
+
+    delete from public.queue_number_pool p
+     where p.office_key = v_key
+       and p.num = (select min(f.num) from public.queue_number_pool f
+                     where f.office_key = v_key and f.available_at <= now())
+    returning p.num into v_next;
+
+    if v_next is null then
+        update public.queue_number_state
+           set high_water = high_water + 1
+         where office_key = v_key
+        returning high_water into v_next;
+    end if;
+
+    -- 4. Count Wait
+    select count(*) into v_ahead
+      from public.queues q
+     where q.office_id = p_office_id
+       and q.status = 'waiting';
+
+    -- 5. Insert (lpad would truncate past 999, so widen instead)
+    insert into public.queues (student_id, office_id, queue_number, purpose, status, created_at)
+    values (p_student_id, p_office_id,
+            v_prefix || lpad(v_next::text, greatest(3, length(v_next::text)), '0'),
+            p_purpose, 'waiting', now())
+    returning * into v_row;
+
+    return jsonb_build_object('success', true,
+                              'queue', to_jsonb(v_row) || jsonb_build_object('people_ahead', v_ahead));
+end;
+$$;
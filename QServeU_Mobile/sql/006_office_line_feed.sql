@@ -0,0 +1,60 @@
+-- QServeU: office line feed for Supabase Realtime
+-- While waiting, the app needs to hear when its office's line moves, but subscribing to the
+-- office's queues rows would stream other students' rows to every phone. Instead each office
+-- gets one summary row (no student data) that a trigger keeps current; the app subscribes
+-- to that row and works out its new position from it, and to its own queues rows (student_id filter).
+
+create table if not exists public.office_queue_state (
+    office_id      text primary key,
+    waiting_count  int not null default 0,
+    serving_number text,
+    updated_at     timestamptz not null default now()
+);
+
+alter table public.office_queue_state enable row level security;
+
+drop policy if exists office_queue_state_read on public.office_queue_state;
+create policy office_queue_state_read on public.office_queue_state
+    for select using (true);
+
+create or replace function public.office_queue_state_refresh()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_office public.queues.office_id%TYPE;
+begin
+    v_office := case when tg_op = 'DELETE' then old.office_id else new.office_id end;
+
+    insert into public.office_queue_state (office_id, waiting_count, serving_number, updated_at)
+    select v_office::text,
+           count(*) filter (where q.status = 'waiting'),
+           (select s.queue_number from public.queues s
+             where s.office_id = v_office and s.status = 'serving'
+             order by s.created_at desc limit 1),
+           now()
+      from public.queues q
+     where q.office_id = v_office
+       and q.status in ('waiting', 'serving')
+    on conflict (office_id) do update
+        set waiting_count  = excluded.waiting_count,
+            serving_number = excluded.serving_number,
+            updated_at     = excluded.updated_at;
+    return null;
+end;
+$$;
+
+drop trigger if exists queues_office_state on public.queues;
+create trigger queues_office_state
+    after insert or delete or update of status on public.queues
+    for each row execute function public.office_queue_state_refresh();
+
+do $$
+begin
+    alter publication supabase_realtime add table public.office_queue_state;
+exception
+    when duplicate_object or undefined_object then null;
+end;
+$$;
@@ -0,0 +1,59 @@
+import os
+import sys
+import types
+
+import pytest
+
+# Tests import the app's modules the way main.py does (from utils.x import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that import kivy.clock at import time; re-imported against the fake clock
+KIVY_MODULES = ('utils.poll_scheduler', 'utils.realtime', 'utils.wifi_detector')
+
+
+class FakeEvent:
+    def __init__(self, callback, timeout):
+        self.callback = callback
+        self.timeout = timeout
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeClock:
+    """kivy.clock.Clock stand-in: events run only when the test calls run()"""
+
+    def __init__(self):
+        self.events = []
+
+    def schedule_once(self, callback, timeout=0):
+        event = FakeEvent(callback, timeout)
+        self.events.append(event)
+        return event
+
+    def pending(self):
+        return [e for e in self.events if not e.cancelled]
+
+    def run(self):
+        """Fire everything scheduled, including events scheduled by those callbacks"""
+        while self.events:
+            events, self.events = self.events, []
+            for event in events:
+                if not event.cancelled:
+                    event.callback(event.timeout)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    kivy_clock = types.ModuleType('kivy.clock')
+    kivy_clock.Clock = fake
+    kivy_utils = types.ModuleType('kivy.utils')
+    kivy_utils.platform = 'linux'
+    monkeypatch.setitem(sys.modules, 'kivy', types.ModuleType('kivy'))
+    monkeypatch.setitem(sys.modules, 'kivy.clock', kivy_clock)
+    monkeypatch.setitem(sys.modules, 'kivy.utils', kivy_utils)
+    for name in KIVY_MODULES:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return fake
@@ -0,0 +1,123 @@
+"""
+get_student_dashboard on both paths: the student_dashboard RPC (sql/003_student_dashboard.sql,
+mirrored below for FakeServer) and the joined-select fallback taken when PostgREST answers
+PGRST202. The fallback must hand the status screen the same shape the function returns.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import FakeServer, split_top
+
+STUDENT = 7
+
+
+def ago(minutes):
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes)).isoformat()
+
+
+def student_dashboard(server, params):
+    """Python port of sql/003_student_dashboard.sql (the caller holds server.lock)"""
+    queues = server.tables.get('queues', [])
+    offices = {o['id']: o for o in server.tables.get('offices', [])}
+    rated = {f['queue_id'] for f in server.tables.get('feedback', [])}
+    mine = sorted((q for q in queues if q['student_id'] == params['p_student_id']),
+                  key=lambda q: q['created_at'], reverse=True)
+
+    def with_office(q):
+        return dict(q, offices={'name': offices[q['office_id']]['name']})
+
+    active = None
+    yesterday = ago(24 * 60)
+    latest = next((q for q in mine if q['created_at'] >= yesterday), None)
+    if latest and latest['status'] in ('waiting', 'serving', 'cancelled'):
+        ahead = sum(1 for w in queues if w['office_id'] == latest['office_id'] and w['status'] == 'waiting'
+                    and w['created_at'] < latest['created_at']) if latest['status'] == 'waiting' else 0
+        active = dict(with_office(latest), people_ahead=ahead)
+
+    completed = next((q for q in mine if q['status'] == 'completed'), None)
+    unrated = with_office(completed) if completed and completed['id'] not in rated else None
+    return {'active': active, 'unrated': None if active else unrated}
+
+
+def queue(id, status, minutes, student=STUDENT, **extra):
+    return dict({'id': id, 'student_id': student, 'office_id': 1, 'queue_number': f"R{id:03d}",
+                 'status': status, 'purpose': 'Transcript', 'notes': None, 'created_at': ago(minutes)}, **extra)
+
+
+SCENARIOS = {
+    'waiting': [queue(1, 'waiting', 30, student=8), queue(2, 'waiting', 20, student=9),
+                queue(3, 'waiting', 10), queue(4, 'waiting', 5, student=10)],
+    'serving': [queue(1, 'waiting', 30, student=8), queue(3, 'serving', 10)],
+    'cancelled': [queue(3, 'cancelled', 10)],
+    'unrated': [queue(1, 'completed', 3000), queue(3, 'completed', 10, completed_at=ago(5))],
+    'rated': [queue(3, 'completed', 10, completed_at=ago(5))],
+    'old_waiting': [queue(3, 'waiting', 26 * 60)],
+    'none': [],
+}
+
+
+def make_db(rows, rpc):
+    server = FakeServer({
+        'offices': [{'id': 1, 'name': 'Registrar', 'queue_prefix': 'R'}],
+        'queues': rows,
+        'feedback': [{'id': 1, 'queue_id': 3, 'rating': 5}] if rows is SCENARIOS['rated'] else [],
+    }, functions={'student_dashboard': student_dashboard} if rpc else None)
+    db = MobileDatabase(connect=False)
+    db.client = server.client()
+    return db
+
+
+def shape(row):
+    """What the status screen reads from a dashboard row"""
+    if row is None:
+        return None
+    fields = [item.split('(')[0] for item in split_top(MobileDatabase.QUEUE_COLUMNS)]
+    return {field: row[field] for field in fields + ['people_ahead'] if field in row}
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_fallback_matches_the_rpc(scenario):
+    rpc = make_db(SCENARIOS[scenario], rpc=True)
+    fallback = make_db(SCENARIOS[scenario], rpc=False)
+
+    expected = rpc.get_student_dashboard(STUDENT)
+    got = fallback.get_student_dashboard(STUDENT)
+    assert rpc.use_dashboard_rpc and not fallback.use_dashboard_rpc
+    assert {key: shape(row) for key, row in got.items()} == {key: shape(row) for key, row in expected.items()}
+    fields = {field.split('(')[0] for field in split_top(MobileDatabase.QUEUE_COLUMNS)}
+    if got['active']:
+        assert set(got['active']) == fields | {'people_ahead'}
+    if got['unrated']:
+        assert set(got['unrated']) == fields
+
+
+def test_rpc_path_is_one_round_trip():
+    db = make_db(SCENARIOS['waiting'], rpc=True)
+    dashboard = db.get_student_dashboard(STUDENT)
+    assert dashboard['active']['people_ahead'] == 2
+    assert dashboard['active']['offices'] == {'name': 'Registrar'}
+    assert db.client.round_trips == 1
+
+
+def test_missing_rpc_is_tried_once():
+    db = make_db(SCENARIOS['waiting'], rpc=False)
+    assert db.get_student_dashboard(STUDENT)['active']['people_ahead'] == 2
+    db.cache.clear()
+    db.client.round_trips = 0
+    db.get_student_dashboard(STUDENT)
+    # queues select + people-ahead count, no RPC attempt
+    assert db.client.round_trips == 2
+
+
+def test_expected_states():
+    states = {}
+    for scenario in SCENARIOS:
+        dashboard = make_db(SCENARIOS[scenario], rpc=True).get_student_dashboard(STUDENT)
+        states[scenario] = (dashboard['active'] and dashboard['active']['status'],
+                            dashboard['unrated'] and dashboard['unrated']['id'])
+    assert states == {'waiting': ('waiting', None), 'serving': ('serving', None),
+                      'cancelled': ('cancelled', None), 'unrated': (None, 3), 'rated': (None, None),
+                      'old_waiting': (None, None), 'none': (None, None)}
@@ -0,0 +1,141 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.eta import WaitTimeModel, format_eta
+from utils.fake_supabase import FakeServer
+
+# Top of a local hour, a day ago, so every sample stays inside MAX_AGE
+NOW = time.time()
+HOUR_START = (NOW - 24 * 3600) // 3600 * 3600 - time.localtime().tm_gmtoff % 3600
+
+
+def local_hour(t):
+    return int((t + time.localtime().tm_gmtoff) // 3600 % 24)
+
+
+def iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+
+def rows(stamps):
+    return [{'completed_at': iso(t)} for t in stamps]
+
+
+def every(start, seconds, count):
+    return [start + i * seconds for i in range(count)]
+
+
+def test_empty_history_has_no_estimate():
+    model = WaitTimeModel()
+    assert model.estimate(1, 3, now=NOW) is None
+    assert model.add_completions(1, [], now=NOW) == 0
+    assert model.office_stats(1) == {}
+
+    model.add_completions(1, rows([HOUR_START]), now=NOW)
+    assert model.estimate(1, 3, now=NOW) is None
+
+
+def test_service_times_are_grouped_by_hour():
+    model = WaitTimeModel()
+    fast = every(HOUR_START + 60, 60, 11)
+    slow = every(HOUR_START + 3600 + 180, 180, 11)
+    assert model.add_completions(1, rows(fast + slow), now=NOW) == 22
+
+    stats = model.office_stats(1)
+    mean, std, samples = stats[local_hour(fast[-1])]
+    assert (mean, std, samples) == (60.0, 0.0, 10)
+    mean, std, samples = stats[local_hour(slow[-1])]
+    assert (round(mean), samples) == (180, 10)
+    # The ~50 min gap between the two runs is an idle counter, not a service interval
+    assert stats['all'][2] == 20
+
+    eta = model.estimate(1, people_ahead=4, now=fast[0])
+    assert eta['minutes'] == 4.5
+    assert eta['low_minutes'] == eta['high_minutes'] == 4.5
+    assert eta['samples'] == 10
+    assert model.estimate(1, people_ahead=4, now=slow[0])['minutes'] == 13.5
+
+
+def test_sparse_hour_falls_back_to_the_whole_office():
+    model = WaitTimeModel()
+    model.add_completions(1, rows(every(HOUR_START + 60, 120, 8)), now=NOW)
+    quiet = HOUR_START + 5 * 3600
+    assert local_hour(quiet) not in model.office_stats(1)
+    assert model.estimate(1, people_ahead=0, now=quiet)['minutes'] == 1.0
+
+
+def test_idle_gaps_and_duplicates_are_dropped():
+    model = WaitTimeModel()
+    stamps = every(HOUR_START + 60, 60, 6)
+    # A lunch break longer than MAX_GAP, then the counter resumes; repeats collapse
+    stamps += every(stamps[-1] + WaitTimeModel.MAX_GAP + 600, 60, 6) + stamps[:3]
+    model.add_completions(1, rows(stamps), now=NOW)
+    assert model.office_stats(1)['all'] == (60.0, 0.0, 10)
+
+
+def test_samples_older_than_max_age_are_forgotten():
+    model = WaitTimeModel()
+    old = NOW - WaitTimeModel.MAX_AGE - 3600
+    model.add_completions(1, rows(every(old, 60, 10)), now=NOW)
+    assert model.completions.get('1') == []
+    assert model.estimate(1, 2, now=NOW) is None
+
+
+def test_model_round_trips_through_its_file(tmp_path):
+    path = str(tmp_path / 'wait_model.json')
+    model = WaitTimeModel(path)
+    model.add_completions(1, rows(every(HOUR_START + 60, 60, 11)), now=NOW)
+    model.save()
+
+    loaded = WaitTimeModel(path)
+    loaded.load()
+    assert loaded.watermark(1) == model.watermark(1)
+    assert loaded.estimate(1, 0, now=NOW) == model.estimate(1, 0, now=NOW)
+
+
+@pytest.mark.parametrize('eta, text', [
+    (None, ''),
+    ({'minutes': 0.4, 'low_minutes': 0.1, 'high_minutes': 0.8, 'confidence': 'low'}, 'less than a minute'),
+    ({'minutes': 12.2, 'low_minutes': 8.4, 'high_minutes': 16.0, 'confidence': 'medium'},
+     '~12 min (8-16, medium confidence)'),
+])
+def test_format_eta(eta, text):
+    assert format_eta(eta) == text
+
+
+@pytest.fixture
+def db():
+    completed = [{'student_id': 100 + i, 'office_id': 1, 'queue_number': f"R{i:03d}", 'status': 'completed',
+                  'created_at': iso(t - 600), 'completed_at': iso(t)}
+                 for i, t in enumerate(every(NOW - 3600, 60, 20))]
+    server = FakeServer({'queues': completed})
+    db = MobileDatabase(wait_model=WaitTimeModel(), connect=False)
+    db.client = server.client()
+    return db
+
+
+def test_estimate_wait_adds_an_eta_to_waiting_queues(db):
+    queue = {'office_id': 1, 'status': 'waiting', 'people_ahead': 2}
+    estimated = db.estimate_wait(queue)
+    assert estimated['eta']['minutes'] == 2.5
+    assert 'eta' not in queue
+
+    # The model is refreshed at most every REFRESH_INTERVAL
+    trips = db.client.round_trips
+    assert db.estimate_wait(queue)['eta'] == estimated['eta']
+    assert db.client.round_trips == trips
+
+
+def test_estimate_wait_leaves_other_queues_alone(db):
+    serving = {'office_id': 1, 'status': 'serving'}
+    assert db.estimate_wait(serving) is serving
+    assert db.estimate_wait(None) is None
+    unknown = {'office_id': 2, 'status': 'waiting', 'people_ahead': 1}
+    assert db.estimate_wait(unknown) is unknown
+
+    db.wait_model = None
+    waiting = {'office_id': 1, 'status': 'waiting', 'people_ahead': 1}
+    assert db.estimate_wait(waiting) is waiting
@@ -0,0 +1,61 @@
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import FakeServer
+
+
+@pytest.fixture
+def db():
+    students = [{'id': 1, 'student_id': '2021-0001', 'full_name': 'Ana Cruz', 'email': 'ana@example.edu',
+                 'course': 'BSIT', 'year_level': '3', 'password_hash': 'plain'},
+                {'id': 2, 'student_id': '2021-0002', 'full_name': 'Ben Reyes', 'email': 'ben@example.edu',
+                 'course': 'BSCS', 'year_level': '2', 'password_hash': 'plain'}]
+    db = MobileDatabase(connect=False)
+    db.client = FakeServer({'students': students}).client()
+    return db
+
+
+def test_first_login_is_one_query(db):
+    assert db.find_login_student('ana@example.edu')['id'] == 1
+    assert db.client.round_trips == 1
+
+
+def test_student_id_and_email_both_match(db):
+    assert db.find_login_student('2021-0002')['id'] == 2
+    assert db.find_login_student('ben@example.edu')['id'] == 2
+    assert db.find_login_student('nobody@example.edu') is None
+
+
+def test_repeat_login_is_a_primary_key_lookup(db):
+    db.find_login_student('2021-0001')
+    db.client.round_trips = 0
+    assert db.find_login_student('2021-0001')['id'] == 1
+    assert db.client.round_trips == 1
+    assert db.login_ids['2021-0001'] == 1
+
+
+def test_changed_email_evicts_and_falls_back(db):
+    db.find_login_student('ana@example.edu')
+    db.client.table('students').update({'email': 'ana.cruz@example.edu'}).eq('id', 1).execute()
+    db.client.table('students').update({'email': 'ana@example.edu'}).eq('id', 2).execute()
+
+    db.client.round_trips = 0
+    assert db.find_login_student('ana@example.edu')['id'] == 2
+    assert db.client.round_trips == 2
+    assert db.login_ids['ana@example.edu'] == 2
+
+
+def test_deleted_student_evicts(db):
+    db.find_login_student('2021-0001')
+    db.client.table('students').delete().eq('id', 1).execute()
+    assert db.find_login_student('2021-0001') is None
+    assert '2021-0001' not in db.login_ids
+
+
+def test_cache_is_bounded_lru(db, monkeypatch):
+    monkeypatch.setattr(MobileDatabase, 'LOGIN_CACHE_SIZE', 2)
+    db.find_login_student('2021-0001')
+    db.find_login_student('2021-0002')
+    db.find_login_student('2021-0001')
+    db.find_login_student('ben@example.edu')
+    assert list(db.login_ids) == ['2021-0001', 'ben@example.edu']
@@ -0,0 +1,70 @@
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import FakeServer
+from utils.office_cache import OfficeCache
+
+
+@pytest.fixture
+def setup(tmp_path):
+    server = FakeServer({'offices': [
+        {'id': 1, 'name': 'Registrar', 'queue_prefix': 'R', 'updated_at': None},
+        {'id': 2, 'name': 'Cashier', 'queue_prefix': 'C', 'updated_at': '2024-05-01T08:00:00+00:00'},
+    ]})
+    db = MobileDatabase(office_cache=OfficeCache(str(tmp_path / 'offices.json')), connect=False)
+    db.client = server.client()
+    return server, db
+
+
+def rename_cashier(db, stamp):
+    db.client.table('offices').update({'name': 'Cashier (Annex)', 'updated_at': stamp}).eq('id', 2).execute()
+
+
+def test_stamp_skips_null_updated_at(setup):
+    server, db = setup
+    assert db.refresh_offices()
+    assert db.office_cache.version == '2:2024-05-01T08:00:00+00:00'
+
+    db.client.queries.clear()
+    assert not db.refresh_offices()
+    total, stamp = db.client.queries
+    assert total['count'] == 'exact' and total['limit'] == 1
+    assert stamp['columns'] == 'updated_at' and stamp['limit'] == 1
+
+    rename_cashier(db, '2024-05-02T08:00:00+00:00')
+    assert db.refresh_offices()
+    assert db.office_cache.get(2)['name'] == 'Cashier (Annex)'
+
+
+def test_unstamped_office_added_or_removed_moves_the_stamp(setup):
+    server, db = setup
+    assert db.refresh_offices()
+    db.client.table('offices').insert({'id': 3, 'name': 'Library', 'queue_prefix': 'L'}).execute()
+    assert db.refresh_offices()
+    assert db.office_cache.get(3)['name'] == 'Library'
+
+    db.client.table('offices').delete().eq('id', 1).execute()
+    assert db.refresh_offices()
+    assert db.office_cache.get(1) is None
+
+
+def test_no_stamped_offices_still_settles(setup):
+    server, db = setup
+    db.client.table('offices').update({'updated_at': None}).eq('id', 2).execute()
+    assert db.refresh_offices()
+    assert db.office_cache.version == '2:'
+    assert not db.refresh_offices()
+
+
+def test_fake_orders_nulls_like_postgres():
+    """nullsfirst=False sends nothing in postgrest-py, so DESC still puts NULLs first"""
+    client = FakeServer({'offices': [{'id': 1, 'updated_at': None},
+                                     {'id': 2, 'updated_at': '2024-05-01'}]}).client()
+    for nullsfirst in (None, False, True):
+        rows = client.table('offices').select('id').order('updated_at', desc=True, nullsfirst=nullsfirst) \
+            .execute().data
+        assert rows[0]['id'] == 1
+    rows = client.table('offices').select('id').order('updated_at', nullsfirst=True).execute().data
+    assert rows[0]['id'] == 1
+    rows = client.table('offices').select('id').not_.is_('updated_at', 'null').execute().data
+    assert rows == [{'id': 2}]
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import FakeAPIError, FakeServer
+from utils.outbox import Outbox
+
+
+def ago(minutes):
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes)).isoformat()
+
+
+@pytest.fixture
+def server():
+    return FakeServer({
+        'students': [{'id': 7, 'student_id': '2021-0001', 'full_name': 'Ana Cruz', 'year_level': '3',
+                      'password_hash': 'hash'}],
+        'queues': [
+            {'id': 1, 'student_id': 7, 'office_id': 1, 'queue_number': 'R001', 'status': 'completed',
+             'created_at': ago(60), 'completed_at': ago(50)},
+            {'id': 2, 'student_id': 7, 'office_id': 1, 'queue_number': 'R002', 'status': 'waiting',
+             'created_at': ago(10)},
+        ],
+        'feedback': [],
+    })
+
+
+@pytest.fixture
+def db(server, tmp_path):
+    db = MobileDatabase(outbox=Outbox(str(tmp_path / 'outbox.db')), connect=False)
+    db.client = server.client()
+    return db
+
+
+def test_offline_writes_are_queued_once_per_key(server, db):
+    server.offline = True
+    assert db.submit_feedback(1, 7, 1, 4, 'ok')['queued']
+    assert db.submit_feedback(1, 7, 1, 5, 'great')['queued']
+    assert db.cancel_student_queue(2, 7)['queued']
+    assert db.update_student('2021-0001', 'Ana C.', '3')['queued']
+    assert db.update_student('2021-0001', 'Ana C.', '4')['queued']
+
+    assert db.outbox.count() == 3
+    assert db.outbox.get('feedback:1')['rating'] == 5
+    assert db.outbox.get('student:2021-0001')['updates'] == {'full_name': 'Ana C.', 'year_level': '4'}
+
+
+def test_flush_sends_everything_and_replays_are_harmless(server, db):
+    server.offline = True
+    db.submit_feedback(1, 7, 1, 5, 'great')
+    db.cancel_student_queue(2, 7)
+    db.update_student('2021-0001', 'Ana C.', '4')
+
+    summary = db.flush_outbox()
+    assert summary['sent'] == 0 and summary['pending'] == 3
+
+    server.offline = False
+    summary = db.flush_outbox()
+    assert summary['sent'] == 3 and summary['pending'] == 0
+    assert summary['rejected_cancels'] == []
+    assert summary['student']['full_name'] == 'Ana C.' and 'password_hash' not in summary['student']
+    assert [row['rating'] for row in server.rows('feedback')] == [5]
+    assert next(row for row in server.rows('queues') if row['id'] == 2)['status'] == 'cancelled'
+
+    # The same rating queued again (e.g. the app died before remove()) is not stored twice
+    db.outbox.add('feedback', 'feedback:1', {'office_id': 1, 'student_id': 7, 'queue_id': 1, 'rating': 5,
+                                             'comment': 'great'})
+    assert db.flush_outbox()['sent'] == 1
+    assert len(server.rows('feedback')) == 1
+
+
+def test_empty_outbox_makes_no_requests(db):
+    assert db.flush_outbox() == {'sent': 0, 'dropped': 0, 'pending': 0, 'student': None, 'rejected_cancels': []}
+    assert db.client.round_trips == 0
+
+
+def test_cancel_of_a_queue_already_serving_is_rejected(server, db):
+    server.offline = True
+    db.cancel_student_queue(2, 7)
+    server.offline = False
+    db.client.table('queues').update({'status': 'serving'}).eq('id', 2).execute()
+
+    summary = db.flush_outbox()
+    assert summary['rejected_cancels'] == [2]
+    assert summary['pending'] == 0
+    assert next(row for row in server.rows('queues') if row['id'] == 2)['status'] == 'serving'
+
+
+def test_server_rejections_drop_out_after_max_attempts(server, db, monkeypatch):
+    server.offline = True
+    db.cancel_student_queue(2, 7)
+    server.offline = False
+
+    def reject(*args):
+        raise FakeAPIError('42501', 'permission denied')
+    monkeypatch.setattr(db, 'cancel_if_waiting', reject)
+
+    for _ in range(Outbox.MAX_ATTEMPTS - 1):
+        summary = db.flush_outbox()
+        assert summary['dropped'] == 0 and summary['pending'] == 1
+    summary = db.flush_outbox()
+    assert summary['dropped'] == 1 and summary['pending'] == 0
@@ -0,0 +1,138 @@
+"""
+Payload-size regression: what MobileDatabase asks the (fake) PostgREST for on the hot paths.
+Queue reads must stay projected to QUEUE_COLUMNS and counts / existence checks must fetch at
+most one projected row, so a wide column added to `queues` never rides along on every status
+refresh. No head=True or returning='minimal' + count: postgrest-py 0.17 reads those empty
+bodies as count=0, and so does the fake.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import SCHEMA, FakeServer, split_top
+
+# A wide column nothing on the status screen reads
+PURPOSE = 'x' * 4000
+
+STUDENT_COLUMNS = ['id', 'student_id', 'full_name', 'email', 'course', 'year_level', 'password_hash',
+                   'created_at', 'address']
+
+
+def ago(minutes):
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes)).isoformat()
+
+
+@pytest.fixture
+def db():
+    server = FakeServer({
+        'offices': [{'id': 1, 'name': 'Registrar', 'queue_prefix': 'R'}],
+        'students': [{'id': 7, 'student_id': '2021-0001', 'full_name': 'Ana Cruz', 'email': 'ana@example.edu',
+                      'course': 'BSIT', 'year_level': '3', 'password_hash': 'plain', 'address': PURPOSE}],
+        'queues': [
+            {'student_id': 7, 'office_id': 1, 'queue_number': 'R001', 'purpose': PURPOSE,
+             'status': 'completed', 'created_at': ago(300), 'completed_at': ago(290)},
+            {'student_id': 8, 'office_id': 1, 'queue_number': 'R002', 'purpose': PURPOSE,
+             'status': 'waiting', 'created_at': ago(20)},
+            {'student_id': 7, 'office_id': 1, 'queue_number': 'R003', 'purpose': PURPOSE,
+             'status': 'waiting', 'created_at': ago(10)},
+        ],
+        'feedback': [],
+    }, schema=dict(SCHEMA, students=STUDENT_COLUMNS))
+    db = MobileDatabase(connect=False)
+    db.client = server.client()
+    db.use_queue_rpc = db.use_dashboard_rpc = False
+    return db
+
+
+def columns(query):
+    return set(split_top(query['columns']))
+
+
+def received(db):
+    return sum(len(json.dumps(q['data'], default=str)) for q in db.client.queries)
+
+
+def test_status_refresh_reads_only_queue_columns(db):
+    queue = db.get_student_queue(7)
+    assert queue['queue_number'] == 'R003'
+    assert queue['people_ahead'] == 1
+
+    reads, count = db.client.queries
+    assert reads['table'] == 'queues'
+    assert columns(reads) == set(split_top(MobileDatabase.QUEUE_COLUMNS))
+    assert set(reads['data'][0]) == {'id', 'office_id', 'queue_number', 'status', 'notes', 'created_at', 'offices'}
+    assert not count['head'] and count['count'] == 'exact'
+    assert count['columns'] == 'id' and count['limit'] == 1
+    assert received(db) < 1000
+
+
+def test_counts_and_existence_checks_fetch_one_id(db):
+    assert db.get_active_queue_count(7) == 1
+    unrated = db.get_pending_feedback(7)
+    assert unrated['queue_number'] == 'R001'
+
+    active_count, completed, feedback = db.client.queries
+    assert active_count['count'] == 'exact'
+    for query in (active_count, feedback):
+        assert not query['head']
+        assert query['columns'] == 'id' and query['limit'] == 1
+    assert columns(completed) == set(split_top(MobileDatabase.QUEUE_COLUMNS))
+    assert received(db) < 1000
+
+
+def test_rated_queue_is_not_pending(db):
+    completed = db.client.table('queues').select('id').eq('queue_number', 'R001').execute().data[0]
+    db.client.table('feedback').insert({'queue_id': completed['id'], 'student_id': 7, 'office_id': 1,
+                                        'rating': 5}).execute()
+    assert db.get_pending_feedback(7) is None
+
+
+def test_conditional_cancel_reports_whether_it_applied(db):
+    waiting = db.get_student_queue(7)
+    assert db.cancel_if_waiting(waiting['id'], 8, 'now') is False
+    assert db.cancel_if_waiting(waiting['id'], 7, 'now') is True
+    assert db.cancel_if_waiting(waiting['id'], 7, 'now') is False
+
+
+def test_register_rejects_a_taken_student_id(db):
+    result = db.register_student({'student_id': '2021-0001', 'full_name': 'Copy', 'email': 'x@example.edu',
+                                  'password': 'pw'})
+    assert result == {'success': False, 'message': 'Student ID already exists'}
+
+
+def test_fake_reads_empty_bodies_as_count_zero_like_postgrest_py(db):
+    head = db.client.table('queues').select('id', count='exact', head=True).execute()
+    minimal = db.client.table('queues').update({'notes': 'x'}, count='exact', returning='minimal') \
+        .eq('student_id', 7).execute()
+    assert (head.count, minimal.count) == (0, 0)
+
+
+def test_dashboard_fallback_is_projected(db):
+    dashboard = db.get_student_dashboard_client_side(7)
+    assert dashboard['active']['queue_number'] == 'R003'
+    reads = db.client.queries[0]
+    assert columns(reads) == set(split_top(MobileDatabase.QUEUE_COLUMNS)) | {'feedback(id)'}
+    assert all('purpose' not in row for row in reads['data'])
+    assert received(db) < 2000
+
+
+def test_login_lookup_is_projected(db):
+    student = db.find_login_student('ana@example.edu')
+    assert student['id'] == 7
+    lookup = db.client.queries[0]
+    assert columns(lookup) == set(split_top(MobileDatabase.LOGIN_COLUMNS))
+    assert 'address' not in student
+
+
+def test_no_hot_path_selects_star_from_queues_or_students(db):
+    db.get_student_queue(7)
+    db.get_active_queue_count(7)
+    db.get_pending_feedback(7)
+    db.get_student_dashboard_client_side(7)
+    db.find_login_student('2021-0001')
+    for query in db.client.queries:
+        if query['table'] in ('queues', 'students') and query['method'] == 'select':
+            assert '*' not in columns(query), query['columns']
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture
+def scheduler(clock):
+    from utils.poll_scheduler import PollScheduler
+    return PollScheduler(lambda: None)
+
+
+def test_serving_is_never_backed_off(scheduler):
+    for _ in range(10):
+        scheduler.schedule({'status': 'serving'}, changed=False)
+    assert scheduler.delay == scheduler.SERVING_DELAY
+
+
+def test_next_in_line_is_never_backed_off(scheduler):
+    for _ in range(10):
+        scheduler.schedule({'status': 'waiting', 'people_ahead': 0}, changed=False)
+    assert scheduler.delay == 3
+
+
+@pytest.mark.parametrize('ahead, delay', [(1, 5), (2, 5)])
+def test_two_or_fewer_ahead_is_never_backed_off(scheduler, ahead, delay):
+    for _ in range(10):
+        scheduler.schedule({'status': 'waiting', 'people_ahead': ahead}, changed=False)
+    assert scheduler.delay == delay
+
+
+def test_three_ahead_backs_off(scheduler):
+    scheduler.schedule({'status': 'waiting', 'people_ahead': 3}, changed=True)
+    scheduler.schedule({'status': 'waiting', 'people_ahead': 3}, changed=False)
+    assert scheduler.delay > 10
+
+
+def test_far_back_backs_off_until_changed(scheduler):
+    queue = {'status': 'waiting', 'people_ahead': 50}
+    scheduler.schedule(queue, changed=True)
+    assert scheduler.delay == scheduler.FAR_DELAY
+    for _ in range(10):
+        scheduler.schedule(queue, changed=False)
+    assert scheduler.delay == scheduler.max_delay
+    scheduler.schedule(queue, changed=True)
+    assert scheduler.delay == scheduler.FAR_DELAY
@@ -0,0 +1,152 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.queue_numbers import QueueNumberAllocator, parse_timestamp
+
+NOW = 1_700_000_000.0
+
+
+def iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+
+class Reference:
+    """Brute-force model: lowest number neither active nor cooling (cooling ignored on an empty line)"""
+
+    def __init__(self, cooldown):
+        self.cooldown = cooldown
+        self.active = set()
+        self.available_at = {}
+
+    def next(self, now):
+        if not self.active:
+            self.available_at = {}
+        blocked = self.active | {n for n, t in self.available_at.items() if t > now}
+        num = 1
+        while num in blocked:
+            num += 1
+        return num
+
+    def acquire(self, now):
+        num = self.next(now)
+        self.active.add(num)
+        self.available_at.pop(num, None)
+        return num
+
+    def release(self, num, now):
+        self.active.discard(num)
+        self.available_at[num] = now + self.cooldown
+
+    def rows(self, prefix, now):
+        rows = [{'queue_number': f"{prefix}{n:03d}", 'status': 'waiting'} for n in self.active]
+        for n, t in self.available_at.items():
+            if t > now:
+                rows.append({'queue_number': f"{prefix}{n:03d}", 'status': 'cancelled',
+                             'completed_at': None, 'cancelled_at': iso(t - self.cooldown)})
+        return rows
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_matches_reference_under_random_workload(seed):
+    rng = random.Random(seed)
+    cooldown = rng.choice([0, 5, 60, 600])
+    allocator = QueueNumberAllocator('A', cooldown=cooldown)
+    reference = Reference(cooldown)
+    now = NOW
+    for _ in range(400):
+        now += rng.choice([0, 1, 1, 2, 30])
+        if reference.active and rng.random() < 0.45:
+            num = rng.choice(sorted(reference.active))
+            allocator.release(num, now, cooldown=cooldown > 0)
+            reference.release(num, now)
+        else:
+            assert allocator.acquire(now) == reference.acquire(now)
+        assert allocator.active == reference.active
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_from_rows_continues_like_the_reference(seed):
+    """A pool rebuilt from rows at any point answers like the live one, now and afterwards"""
+    rng = random.Random(seed)
+    reference = Reference(600)
+    now = NOW
+    for _ in range(rng.randint(1, 300)):
+        now += rng.choice([1, 5, 120])
+        if reference.active and rng.random() < 0.4:
+            reference.release(rng.choice(sorted(reference.active)), now)
+        else:
+            reference.acquire(now)
+
+    allocator = QueueNumberAllocator.from_rows('A', reference.rows('A', now), now=now, cooldown=600)
+    for _ in range(100):
+        now += rng.choice([1, 60, 300])
+        if reference.active and rng.random() < 0.3:
+            num = rng.choice(sorted(reference.active))
+            allocator.release(num, now)
+            reference.release(num, now)
+        else:
+            assert allocator.acquire(now) == reference.acquire(now)
+
+
+def test_cooling_number_is_skipped_until_cooldown_ends():
+    allocator = QueueNumberAllocator('Q', cooldown=600)
+    assert [allocator.acquire(NOW) for _ in range(3)] == [1, 2, 3]
+    allocator.release(1, NOW)
+    assert allocator.acquire(NOW + 599) == 4
+    allocator.release(4, NOW + 599)
+    assert allocator.acquire(NOW + 600) == 1
+
+
+def test_release_without_cooldown_is_reusable_at_once():
+    allocator = QueueNumberAllocator('Q', cooldown=600)
+    allocator.acquire(NOW)
+    allocator.acquire(NOW)
+    allocator.release(1, NOW, cooldown=False)
+    assert allocator.acquire(NOW) == 1
+
+
+def test_empty_line_starts_again_from_one():
+    allocator = QueueNumberAllocator('Q', cooldown=600)
+    allocator.acquire(NOW)
+    allocator.acquire(NOW)
+    allocator.release(1, NOW)
+    allocator.release(2, NOW)
+    assert allocator.acquire(NOW + 1) == 1
+
+
+def test_from_rows_expiry():
+    rows = [
+        {'queue_number': 'R001', 'status': 'serving'},
+        {'queue_number': 'R002', 'status': 'completed', 'completed_at': iso(NOW - 100)},
+        {'queue_number': 'R003', 'status': 'cancelled', 'cancelled_at': iso(NOW - 700)},
+        {'queue_number': 'X004', 'status': 'waiting'},
+        {'queue_number': 'Rabc', 'status': 'waiting'},
+    ]
+    allocator = QueueNumberAllocator.from_rows('R', rows, now=NOW, cooldown=600)
+    assert allocator.acquire(NOW) == 3
+    assert allocator.acquire(NOW) == 4
+    assert allocator.acquire(NOW + 500) == 2
+
+
+def test_from_rows_without_active_rows_resets():
+    rows = [{'queue_number': 'Q005', 'status': 'completed', 'completed_at': iso(NOW - 10)}]
+    allocator = QueueNumberAllocator.from_rows('Q', rows, now=NOW)
+    assert allocator.acquire(NOW) == 1
+
+
+def test_past_999_widens_instead_of_reusing():
+    rows = [{'queue_number': f"A{n:03d}", 'status': 'waiting'} for n in range(1, 1000)]
+    allocator = QueueNumberAllocator.from_rows('A', rows, now=NOW)
+    num = allocator.acquire(NOW)
+    assert num == 1000
+    assert allocator.format(num) == 'A1000'
+    assert allocator.parse('A1000') == 1000
+    assert allocator.acquire(NOW) == 1001
+
+
+def test_parse_timestamp():
+    assert parse_timestamp('2024-01-01T00:00:00Z') == parse_timestamp('2024-01-01T00:00:00+00:00')
+    assert parse_timestamp(None) is None
+    assert parse_timestamp('yesterday') is None
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import SCHEMA, FakeServer
+
+
+def ago(minutes):
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes)).isoformat()
+
+
+@pytest.fixture
+def db():
+    queues = [{'student_id': 100 + i, 'office_id': 1, 'queue_number': f"R{i + 1:03d}",
+               'status': 'waiting', 'created_at': ago(60 - i)} for i in range(5)]
+    queues.append({'student_id': 200, 'office_id': 1, 'queue_number': 'R900', 'status': 'serving',
+                   'created_at': ago(90)})
+    queues.append({'student_id': 300, 'office_id': 2, 'queue_number': 'C001', 'status': 'waiting',
+                   'created_at': ago(90)})
+    server = FakeServer({'offices': [{'id': 1, 'name': 'Registrar'}, {'id': 2, 'name': 'Cashier'}],
+                         'queues': queues, 'feedback': []}, schema=SCHEMA)
+    db = MobileDatabase(connect=False)
+    db.client = server.client()
+    db.use_queue_rpc = db.use_dashboard_rpc = False
+    return db
+
+
+@pytest.mark.parametrize('student, ahead', [(100, 0), (101, 1), (104, 4)])
+def test_people_ahead_counts_earlier_waiting_rows_of_the_office(db, student, ahead):
+    assert db.get_student_queue(student)['people_ahead'] == ahead
+
+
+def test_people_ahead_is_an_exact_get_count(db):
+    db.get_student_queue(104)
+    count = db.client.queries[-1]
+    assert count['count'] == 'exact' and not count['head'] and count['limit'] == 1
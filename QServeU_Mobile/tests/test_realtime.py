@@ -0,0 +1,183 @@
+import threading
+
+import pytest
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import SCHEMA, FakeServer
+
+
+@pytest.fixture
+def realtime(clock):
+    import utils.realtime
+    return utils.realtime
+
+
+@pytest.fixture
+def setup(realtime):
+    transport = realtime.LocalTransport()
+    server = FakeServer({
+        'offices': [{'id': 1, 'name': 'Registrar', 'queue_prefix': 'R'}],
+        'queues': [],
+        'feedback': [],
+    }, schema=SCHEMA, transport=transport)
+    pushed = []
+    feed = realtime.QueueFeed(transport, on_change=pushed.append, line_delay=(0.5, 3.0))
+    return server, transport, feed, pushed
+
+
+def device(server):
+    db = MobileDatabase(connect=False)
+    db.client = server.client()
+    db.use_queue_rpc = db.use_dashboard_rpc = False
+    return db
+
+
+def test_fake_client_writes_reach_the_students_feed(clock, setup):
+    server, transport, feed, pushed = setup
+    feed.watch_student(7)
+    clock.run()
+    assert feed.connected
+
+    db = device(server)
+    created = db.create_queue(7, 1, 'Enrollment')
+    assert created['success']
+    clock.run()
+    assert [r['queue_number'] for r in pushed] == ['R001']
+
+    assert db.cancel_student_queue(created['queue']['id'], 7)['success']
+    clock.run()
+    assert [r['status'] for r in pushed] == ['waiting', 'cancelled']
+
+
+def test_other_students_rows_are_not_delivered(clock, setup):
+    server, transport, feed, pushed = setup
+    feed.watch_student(7)
+    feed.watch_office(1)
+    device(server).create_queue(8, 1, 'Enrollment')
+    clock.run()
+    assert pushed == []
+
+
+def test_unchanged_row_is_delivered_once(clock, setup):
+    server, transport, feed, pushed = setup
+    feed.watch_student(7)
+    row = {'id': 1, 'student_id': 7, 'status': 'waiting'}
+    transport.publish('queues', row)
+    transport.publish('queues', dict(row))
+    clock.run()
+    assert len(pushed) == 1
+
+
+def test_line_changes_are_coalesced_and_jittered(clock, setup):
+    server, transport, feed, pushed = setup
+    feed.watch_student(7)
+    feed.watch_office(1)
+    for waiting in (5, 4, 3):
+        transport.publish('office_queue_state', {'office_id': '1', 'waiting_count': waiting})
+    for event in list(clock.events):
+        event.callback(event.timeout)
+        clock.events.remove(event)
+
+    delayed = clock.pending()
+    assert len(delayed) == 1
+    assert 0.5 <= delayed[0].timeout <= 3.0
+    clock.run()
+    assert [r['waiting_count'] for r in pushed] == [3]
+
+
+def test_leaving_the_office_drops_a_pending_line_change(clock, setup):
+    server, transport, feed, pushed = setup
+    feed.watch_student(7)
+    feed.watch_office(1)
+    transport.publish('office_queue_state', {'office_id': '1', 'waiting_count': 2})
+    clock.events.pop(0).callback(0)
+    feed.watch_office(None)
+    clock.run()
+    assert pushed == []
+
+
+def test_supabase_transport_restart_reuses_its_loop(realtime):
+    transport = realtime.SupabaseRealtimeTransport('https://example.supabase.co', 'key')
+    statuses = []
+    transport.start(statuses.append)
+    loop = transport.loop
+    transport.stop()
+    transport.start(statuses.append)
+    assert transport.loop is loop
+    names = [t.name for t in threading.enumerate()]
+    assert names.count('qserveu-realtime') == 1
+    transport.stop()
+
+
+def test_line_summaries_go_to_on_line_with_the_previous_one(clock, realtime):
+    transport = realtime.LocalTransport()
+    changes, lines = [], []
+    feed = realtime.QueueFeed(transport, on_change=changes.append, line_delay=(0.5, 0.5),
+                              on_line=lambda previous, summary: lines.append((previous, summary)))
+    feed.watch_student(7)
+    feed.watch_office(1)
+    first = {'office_id': '1', 'waiting_count': 4, 'serving_number': 'R001'}
+    second = dict(first, waiting_count=3, serving_number='R002')
+    for summary in (first, dict(first), second):
+        transport.publish('office_queue_state', summary)
+        clock.run()
+    assert lines == [(None, first), (first, second)]
+    assert changes == []
+
+    # Watching the office again later starts without a baseline
+    feed.watch_office(None)
+    feed.watch_office(1)
+    transport.publish('office_queue_state', second)
+    clock.run()
+    assert lines[-1] == (None, second)
+
+
+WAITING = {'id': 3, 'status': 'waiting', 'office_id': 1, 'people_ahead': 3, 'eta': {'minutes': 6}}
+
+
+def summary(waiting, serving):
+    return {'office_id': '1', 'waiting_count': waiting, 'serving_number': serving}
+
+
+@pytest.mark.parametrize('previous, current, ahead', [
+    # The next student is called
+    (summary(5, 'R001'), summary(4, 'R002'), 2),
+    # Called while someone joined behind
+    (summary(5, 'R001'), summary(5, 'R002'), 2),
+    # Someone joined behind / the counter finished without calling anyone
+    (summary(5, 'R001'), summary(6, 'R001'), 3),
+    (summary(5, 'R001'), summary(5, None), 3),
+    # The first call after an idle counter
+    (summary(5, None), summary(4, 'R002'), 2),
+])
+def test_advance_position_resolves_calls_and_arrivals(realtime, previous, current, ahead):
+    queue = realtime.advance_position(WAITING, previous, current)
+    assert queue['people_ahead'] == ahead
+    if ahead == WAITING['people_ahead']:
+        assert queue is WAITING
+    else:
+        assert 'eta' not in queue and WAITING['people_ahead'] == 3
+
+
+@pytest.mark.parametrize('queue, previous, current', [
+    # No baseline yet
+    (WAITING, None, summary(4, 'R002')),
+    # A cancellation somewhere in the line
+    (WAITING, summary(5, 'R001'), summary(4, 'R001')),
+    # More left than were called (coalesced burst)
+    (WAITING, summary(5, 'R001'), summary(3, 'R003')),
+    # Count says we should already be at the counter
+    (dict(WAITING, people_ahead=0), summary(1, 'R001'), summary(1, 'R002')),
+    # Not waiting
+    (dict(WAITING, status='serving'), summary(5, 'R001'), summary(4, 'R002')),
+    (None, summary(5, 'R001'), summary(4, 'R002')),
+])
+def test_advance_position_rereads_when_the_summary_cannot_tell(realtime, queue, previous, current):
+    assert realtime.advance_position(queue, previous, current) is None
+
+
+def test_advance_position_is_capped_by_the_waiting_count(realtime):
+    queue = realtime.advance_position(dict(WAITING, people_ahead=6), summary(8, 'R001'), summary(4, 'R002'))
+    assert queue is None
+    queue = realtime.advance_position(dict(WAITING, people_ahead=6), summary(4, 'R001'), summary(4, 'R002'))
+    assert queue['people_ahead'] == 3
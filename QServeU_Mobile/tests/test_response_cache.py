@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from utils.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(max_entries=3, clock=clock)
+
+
+def counting(value):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return value
+    load.calls = calls
+    return load
+
+
+def test_entries_expire_after_their_ttl(cache, clock):
+    load = counting({'id': 1})
+    assert cache.get_or_load(('queues', 1), load, ttl=5) == {'id': 1}
+    clock.now = 4.9
+    cache.get_or_load(('queues', 1), load, ttl=5)
+    assert len(load.calls) == 1
+    clock.now = 5.0
+    cache.get_or_load(('queues', 1), load, ttl=5)
+    assert len(load.calls) == 2
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 2, 'coalesced': 0}
+
+
+def test_zero_ttl_is_never_stored(cache):
+    load = counting(1)
+    cache.get_or_load(('x',), load, ttl=0)
+    cache.get_or_load(('x',), load, ttl=0)
+    assert len(load.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in 'abc':
+        cache.get_or_load((key,), counting(key), ttl=60)
+    cache.get_or_load(('a',), counting('a'), ttl=60)
+    cache.get_or_load(('d',), counting('d'), ttl=60)
+    assert list(cache.entries) == [('c',), ('a',), ('d',)]
+
+
+def test_errors_are_raised_and_not_cached(cache):
+    def fail():
+        raise ConnectionError('offline')
+    with pytest.raises(ConnectionError):
+        cache.get_or_load(('x',), fail, ttl=60)
+    assert cache.get_or_load(('x',), counting(2), ttl=60) == 2
+
+
+def test_invalidate_drops_a_prefix(cache):
+    for key in [('queues', 1, 'latest'), ('queues', 1, 'dashboard'), ('queues', 2, 'latest')]:
+        cache.get_or_load(key, counting(key), ttl=60)
+    cache.invalidate('queues', 1)
+    assert list(cache.entries) == [('queues', 2, 'latest')]
+    cache.clear()
+    assert not cache.entries
+
+
+def test_callers_get_copies(cache):
+    first = cache.get_or_load(('x',), lambda: {'rows': [1, 2]}, ttl=60)
+    first['rows'].append(3)
+    second = cache.get_or_load(('x',), counting(None), ttl=60)
+    assert second == {'rows': [1, 2]}
+    second['rows'].clear()
+    assert cache.get_or_load(('x',), counting(None), ttl=60) == {'rows': [1, 2]}
+
+
+def run_waiters(cache, key, load, count):
+    results = [None] * count
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, cache.get_or_load(key, load, 60)))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_misses_share_one_load(cache):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return {'n': len(calls)}
+
+    threads, results = run_waiters(cache, ('x',), load, 5)
+    assert started.wait(2)
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(calls) == 1
+    assert results == [{'n': 1}] * 5
+    assert len({id(r) for r in results}) == 5
+
+
+def test_invalidate_during_a_load_reloads_for_every_waiter(cache):
+    version = ['before write']
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        value = version[0]
+        started.set()
+        release.wait(2)
+        return value
+
+    threads, results = run_waiters(cache, ('queues', 1), load, 3)
+    assert started.wait(2)
+    while cache.stats()['coalesced'] < 2:
+        time.sleep(0.001)
+    version[0] = 'after write'
+    cache.invalidate('queues', 1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert results == ['after write'] * 3
+    assert cache.get_or_load(('queues', 1), counting('unused'), 60) == 'after write'
@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+from utils.session import SessionStore
+
+STUDENT = {'id': 7, 'student_id': '2021-0001', 'full_name': 'Ana Cruz', 'email': 'ana@example.edu',
+           'course': 'BSIT', 'year_level': '3', 'password_hash': '$2b$12$secret'}
+
+
+def test_round_trip_keeps_profile_only(tmp_path):
+    store = SessionStore(str(tmp_path))
+    store.save(STUDENT, selected_office={'id': 1})
+    body = SessionStore(str(tmp_path)).load()
+    assert body['student']['id'] == 7
+    assert 'password_hash' not in body['student']
+    assert 'token' not in body
+    assert body['selected_office'] == {'id': 1}
+
+
+def test_expired_session_is_dropped(tmp_path):
+    store = SessionStore(str(tmp_path), lifetime=-1)
+    store.save(STUDENT)
+    assert SessionStore(str(tmp_path)).load() is None
+    assert not os.path.exists(store.path)
+
+
+def test_malformed_session_is_dropped(tmp_path):
+    store = SessionStore(str(tmp_path))
+    with open(store.path, 'w') as f:
+        json.dump({'body': {'expires_at': time.time() + 60}}, f)
+    assert store.load() is None
+    assert not os.path.exists(store.path)
+
+
+def test_old_signed_session_still_loads_and_key_is_removed(tmp_path):
+    store = SessionStore(str(tmp_path))
+    body = {'token': 'abc', 'student': {'id': 7}, 'expires_at': time.time() + 60}
+    with open(store.path, 'w') as f:
+        json.dump({'body': body, 'mac': 'ignored'}, f)
+    with open(store.legacy_key_path, 'wb') as f:
+        f.write(b'k' * 32)
+
+    assert store.load()['student']['id'] == 7
+    store.update(selected_office=None)
+    store.save(STUDENT)
+    assert 'token' not in SessionStore(str(tmp_path)).load()
+    assert not os.path.exists(store.legacy_key_path)
+
+
+def test_rated_queue_ids_survive_a_relaunch_for_the_same_student(tmp_path):
+    store = SessionStore(str(tmp_path))
+    store.save(STUDENT)
+    store.update(rated_queue_ids=[41, 42])
+
+    relaunched = SessionStore(str(tmp_path))
+    relaunched.load()
+    relaunched.save(dict(STUDENT, full_name='Ana C.'))
+    assert SessionStore(str(tmp_path)).load()['rated_queue_ids'] == [41, 42]
+
+    relaunched.save(dict(STUDENT, id=8))
+    assert 'rated_queue_ids' not in SessionStore(str(tmp_path)).load()
@@ -0,0 +1,82 @@
+from utils import ssid_providers
+from utils.ssid_providers import LinuxWirelessProvider, SSIDProvider, select_provider
+
+
+def wext(answers):
+    """LinuxWirelessProvider whose ioctl answers come from {ifname: ssid / '' / None}"""
+    provider = LinuxWirelessProvider()
+    provider.interfaces = lambda: list(answers)
+    provider.read_essid = answers.get
+    return provider
+
+
+def test_wext_needs_an_interface_that_answers():
+    assert not wext({}).available()
+    assert not wext({'wlan0': None}).available()
+    assert wext({'wlan0': ''}).available()
+    assert wext({'wlan0': None, 'wlan1': 'CampusNet'}).available()
+
+
+def test_wext_ssid_skips_unassociated_interfaces():
+    assert wext({'wlan0': '', 'wlan1': 'CampusNet'}).get_ssid() == 'CampusNet'
+    assert wext({'wlan0': ''}).get_ssid() is None
+
+
+def test_select_provider_falls_back_when_wext_does_not_answer(monkeypatch):
+    class NoWext(LinuxWirelessProvider):
+        def interfaces(self):
+            return ['wlan0']
+
+        def read_essid(self, ifname):
+            return None
+
+    class Backup(SSIDProvider):
+        name = 'backup'
+        cost = 50
+        platforms = ('linux',)
+
+        def available(self):
+            return True
+
+    monkeypatch.setattr(ssid_providers, 'PROVIDERS', [Backup, NoWext])
+    assert select_provider('linux').name == 'backup'
+
+
+HARDWARE_PORTS = """
+Hardware Port: Ethernet
+Device: en0
+Ethernet Address: 00:11:22:33:44:55
+
+Hardware Port: Wi-Fi
+Device: en1
+Ethernet Address: 66:77:88:99:aa:bb
+
+VLAN Configurations
+===================
+"""
+
+
+def fake_networksetup(monkeypatch, ports, answers):
+    calls = []
+
+    def check_output(command, **kwargs):
+        calls.append(tuple(command))
+        if command[1] == '-listallhardwareports':
+            return ports
+        return answers[command[2]]
+    monkeypatch.setattr(ssid_providers.shutil, 'which', lambda name: '/usr/sbin/' + name)
+    monkeypatch.setattr(ssid_providers.subprocess, 'check_output', check_output)
+    return calls
+
+
+def test_networksetup_finds_the_wifi_device(monkeypatch):
+    calls = fake_networksetup(monkeypatch, HARDWARE_PORTS, {'en1': 'Current Wi-Fi Network: CampusNet\n'})
+    provider = ssid_providers.MacNetworksetupProvider()
+    assert provider.available()
+    assert provider.get_ssid() == 'CampusNet'
+    assert calls[-1] == ('networksetup', '-getairportnetwork', 'en1')
+
+
+def test_networksetup_without_a_wifi_port_is_unavailable(monkeypatch):
+    fake_networksetup(monkeypatch, HARDWARE_PORTS.replace('Wi-Fi', 'Thunderbolt Bridge'), {})
+    assert not ssid_providers.MacNetworksetupProvider().available()
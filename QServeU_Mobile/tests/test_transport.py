@@ -0,0 +1,131 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from utils import transport
+from utils.metrics import metrics
+from utils.transport import LIMITS, TIMEOUT, MeteredTransport, RetryTransport, create_http_client, install
+
+BODY = b'[{"id": 1}]'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answers with the next status in server.statuses (200 once they run out)"""
+
+    def reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        server = self.server
+        with server.lock:
+            server.seen.append((self.command, self.path, dict(self.headers)))
+            status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = do_POST = do_PATCH = reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(transport.time, 'sleep', lambda seconds: None)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.statuses = []
+    httpd.seen = []
+    httpd.lock = threading.Lock()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get_is_retried_on_503(server):
+    server.statuses = [503, 503]
+    with create_http_client(base_url=server.url, retries=2) as client:
+        response = client.get('/rest/v1/queues')
+    assert response.status_code == 200
+    assert response.json() == [{'id': 1}]
+    assert len(server.seen) == 3
+
+
+def test_get_gives_up_after_the_retries(server):
+    server.statuses = [503, 503, 503, 503]
+    with create_http_client(base_url=server.url, retries=2) as client:
+        assert client.get('/rest/v1/queues').status_code == 503
+    assert len(server.seen) == 3
+
+
+@pytest.mark.parametrize('method', ['POST', 'PATCH'])
+def test_writes_are_never_retried(server, method):
+    server.statuses = [503]
+    with create_http_client(base_url=server.url, retries=2) as client:
+        response = client.request(method, '/rest/v1/queues', json={'status': 'cancelled'})
+    assert response.status_code == 503
+    assert [seen[0] for seen in server.seen] == [method]
+
+
+def test_connection_errors_are_retried_for_reads_only(monkeypatch):
+    monkeypatch.setattr(transport.time, 'sleep', lambda seconds: None)
+    calls = []
+
+    class Refusing(httpx.BaseTransport):
+        def handle_request(self, request):
+            calls.append(request.method)
+            raise httpx.ConnectError('refused', request=request)
+
+    client = httpx.Client(transport=RetryTransport(Refusing(), retries=2))
+    for method in ('GET', 'POST'):
+        with pytest.raises(httpx.ConnectError):
+            client.request(method, 'http://127.0.0.1:9/')
+    assert calls == ['GET'] * 3 + ['POST']
+
+
+def test_client_uses_timeouts_and_pool_limits(server):
+    with create_http_client(base_url=server.url) as client:
+        assert client.timeout == TIMEOUT
+        pool = client._transport.transport.transport._pool
+        assert pool._max_connections == LIMITS.max_connections
+        assert pool._max_keepalive_connections == LIMITS.max_keepalive_connections
+        assert pool._keepalive_expiry == LIMITS.keepalive_expiry
+
+
+def test_install_swaps_the_postgrest_session(server):
+    old = httpx.Client(base_url=server.url + '/rest/v1', headers={'apikey': 'anon-key'})
+    client = SimpleNamespace(postgrest=SimpleNamespace(session=old))
+
+    session = install(client)
+    assert client.postgrest.session is session is not old
+    assert old.is_closed
+    assert isinstance(session._transport, RetryTransport)
+
+    session.get('/queues')
+    method, path, headers = server.seen[0]
+    assert path == '/rest/v1/queues'
+    assert headers['apikey'] == 'anon-key'
+    session.close()
+
+
+def test_metered_transport_counts_bytes_and_attempts(server):
+    server.statuses = [503]
+    client = httpx.Client(base_url=server.url,
+                          transport=RetryTransport(MeteredTransport(httpx.HTTPTransport()), retries=2))
+    with metrics.trace('test.transport') as span:
+        client.get('/rest/v1/queues')
+        client.post('/rest/v1/queues', content=b'{"a": 1}')
+    client.close()
+
+    assert span.round_trips == 3
+    assert span.bytes_sent == len(b'{"a": 1}')
+    # The 503 body is closed unread; the two answered bodies are counted
+    assert span.bytes_received == 2 * len(BODY)
+    assert span.errors == {'HTTP 503': 1}
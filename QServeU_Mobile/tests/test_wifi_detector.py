@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+
+class StaticProvider:
+    name = 'static'
+
+    def __init__(self, ssid):
+        self.ssid = ssid
+        self.calls = 0
+
+    def get_ssid(self):
+        self.calls += 1
+        return self.ssid
+
+
+@pytest.fixture
+def detector(clock):
+    from utils.wifi_detector import WiFiDetector
+    wifi = WiFiDetector(ttl=0.01)
+    wifi.provider = StaticProvider('CampusNet')
+    wifi.provider_selected = True
+    yield wifi
+    wifi.stop_monitor()
+
+
+def monitor_threads():
+    return [t for t in threading.enumerate() if t.name == 'qserveu-wifi' and t.is_alive()]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_monitor_runs_only_while_subscribed(clock, detector):
+    seen = []
+    assert not detector.monitoring
+    detector.subscribe(seen.append)
+    assert detector.monitoring
+    assert wait_for(lambda: clock.events)
+    clock.run()
+    assert seen == ['CampusNet']
+
+    detector.unsubscribe(seen.append)
+    assert not detector.monitoring
+    assert wait_for(lambda: not monitor_threads())
+
+
+def test_pause_stops_probing_and_resume_restarts(detector):
+    detector.subscribe(lambda ssid: None)
+    detector.pause()
+    assert wait_for(lambda: not monitor_threads())
+    calls = detector.provider.calls
+    time.sleep(0.05)
+    assert detector.provider.calls == calls
+
+    detector.subscribe(lambda ssid: None)
+    assert not detector.monitoring
+    detector.resume()
+    assert detector.monitoring
+    assert wait_for(lambda: detector.provider.calls > calls)
+
+
+def test_restart_never_leaves_two_threads(detector):
+    callback = lambda ssid: None
+    for _ in range(20):
+        detector.subscribe(callback)
+        detector.unsubscribe(callback)
+    detector.subscribe(callback)
+    assert wait_for(lambda: len(monitor_threads()) == 1)
+
+
+def test_resume_without_subscribers_stays_stopped(detector):
+    detector.pause()
+    detector.resume()
+    assert not detector.monitoring
+
+
+def test_cached_ssid_before_the_first_probe_probes_inline(detector):
+    entered, gate = threading.Event(), threading.Event()
+    slow = StaticProvider('CampusNet')
+    slow.get_ssid = lambda: entered.set() or (gate.wait(2) and 'CampusNet')
+    detector.provider = slow
+    detector.subscribe(lambda ssid: None)
+    assert entered.wait(2)
+    assert not detector.cached_at
+
+    detector.provider = StaticProvider('CampusNet')
+    assert detector.get_cached_ssid() == 'CampusNet'
+    gate.set()
+    assert wait_for(lambda: detector.cached_at)
+    calls = detector.provider.calls
+    assert detector.get_cached_ssid() == 'CampusNet'
+    assert detector.provider.calls == calls
@@ -0,0 +1,93 @@
+"""
+Canvas instruction allocations per layout pass: the old clear-and-redraw widgets vs the
+persistent-instruction RoundedButton / RoundedSpinner / RoundedInput.
+
+    cd QServeU_Mobile && python -m tools.bench_canvas [passes]
+
+Needs a display (or xvfb-run) because main.py opens the Kivy window on import.
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.graphics import Color, RoundedRectangle, Line  # noqa: E402
+
+import main  # noqa: E402
+
+
+# ---------------- The pre-change update methods ----------------
+
+class LegacyRoundedButton(main.RoundedButton):
+    def update_rect(self, *args):
+        self.canvas.before.clear()
+        with self.canvas.before:
+            if self.state == 'down':
+                r, g, b, a = self.custom_bg_color
+                Color(r * 0.8, g * 0.8, b * 0.8, a)
+            else:
+                Color(*self.custom_bg_color)
+            RoundedRectangle(pos=self.pos, size=self.size, radius=self.radius)
+
+
+class LegacyRoundedSpinner(main.RoundedSpinner):
+    def update_rect(self, *args):
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(*self.custom_bg_color)
+            RoundedRectangle(pos=self.pos, size=self.size, radius=[9])
+
+
+class LegacyRoundedInput(main.RoundedInput):
+    def update_graphics(self, *args):
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(1, 1, 1, 1)
+            RoundedRectangle(pos=self.pos, size=self.size, radius=[25])
+            if self.focus:
+                Color(*main.THEME_COLOR)
+                Line(rounded_rectangle=(self.x, self.y, self.width, self.height, 25), width=1.3)
+            else:
+                Color(0.6, 0.6, 0.6, 1)
+                Line(rounded_rectangle=(self.x, self.y, self.width, self.height, 25), width=1)
+
+
+def run(widgets, passes):
+    """Move/resize every widget `passes` times; count instruction objects that did not exist before"""
+    seen = {}
+    for widget in widgets:
+        for instruction in widget.canvas.before.children:
+            seen[id(instruction)] = instruction
+
+    allocated = 0
+    t0 = time.perf_counter()
+    for i in range(passes):
+        for widget in widgets:
+            widget.pos = (i, i)
+            widget.size = (300 + i % 7, 50 + i % 3)
+            for instruction in widget.canvas.before.children:
+                if id(instruction) not in seen:
+                    # Keep a reference so ids can't be recycled and counted twice
+                    seen[id(instruction)] = instruction
+                    allocated += 1
+    elapsed = time.perf_counter() - t0
+    return allocated, elapsed
+
+
+def main_bench(passes=500):
+    main.register_fonts()
+    cases = [
+        ('before', [LegacyRoundedButton(text='A'), LegacyRoundedSpinner(text='B'), LegacyRoundedInput()]),
+        ('after', [main.RoundedButton(text='A'), main.RoundedSpinner(text='B'), main.RoundedInput()]),
+    ]
+    print(f"{passes} layout passes over 1 button + 1 spinner + 1 input")
+    for label, widgets in cases:
+        allocated, elapsed = run(widgets, passes)
+        print(f"{label:>6}: {allocated:6d} instructions allocated "
+              f"({allocated / passes:.1f}/pass), {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
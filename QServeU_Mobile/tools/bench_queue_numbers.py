@@ -0,0 +1,133 @@
+"""
+Queue-number allocation: the old create_queue logic (build sets from the fetched rows, scan
+from 1) vs QueueNumberAllocator (utils/queue_numbers.py), on a steady-state office where one
+queue finishes and one is issued per step.
+
+    cd QServeU_Mobile && python -m tools.bench_queue_numbers [--active 200 900 1500] [--steps 2000]
+
+Two allocator timings are reported:
+  rows   - the path the app actually runs in create_queue_client_side: from_rows() over the
+           office's active and cooling rows, then one acquire(); compare with "scan"
+  pool   - acquire() alone on an allocator kept alive across steps (a long-running process)
+Both see the same rows as the old scan. Per call, "rows" is slower than "scan" (parsing the
+cooling rows' timestamps dominates; a few ms at most next to the network round trip); what the
+app path gains is correctness: no duplicates past 999, cooldowns honoured. Every allocator answer is also checked against a
+reference "lowest number that is neither active nor cooling down" (no 999 cap), and the old
+scan's collisions past 999 are counted.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+
+from utils.queue_numbers import QueueNumberAllocator
+
+PREFIX = 'A'
+EPOCH = 1_700_000_000.0
+
+
+def legacy_next(rows, prefix=PREFIX):
+    """The pre-allocator create_queue logic: sets from the fetched rows, scan from 1, stop at 999"""
+    used_numbers = set()
+    cooldown_numbers = set()
+    for q in rows:
+        try:
+            num = int(q['queue_number'].replace(prefix, ''))
+        except ValueError:
+            continue
+        if q['status'] in ('waiting', 'serving'):
+            used_numbers.add(num)
+        else:
+            cooldown_numbers.add(num)
+    if not used_numbers:
+        cooldown_numbers = set()
+    next_num = 1
+    while (next_num in used_numbers) or (next_num in cooldown_numbers):
+        next_num += 1
+        if next_num > 999: break
+    return next_num
+
+
+def reference_next(active, cooling):
+    blocked = set(active) | (set(cooling) if active else set())
+    num = 1
+    while num in blocked:
+        num += 1
+    return num
+
+
+def office_rows(active, finished_at, width=3):
+    """The rows create_queue_client_side fetches: active queues + ones finished within the cooldown"""
+    rows = [{'queue_number': f"{PREFIX}{n:0{width}d}", 'status': 'waiting'} for n in active]
+    for n, t in finished_at.items():
+        stamp = datetime.fromtimestamp(t, timezone.utc).isoformat()
+        rows.append({'queue_number': f"{PREFIX}{n:0{width}d}", 'status': 'completed',
+                     'completed_at': stamp, 'cancelled_at': None})
+    return rows
+
+
+def run(active_count, steps, cooldown, seed):
+    rng = random.Random(seed)
+    allocator = QueueNumberAllocator(PREFIX, cooldown=cooldown)
+    now = EPOCH
+    for _ in range(active_count):
+        allocator.acquire(now)
+
+    # Mirror state for the rows and the reference: active set + {num: finished_at}
+    active = set(allocator.active)
+    finished_at = {}
+    legacy_time = rows_time = pool_time = 0.0
+    collisions = mismatches = 0
+
+    for _ in range(steps):
+        now += 1.0
+        done = rng.choice(sorted(active))
+        active.discard(done)
+        finished_at[done] = now
+        allocator.release(done, now)
+        finished_at = {n: t for n, t in finished_at.items() if t + cooldown > now}
+        rows = office_rows(active, finished_at)
+        expected = reference_next(active, finished_at)
+
+        t0 = time.perf_counter()
+        legacy = legacy_next(rows)
+        legacy_time += time.perf_counter() - t0
+        if legacy in active:
+            collisions += 1
+
+        t0 = time.perf_counter()
+        rebuilt = QueueNumberAllocator.from_rows(PREFIX, rows, now=now, cooldown=cooldown)
+        from_rows_num = rebuilt.acquire(now)
+        rows_time += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        num = allocator.acquire(now)
+        pool_time += time.perf_counter() - t0
+
+        if num != expected or from_rows_num != expected:
+            mismatches += 1
+        active.add(num)
+        finished_at.pop(num, None)
+
+    return legacy_time, rows_time, pool_time, collisions, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Queue-number allocation benchmark')
+    parser.add_argument('--active', type=int, nargs='+', default=[50, 500, 990, 1500])
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--cooldown', type=float, default=600, help='seconds (one step = 1 s)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    print(f"{args.steps} release+acquire steps, cooldown {args.cooldown:g} steps (us/op)")
+    print(f"{'active':>7}{'scan':>10}{'rows':>10}{'pool':>10}{'scan dupes':>12}{'wrong':>8}")
+    for active_count in args.active:
+        legacy, rows, pool, collisions, mismatches = run(active_count, args.steps, args.cooldown, args.seed)
+        print(f"{active_count:>7}{legacy / args.steps * 1e6:>10.2f}{rows / args.steps * 1e6:>10.2f}"
+              f"{pool / args.steps * 1e6:>10.2f}{collisions:>12}{mismatches:>8}")
+
+
+if __name__ == '__main__':
+    main()
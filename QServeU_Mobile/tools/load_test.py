@@ -0,0 +1,190 @@
+"""
+Load test for MobileDatabase against the in-process fake Supabase (utils/fake_supabase.py).
+Each simulated student is its own device (own MobileDatabase + client) hitting one shared
+server: create_queue -> get_student_queue (polling) -> sometimes cancel_student_queue,
+while a staff thread serves the front of each office's line.
+
+    cd QServeU_Mobile && python -m tools.load_test --students 50 --offices 3 --latency 0.02
+
+Reports throughput, p50/p99 latency and round trips per operation, and queue numbers that
+were handed to two active students of the same office at once.
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from utils.database import MobileDatabase
+from utils.fake_supabase import SCHEMA, FakeServer
+from utils.metrics import metrics
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, students=20, offices=2, rounds=3, polls=3, cancel_rate=0.3,
+                 latency=0.01, jitter=0.01, serve_interval=0.05, seed=None):
+        self.students = students
+        self.offices = offices
+        self.rounds = rounds
+        self.polls = polls
+        self.cancel_rate = cancel_rate
+        self.serve_interval = serve_interval
+        self.random = random.Random(seed)
+        self.server = FakeServer({
+            'offices': [{'id': i, 'name': f'Office {i}', 'queue_prefix': chr(ord('A') + i - 1)}
+                        for i in range(1, offices + 1)],
+            'queues': [],
+            'feedback': [],
+        }, latency=latency, jitter=jitter, schema=SCHEMA)
+        self.latencies = defaultdict(list)
+        self.round_trips = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.lock = threading.Lock()
+        self.running = False
+
+    # ---------------- Simulation ----------------
+
+    def device(self):
+        db = MobileDatabase(connect=False)
+        db.client = self.server.client()
+        db.use_queue_rpc = db.use_dashboard_rpc = False
+        return db
+
+    def timed(self, db, op, func, *args):
+        before = db.client.round_trips
+        t0 = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - t0
+        with self.lock:
+            self.latencies[op].append(elapsed)
+            self.round_trips[op].append(db.client.round_trips - before)
+        return result
+
+    def student(self, student_id):
+        db = self.device()
+        rng = random.Random(self.random.random())
+        try:
+            for _ in range(self.rounds):
+                office_id = rng.randint(1, self.offices)
+                result = self.timed(db, 'create_queue', db.create_queue, student_id, office_id, 'load test')
+                if not result.get('success'):
+                    with self.lock:
+                        self.failures['create_queue'] += 1
+                    continue
+                queue_id = result['queue']['id']
+                for _ in range(self.polls):
+                    self.timed(db, 'get_student_queue', db.get_student_queue, student_id)
+                if rng.random() < self.cancel_rate:
+                    self.timed(db, 'cancel_student_queue', db.cancel_student_queue, queue_id, student_id)
+                else:
+                    self.wait_until_done(db, student_id, queue_id)
+        finally:
+            db.close()
+
+    def wait_until_done(self, db, student_id, queue_id):
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            queue = self.timed(db, 'get_student_queue', db.get_student_queue, student_id)
+            if not queue or queue['id'] != queue_id or queue['status'] not in ('waiting', 'serving'):
+                return
+            time.sleep(self.serve_interval)
+
+    def staff(self):
+        """Completes the serving ticket and calls the next waiting one, per office"""
+        client = self.server.client()
+        while self.running:
+            for office_id in range(1, self.offices + 1):
+                now = datetime.now(timezone.utc).isoformat()
+                client.table('queues').update({'status': 'completed', 'completed_at': now}) \
+                    .eq('office_id', office_id).eq('status', 'serving').execute()
+                waiting = client.table('queues').select('id').eq('office_id', office_id) \
+                    .eq('status', 'waiting').order('created_at').limit(1).execute()
+                if waiting.data:
+                    client.table('queues').update({'status': 'serving'}) \
+                        .eq('id', waiting.data[0]['id']).eq('status', 'waiting').execute()
+            time.sleep(self.serve_interval)
+
+    def run(self):
+        self.running = True
+        staff = threading.Thread(target=self.staff, daemon=True)
+        staff.start()
+        threads = [threading.Thread(target=self.student, args=(f'S{i:04d}',)) for i in range(self.students)]
+        t0 = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - t0
+        self.running = False
+        staff.join()
+        return elapsed
+
+    # ---------------- Report ----------------
+
+    def duplicate_numbers(self):
+        """(office_id, number) pairs held by two queues whose active periods overlapped"""
+        end = datetime.now(timezone.utc).isoformat()
+        by_number = defaultdict(list)
+        for row in self.server.rows('queues'):
+            finished = row.get('completed_at') or row.get('cancelled_at') or end
+            by_number[(row['office_id'], row['queue_number'])].append((row['created_at'], finished))
+        duplicates = []
+        for key, spans in by_number.items():
+            spans.sort()
+            for (_, first_end), (second_start, _) in zip(spans, spans[1:]):
+                if second_start < first_end:
+                    duplicates.append(key)
+                    break
+        return duplicates
+
+    def report(self, elapsed):
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"{self.students} students x {self.rounds} rounds, {self.offices} offices, "
+              f"{self.server.latency * 1000:.0f}+{self.server.jitter * 1000:.0f} ms per round trip")
+        print(f"{total} operations in {elapsed:.2f} s ({total / elapsed:.1f} ops/s)")
+        print(f"{'operation':<22}{'calls':>7}{'p50 ms':>9}{'p99 ms':>9}{'trips/op':>10}{'failed':>8}")
+        for op in sorted(self.latencies):
+            values = self.latencies[op]
+            print(f"{op:<22}{len(values):>7}{percentile(values, 50) * 1000:>9.1f}"
+                  f"{percentile(values, 99) * 1000:>9.1f}{statistics.mean(self.round_trips[op]):>10.2f}"
+                  f"{self.failures.get(op, 0):>8}")
+        duplicates = self.duplicate_numbers()
+        print(f"duplicate active queue numbers: {len(duplicates)}"
+              + (f" e.g. {duplicates[:5]}" if duplicates else ''))
+        return duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MobileDatabase load test against the in-process fake')
+    parser.add_argument('--students', type=int, default=20)
+    parser.add_argument('--offices', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--polls', type=int, default=3)
+    parser.add_argument('--cancel-rate', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per round trip')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--serve-interval', type=float, default=0.05)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--metrics', help='write the per-method metrics snapshot (JSON) here')
+    args = parser.parse_args(argv)
+
+    test = LoadTest(students=args.students, offices=args.offices, rounds=args.rounds, polls=args.polls,
+                    cancel_rate=args.cancel_rate, latency=args.latency, jitter=args.jitter,
+                    serve_interval=args.serve_interval, seed=args.seed)
+    test.report(test.run())
+    if args.metrics and metrics.dump(args.metrics):
+        print(f"metrics written to {args.metrics}")
+
+
+if __name__ == '__main__':
+    main()
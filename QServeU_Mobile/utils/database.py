@@ -1,17 +1,79 @@
-from supabase import create_client
+import logging
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
-import bcrypt
 from datetime import date
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+
+from utils.metrics import instrument
+from utils.queue_numbers import QueueNumberAllocator
+from utils.response_cache import ResponseCache
+
+logger = logging.getLogger('qserveu')
 
 load_dotenv()
 
 
+def is_network_error(e):
+    """True when the request never got an answer (offline, DNS, timeout), as opposed to a server rejection"""
+    import httpx
+    return isinstance(e, (httpx.TransportError, OSError))
+
+
 class MobileDatabase:
     """Database handler for mobile app"""
 
-    def __init__(self):
+    # Columns login actually needs (the profile plus the hash to verify)
+    LOGIN_COLUMNS = 'id, student_id, full_name, email, course, year_level, password_hash'
+    # identifier -> students.id entries remembered for repeat logins
+    LOGIN_CACHE_SIZE = 32
+    # Queue fields the status screen, notifications and feedback form read
+    QUEUE_COLUMNS = 'id, office_id, queue_number, status, notes, created_at, offices(name)'
+    # Seconds a cached read may be served; our own writes invalidate it sooner
+    QUEUE_TTL = 2
+    OFFICE_TTL = 60
+    PROFILE_TTL = 30
+
+    def __init__(self, office_cache=None, outbox=None, wait_model=None, connect=True):
+        # utils.office_cache.OfficeCache; None = always read offices from the network
+        self.office_cache = office_cache
+        # utils.outbox.Outbox; None = offline writes fail immediately
+        self.outbox = outbox
+        # utils.eta.WaitTimeModel; None = no wait-time estimates
+        self.wait_model = wait_model
+
+        # Set QSERVEU_QUEUE_RPC=0 to force client-side queue allocation
+        self.use_queue_rpc = os.getenv('QSERVEU_QUEUE_RPC', '1') != '0'
+        self.use_dashboard_rpc = self.use_queue_rpc
+
+        # bcrypt work factor (QSERVEU_BCRYPT_ROUNDS, bcrypt's default is 12). Hashes with a
+        # different cost are upgraded on the next successful login.
+        self.bcrypt_rounds = int(os.getenv('QSERVEU_BCRYPT_ROUNDS', '12'))
+        # KDF runs on its own small pool: bcrypt releases the GIL, so the UI keeps drawing,
+        # and two workers keep a burst of logins from pinning every core on a phone.
+        self.kdf_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='qserveu-kdf')
+
+        self.login_ids = OrderedDict()
+        self.login_lock = threading.Lock()
+
+        # Read-through cache shared by the worker threads: identical reads a few ms apart
+        # become one request
+        self.cache = ResponseCache()
+
+        # connect=False leaves client creation to the startup pipeline (see connect())
+        self.client = None
+        self.http = None
+        if connect:
+            self.connect()
+
+    def connect(self):
+        """Create the Supabase client (supabase is imported here, off the import path of main.py)"""
+        from supabase import create_client
+
         url = os.getenv('SUPABASE_URL')
         key = os.getenv('SUPABASE_KEY')
 
@@ -31,25 +93,70 @@ class MobileDatabase:
             except:
                 self.client = None
 
+        # One pooled keep-alive (HTTP/2 when available) session with timeouts and read retries
+        if self.client is not None:
+            from utils import transport
+            try:
+                self.http = transport.install(self.client)
+            except Exception as e:
+                logger.warning("Pooled transport unavailable, using the default client: %s", e)
+
+    def close(self):
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+        self.kdf_pool.shutdown(wait=False)
+
     # ==================== AUTH ====================
 
     def hash_password(self, password):
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode(), salt).decode()
+        """Hash password using bcrypt (on the KDF pool)"""
+        return self.kdf_pool.submit(self._hash_password, password).result()
 
     def verify_password(self, password, hashed):
-        """Verify password against hash"""
+        """Verify password against hash (on the KDF pool)"""
+        return self.kdf_pool.submit(self._verify_password, password, hashed).result()
+
+    def _hash_password(self, password):
+        import bcrypt
+        salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
+        return bcrypt.hashpw(password.encode(), salt).decode()
+
+    @staticmethod
+    def _verify_password(password, hashed):
+        import bcrypt
         try:
             return bcrypt.checkpw(password.encode(), hashed.encode())
         except:
             return False
 
+    def needs_rehash(self, hashed):
+        """Plain-text or different-cost hashes get upgraded ('$2b$12$...' -> 12)"""
+        try:
+            return int(hashed.split('$')[2]) != self.bcrypt_rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def upgrade_password_hash(self, student_id, password):
+        """Re-hash with the configured cost; runs fire-and-forget after login"""
+        try:
+            self.client.table('students') \
+                .update({'password_hash': self._hash_password(password)}, returning='minimal') \
+                .eq('student_id', student_id) \
+                .execute()
+        except Exception as e:
+            logger.warning("Password rehash error: %s", e)
+
     def register_student(self, student_data):
         """Register new student"""
         try:
-            # Check if student ID exists
-            existing = self.client.table('students').select('id').eq('student_id', student_data['student_id']).execute()
+            # Check if student ID exists (one projected row; head=True responses carry no count
+            # through postgrest-py 0.17, their empty body parses as count=0)
+            existing = self.client.table('students') \
+                .select('id') \
+                .eq('student_id', student_data['student_id']) \
+                .limit(1) \
+                .execute()
             if existing.data:
                 return {'success': False, 'message': 'Student ID already exists'}
 
@@ -67,66 +174,181 @@ class MobileDatabase:
             response = self.client.table('students').insert(new_student).execute()
 
             if response.data:
-                return {'success': True, 'message': 'Registration successful', 'student': response.data[0]}
+                student = response.data[0]
+                student.pop('password_hash', None)
+                return {'success': True, 'message': 'Registration successful', 'student': student}
             return {'success': False, 'message': 'Registration failed'}
 
         except Exception as e:
             return {'success': False, 'message': str(e)}
 
     def login_student(self, identifier, password):
-        """Login student using Email OR Student ID (Two-Step Fix)"""
+        """Login student using Email OR Student ID in a single lookup"""
         try:
-            # STEP 1: Try to find user by Student ID
-            response = self.client.table('students').select('*').eq('student_id', identifier).execute()
+            student = self.find_login_student(identifier)
 
-            # STEP 2: If not found, try to find by Email
-            if not response.data:
-                response = self.client.table('students').select('*').eq('email', identifier).execute()
-
-            # If still no data, the user really doesn't exist
-            if not response.data:
+            # If no data, the user really doesn't exist
+            if not student:
                 return {'success': False, 'message': 'User not found'}
 
-            student = response.data[0]
-
             # STEP 3: Check Password
+            stored = student.get('password_hash') or ''
             # A. Try Plain Text (for old accounts or if hashing failed)
-            if student.get('password_hash') == password:
-                return {'success': True, 'message': 'Login successful', 'student': student}
-
             # B. Try Hashed Password (for new secure accounts)
-            if self.verify_password(password, student.get('password_hash', '')):
-                return {'success': True, 'message': 'Login successful', 'student': student}
-            else:
+            if stored != password and not self.verify_password(password, stored):
                 return {'success': False, 'message': 'Incorrect password'}
 
+            # Legacy plain-text or old-cost hash: upgrade in the background, don't make the user wait
+            if self.needs_rehash(stored):
+                self.kdf_pool.submit(self.upgrade_password_hash, student['student_id'], password)
+
+            student.pop('password_hash', None)
+            return {'success': True, 'message': 'Login successful', 'student': student}
+
         except Exception as e:
             print(f"Error logging in: {e}")
             return {'success': False, 'message': 'Login error'}
 
+    def find_login_student(self, identifier):
+        """
+        One query matching student_id OR email, projected to the columns the app uses.
+        Identifiers seen before on this device (shared kiosks) go straight to a primary-key lookup.
+        """
+        with self.login_lock:
+            student_pk = self.login_ids.get(identifier)
+            if student_pk is not None:
+                self.login_ids.move_to_end(identifier)
+
+        if student_pk is not None:
+            response = self.client.table('students').select(self.LOGIN_COLUMNS).eq('id', student_pk).execute()
+            # The row may have been deleted or its student_id/email changed since it was cached
+            if response.data and identifier in (response.data[0].get('student_id'), response.data[0].get('email')):
+                return response.data[0]
+            with self.login_lock:
+                self.login_ids.pop(identifier, None)
+
+        quoted = '"' + identifier.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        response = self.client.table('students') \
+            .select(self.LOGIN_COLUMNS) \
+            .or_(f'student_id.eq.{quoted},email.eq.{quoted}') \
+            .limit(2) \
+            .execute()
+        if not response.data:
+            return None
+
+        # Student ID wins over email, same priority as the old two-step lookup
+        student = next((row for row in response.data if row.get('student_id') == identifier), response.data[0])
+
+        with self.login_lock:
+            self.login_ids[identifier] = student['id']
+            self.login_ids.move_to_end(identifier)
+            while len(self.login_ids) > self.LOGIN_CACHE_SIZE:
+                self.login_ids.popitem(last=False)
+        return student
+
+    def get_student_profile(self, student_pk):
+        """Fresh profile for a resumed session; None if the account no longer exists"""
+        def load():
+            response = self.client.table('students') \
+                .select('id, student_id, full_name, email, course, year_level') \
+                .eq('id', student_pk) \
+                .execute()
+            return response.data[0] if response.data else None
+        return self.cache.get_or_load(('student', student_pk), load, self.PROFILE_TTL)
+
     # ==================== DATA & QUEUES ====================
 
     def get_offices(self):
-        try:
+        """Offices from the on-device cache when warm, otherwise from the network"""
+        if self.office_cache is not None:
+            if not self.office_cache.is_warm():
+                self.refresh_offices()
+            return self.office_cache.get_all()
+
+        def load():
             response = self.client.table('offices').select('*').execute()
             return response.data if response.data else []
+        try:
+            return self.cache.get_or_load(('office', 'all'), load, self.OFFICE_TTL)
         except Exception as e:
             print(f"Error fetching offices: {e}")
             return []
 
+    def get_office(self, office_id):
+        if self.office_cache is not None:
+            office = self.office_cache.get(office_id)
+            if office:
+                return office
+
+        def load():
+            response = self.client.table('offices').select('*').eq('id', office_id).execute()
+            return response.data[0] if response.data else None
+        return self.cache.get_or_load(('office', office_id), load, self.OFFICE_TTL)
+
+    def refresh_offices(self):
+        """
+        Revalidate the office cache: a cheap (row count, max updated_at) probe first,
+        the full table only if that stamp moved. Returns True when the offices changed.
+        """
+        cache = self.office_cache
+        if cache is None:
+            return False
+
+        try:
+            try:
+                # Descending order puts NULLs first in Postgres and postgrest-py has no
+                # nulls-last modifier, so leave unstamped rows out of the max and count
+                # them separately (an added or removed office still moves the stamp)
+                total = self.client.table('offices') \
+                    .select('id', count='exact') \
+                    .limit(1) \
+                    .execute()
+                stamp = self.client.table('offices') \
+                    .select('updated_at') \
+                    .not_.is_('updated_at', 'null') \
+                    .order('updated_at', desc=True) \
+                    .limit(1) \
+                    .execute()
+                latest = stamp.data[0]['updated_at'] if stamp.data else ''
+                version = f"{total.count}:{latest}"
+                if version == cache.version:
+                    return False
+            except Exception:
+                # No updated_at column: compare the content instead
+                version = None
+
+            response = self.client.table('offices').select('*').execute()
+            offices = response.data or []
+            if version is None:
+                version = 'sha1:' + hashlib.sha1(json.dumps(offices, sort_keys=True, default=str).encode()).hexdigest()
+            if version == cache.version:
+                return False
+
+            cache.replace(offices, version)
+            self.cache.invalidate('office')
+            return True
+
+        except Exception as e:
+            logger.warning("Error refreshing offices: %s", e)
+            return False
+
     def get_active_queue_count(self, student_id):
         """
         STRICT CHECK: Only returns true if student is actually Waiting or Serving.
         Ignores 'Cancelled' so students can request again.
         """
-        try:
+        def load():
             today = date.today().isoformat()
-            response = self.client.table('queues').select('*')\
+            # GET + limit(1): the exact count comes from Content-Range on a body that parses
+            response = self.client.table('queues').select('id', count='exact')\
                 .eq('student_id', student_id)\
                 .gte('created_at', today)\
                 .in_('status', ['waiting', 'serving'])\
+                .limit(1)\
                 .execute()
-            return len(response.data) if response.data else 0
+            return response.count or 0
+        try:
+            return self.cache.get_or_load(('queues', student_id, 'active_count'), load, self.QUEUE_TTL)
         except:
             return 0
 
@@ -135,11 +357,11 @@ class MobileDatabase:
         Get the student's latest queue.
         FIX: Look back 24 hours instead of just 'today' to fix timezone issues.
         """
-        try:
+        def load():
             # CHANGE THIS LINE: Instead of date.today(), go back 1 day
             yesterday = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
 
-            response = self.client.table('queues').select('*, offices(name)') \
+            response = self.client.table('queues').select(self.QUEUE_COLUMNS) \
                 .eq('student_id', student_id) \
                 .gte('created_at', yesterday) \
                 .order('created_at', desc=True) \
@@ -149,99 +371,120 @@ class MobileDatabase:
             if response.data:
                 queue = response.data[0]
                 if queue['status'] in ['waiting', 'serving', 'cancelled']:
+                    queue['people_ahead'] = self.get_people_ahead(queue) if queue['status'] == 'waiting' else 0
                     return queue
             return None
+        try:
+            return self.cache.get_or_load(('queues', student_id, 'latest'), load, self.QUEUE_TTL)
         except Exception as e:
             print(f"Error getting queue: {e}")
             return None
 
+    def get_people_ahead(self, queue):
+        """
+        Exact rank in the office's waiting line: waiting rows created before this one.
+        Exact count served by queues_office_waiting_idx (sql/002_queue_position_index.sql).
+        A GET limited to one row rather than head=True: postgrest-py 0.17 reads an empty HEAD
+        body as count=0, which would put everyone at the front of the line.
+        """
+        def load():
+            response = self.client.table('queues') \
+                .select('id', count='exact') \
+                .eq('office_id', queue['office_id']) \
+                .eq('status', 'waiting') \
+                .lt('created_at', queue['created_at']) \
+                .limit(1) \
+                .execute()
+            return response.count if response.count is not None else 0
+        try:
+            return self.cache.get_or_load(('ahead', queue['office_id'], queue['created_at']), load, self.QUEUE_TTL)
+        except Exception as e:
+            logger.warning("Error getting position: %s", e)
+            return 0
+
     def create_queue(self, student_id, office_id, purpose):
-        """Create a new queue entry with Recycling Logic & Fix for Missing Column"""
+        """
+        Create a new queue entry.
+        Uses the create_queue_atomic RPC (sql/001_create_queue_atomic.sql) so the number,
+        the people-ahead count and the inserted row come back in one locked round trip.
+        Falls back to the client-side allocator if the function isn't installed.
+        """
         try:
-            # ====================================================
-            # 1. FIX: Use strict check (Ignores Cancelled Queues)
-            # ====================================================
-            # 1. Check if already in queue (NOW USING YOUR NEW FUNCTION)
-            if self.get_active_queue_count(student_id) > 0:  # <--- Now it is used!
-                active = self.get_student_queue(student_id)
-                num = active['queue_number'] if active else '???'
-                return {'success': False, 'message': f"You are already in queue {num}"}
+            return self.allocate_queue(student_id, office_id, purpose)
+        finally:
+            self.forget_queue_state(student_id, office_id)
 
-            # 2. Get Office Details
-            office_resp = self.client.table('offices').select('*').eq('id', office_id).execute()
-            if not office_resp.data:
+    def allocate_queue(self, student_id, office_id, purpose):
+        if self.use_queue_rpc:
+            try:
+                res = self.client.rpc('create_queue_atomic', {
+                    'p_student_id': student_id,
+                    'p_office_id': office_id,
+                    'p_purpose': purpose
+                }).execute()
+
+                if isinstance(res.data, dict) and 'success' in res.data:
+                    return res.data
+                return {'success': False, 'message': "Database insert failed"}
+
+            except Exception as e:
+                # PGRST202 = function not found (migration not applied yet)
+                if getattr(e, 'code', None) != 'PGRST202':
+                    logger.warning("Create Queue Error: %s", e)
+                    return {'success': False, 'message': str(e)}
+                logger.info("create_queue_atomic missing, using client-side allocation")
+                self.use_queue_rpc = False
+
+        return self.create_queue_client_side(student_id, office_id, purpose)
+
+    def create_queue_client_side(self, student_id, office_id, purpose):
+        """Fallback allocator: all queue reads are batched into a single query"""
+        try:
+            # 1. Get Office Details (cached on the device)
+            office_data = self.get_office(office_id)
+            if not office_data:
                 return {'success': False, 'message': "Office not found"}
 
-            office_data = office_resp.data[0]
             prefix = office_data.get('queue_prefix', 'Q')
 
-            # --- LOGIC START: FIND AVAILABLE NUMBER (YOUR ORIGINAL LOGIC) ---
-
-            # A. Get ACTIVE numbers (Strictly Unavailable)
-            active_q_resp = self.client.table('queues') \
-                .select('queue_number') \
-                .eq('office_id', office_id) \
-                .in_('status', ['waiting', 'serving']) \
+            # 2. ONE read for: the student's active queue (any office, today),
+            #    this office's active numbers, its cooldown numbers and its waiting count
+            today = date.today().isoformat()
+            ten_mins_ago = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+
+            office_filter = (
+                f'and(office_id.eq.{office_id},'
+                f'or(status.in.(waiting,serving),'
+                f'and(status.eq.completed,completed_at.gt."{ten_mins_ago}"),'
+                f'and(status.eq.cancelled,cancelled_at.gt."{ten_mins_ago}")))'
+            )
+            student_filter = f'and(student_id.eq.{student_id},status.in.(waiting,serving),created_at.gte.{today})'
+
+            rows_resp = self.client.table('queues') \
+                .select('student_id, office_id, queue_number, status, created_at, completed_at, cancelled_at') \
+                .or_(f'{office_filter},{student_filter}') \
                 .execute()
+            rows = rows_resp.data or []
+
+            # A. Strict check: already Waiting or Serving today? (Ignores Cancelled)
+            mine = [r for r in rows
+                    if r['student_id'] == student_id
+                    and r['status'] in ('waiting', 'serving')
+                    and (r.get('created_at') or '') >= today]
+            if mine:
+                mine.sort(key=lambda r: r.get('created_at') or '', reverse=True)
+                num = mine[0].get('queue_number') or '???'
+                return {'success': False, 'message': f"You are already in queue {num}"}
 
-            used_numbers = set()
-            for q in active_q_resp.data:
-                try:
-                    num = int(q['queue_number'].replace(prefix, ''))
-                    used_numbers.add(num)
-                except:
-                    continue
-
-            # B. Get COOLDOWN numbers (Finished < 10 mins ago)
-            cooldown_numbers = set()
-
-            if len(used_numbers) > 0:
-                ten_mins_ago = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
-
-                # Query 1: Recently Completed
-                completed_resp = self.client.table('queues') \
-                    .select('queue_number') \
-                    .eq('office_id', office_id) \
-                    .eq('status', 'completed') \
-                    .gt('completed_at', ten_mins_ago) \
-                    .execute()
-
-                # Query 2: Recently Cancelled
-                cancelled_resp = self.client.table('queues') \
-                    .select('queue_number') \
-                    .eq('office_id', office_id) \
-                    .eq('status', 'cancelled') \
-                    .gt('cancelled_at', ten_mins_ago) \
-                    .execute()
-
-                # Combine results
-                for q in (completed_resp.data + cancelled_resp.data):
-                    try:
-                        num = int(q['queue_number'].replace(prefix, ''))
-                        cooldown_numbers.add(num)
-                    except:
-                        continue
-
-            # C. Find lowest available number
-            next_num = 1
-            while (next_num in used_numbers) or (next_num in cooldown_numbers):
-                next_num += 1
-                if next_num > 999: break
-
-            queue_number = f"{prefix}{next_num:03d}"
-
-            # --- LOGIC END ---
-
-            # 4. Count Wait
-            count_resp = self.client.table('queues') \
-                .select('*', count='exact') \
-                .eq('office_id', office_id) \
-                .eq('status', 'waiting') \
-                .execute()
+            # B. This office's numbers -> free-number pool (active, cooling down, free)
+            office_rows = [q for q in rows if q['office_id'] == office_id]
+            people_ahead = sum(1 for q in office_rows if q['status'] == 'waiting')
+            allocator = QueueNumberAllocator.from_rows(prefix, office_rows)
 
-            people_ahead = count_resp.count if count_resp.count is not None else 0
+            # C. Lowest available number (widens past 999 instead of reusing a taken one)
+            queue_number = allocator.format(allocator.acquire())
 
-            # 5. Insert
+            # 3. Insert
             new_queue = {
                 'student_id': student_id,
                 'office_id': office_id,
@@ -264,6 +507,99 @@ class MobileDatabase:
             print(f"Create Queue Error: {e}")
             return {'success': False, 'message': str(e)}
 
+    @staticmethod
+    def parse_queue_number(queue_number, prefix):
+        """'R007' -> 7 for prefix 'R'; None if it doesn't belong to this prefix"""
+        return QueueNumberAllocator(prefix).parse(queue_number)
+
+    def get_student_dashboard(self, student_id):
+        """
+        Everything the status screen needs in one round trip:
+        {'active': queue or None, 'unrated': completed queue without feedback or None}.
+        Uses the student_dashboard RPC (sql/003_student_dashboard.sql); falls back to
+        one joined select when the function isn't installed.
+        """
+        def load():
+            if self.use_dashboard_rpc:
+                try:
+                    res = self.client.rpc('student_dashboard', {'p_student_id': student_id}).execute()
+                    data = res.data if isinstance(res.data, dict) else {}
+                    return {'active': data.get('active'), 'unrated': data.get('unrated')}
+                except Exception as e:
+                    if getattr(e, 'code', None) != 'PGRST202':
+                        raise
+                    logger.info("student_dashboard missing, using joined select")
+                    self.use_dashboard_rpc = False
+            return self.get_student_dashboard_client_side(student_id)
+
+        try:
+            return self.cache.get_or_load(('queues', student_id, 'dashboard'), load, self.QUEUE_TTL)
+        except Exception as e:
+            logger.warning("Error loading dashboard: %s", e)
+            return {'active': None, 'unrated': None}
+
+    def get_student_dashboard_client_side(self, student_id):
+        """Fallback: last 24h of queues plus completed ones, with office name and feedback joined in"""
+        yesterday = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+
+        response = self.client.table('queues') \
+            .select(f'{self.QUEUE_COLUMNS}, feedback(id)') \
+            .eq('student_id', student_id) \
+            .or_(f'created_at.gte."{yesterday}",status.eq.completed') \
+            .order('created_at', desc=True) \
+            .limit(10) \
+            .execute()
+        rows = response.data or []
+
+        # Same rule as get_student_queue: the latest queue of the last 24h, if still relevant
+        latest = rows[0] if rows and (rows[0].get('created_at') or '') >= yesterday[:19] else None
+        if latest and latest['status'] in ['waiting', 'serving', 'cancelled']:
+            latest.pop('feedback', None)
+            latest['people_ahead'] = self.get_people_ahead(latest) if latest['status'] == 'waiting' else 0
+            return {'active': latest, 'unrated': None}
+
+        # Same rule as get_pending_feedback: only the most recent completed queue counts
+        completed = next((r for r in rows if r['status'] == 'completed'), None)
+        if completed and not completed.pop('feedback', None):
+            return {'active': None, 'unrated': completed}
+
+        return {'active': None, 'unrated': None}
+
+    # ==================== WAIT-TIME ESTIMATES ====================
+
+    def get_completions(self, office_id, since=None, limit=1000):
+        """completed_at of the office's completed queues newer than `since` (last 14 days when None), oldest first"""
+        if since is None:
+            since = (datetime.now(timezone.utc) - timedelta(days=14)).isoformat()
+        response = self.client.table('queues') \
+            .select('completed_at') \
+            .eq('office_id', office_id) \
+            .eq('status', 'completed') \
+            .gt('completed_at', since) \
+            .order('completed_at') \
+            .limit(limit) \
+            .execute()
+        return response.data or []
+
+    def estimate_wait(self, queue):
+        """
+        Copy of a waiting `queue` with an 'eta' entry (see utils/eta.py), or the queue unchanged.
+        Pulls the office's new completions first when the model is due (at most every few minutes).
+        """
+        model = self.wait_model
+        if model is None or not queue or queue.get('status') != 'waiting':
+            return queue
+        office_id = queue['office_id']
+        try:
+            if model.needs_refresh(office_id):
+                if model.add_completions(office_id, self.get_completions(office_id, model.watermark(office_id))):
+                    model.save()
+            eta = model.estimate(office_id, queue.get('people_ahead') or 0)
+        except Exception as e:
+            logger.warning("Wait estimate error: %s", e)
+            return queue
+        return dict(queue, eta=eta) if eta else queue
+
     # ==================== FEEDBACK ====================
 
     def submit_feedback(self, office_id, student_id, queue_id, rating, comment):
@@ -276,19 +612,24 @@ class MobileDatabase:
                 'rating': rating,
                 'comment': comment
             }
-            response = self.client.table('feedback').insert(feedback_data).execute()
+            self.client.table('feedback').insert(feedback_data, returning='minimal').execute()
+            self.cache.invalidate('queues', student_id)
             return {'success': True, 'message': 'Feedback submitted'}
         except Exception as e:
+            if self.outbox is not None and is_network_error(e):
+                # One rating per queue: the queue id is the idempotency key
+                self.outbox.add('feedback', f"feedback:{queue_id}", feedback_data)
+                return {'success': True, 'queued': True, 'message': 'Feedback saved, will send when online'}
             print(f"Feedback error: {e}")
             return {'success': False, 'message': str(e)}
 
     def get_pending_feedback(self, student_id):
         """Check if there is a completed queue that hasn't been rated yet"""
-        try:
+        def load():
             # 1. Get the most recent 'completed' queue for this student
             # We also fetch the office name to show "Rate your visit to [Office]"
             queue_resp = self.client.table('queues') \
-                .select('*, offices(name)') \
+                .select(self.QUEUE_COLUMNS) \
                 .eq('student_id', student_id) \
                 .eq('status', 'completed') \
                 .order('created_at', desc=True) \
@@ -304,6 +645,7 @@ class MobileDatabase:
             feedback_resp = self.client.table('feedback') \
                 .select('id') \
                 .eq('queue_id', recent_queue['id']) \
+                .limit(1) \
                 .execute()
 
             # If NO feedback found, return this queue so the app knows to ask for a rating
@@ -311,7 +653,8 @@ class MobileDatabase:
                 return recent_queue
 
             return None
-
+        try:
+            return self.cache.get_or_load(('queues', student_id, 'pending_feedback'), load, self.QUEUE_TTL)
         except Exception as e:
             print(f"Error checking pending feedback: {e}")
             return None
@@ -329,10 +672,24 @@ class MobileDatabase:
                 updates['password_hash'] = self.hash_password(password)
 
             # Perform the update on Supabase
-            response = self.client.table('students').update(updates).eq('student_id', student_id).execute()
+            try:
+                response = self.client.table('students').update(updates).eq('student_id', student_id).execute()
+            except Exception as e:
+                if self.outbox is None or not is_network_error(e):
+                    raise
+                # Only the password hash is stored, never the password. Later edits merge into the pending one.
+                key = f"student:{student_id}"
+                pending = self.outbox.get(key) or {'student_id': student_id, 'updates': {}}
+                pending['updates'].update(updates)
+                self.outbox.add('student', key, pending)
+                return {'success': True, 'queued': True, 'message': 'Saved, will sync when online', 'updates': updates}
+            finally:
+                self.cache.invalidate('student')
 
             if response.data:
-                return {'success': True, 'message': 'Update successful', 'student': response.data[0]}
+                student = response.data[0]
+                student.pop('password_hash', None)
+                return {'success': True, 'message': 'Update successful', 'student': student}
 
             return {'success': False, 'message': 'Update failed or no changes made'}
 
@@ -342,29 +699,117 @@ class MobileDatabase:
 
     def cancel_student_queue(self, queue_id, student_id):
         """Allow a student to cancel their own waiting queue"""
+        cancelled_at = datetime.now(timezone.utc).isoformat()
         try:
-            # 1. Verify ownership and status first
-            # We only allow cancelling if it's 'waiting' (not serving or completed)
-            response = self.client.table('queues').select('*') \
-                .eq('id', queue_id) \
-                .eq('student_id', student_id) \
-                .eq('status', 'waiting') \
-                .execute()
-
-            if not response.data:
+            # Ownership + 'waiting' check and the update in one conditional write
+            # (not serving or completed); the affected-row count says whether it applied
+            applied = self.cancel_if_waiting(queue_id, student_id, cancelled_at)
+            self.forget_queue_state(student_id)
+            if not applied:
                 return {'success': False, 'message': 'Queue cannot be cancelled (might be serving already)'}
 
-            # 2. Update status to cancelled
-            update_data = {
-                'status': 'cancelled',
-                'cancelled_at': datetime.now(timezone.utc).isoformat(),
-                'notes': 'Cancelled by student'
-            }
-
-            self.client.table('queues').update(update_data).eq('id', queue_id).execute()
-
             return {'success': True, 'message': 'Queue cancelled successfully'}
 
         except Exception as e:
+            if self.outbox is not None and is_network_error(e):
+                self.outbox.add('cancel', f"cancel:{queue_id}",
+                                {'queue_id': queue_id, 'student_id': student_id, 'cancelled_at': cancelled_at})
+                return {'success': True, 'queued': True, 'message': 'Cancellation will be sent when online'}
             print(f"Cancel Error: {e}")
             return {'success': False, 'message': str(e)}
+
+    def cancel_if_waiting(self, queue_id, student_id, cancelled_at):
+        """Returns True if the student's queue was still waiting and is now cancelled"""
+        # The updated row comes back only if the filters matched. Not returning='minimal' +
+        # count: postgrest-py 0.17 reads the empty body as count=0, i.e. "nothing cancelled".
+        response = self.client.table('queues').update({
+            'status': 'cancelled',
+            'cancelled_at': cancelled_at,
+            'notes': 'Cancelled by student'
+        }) \
+            .eq('id', queue_id) \
+            .eq('student_id', student_id) \
+            .eq('status', 'waiting') \
+            .execute()
+        return len(response.data or []) > 0
+
+    def forget_queue_state(self, student_id, office_id=None):
+        """Drop cached queue reads after a write or a pushed change (office_id=None: every office)"""
+        self.cache.invalidate('queues', student_id)
+        if office_id is None:
+            self.cache.invalidate('ahead')
+        else:
+            self.cache.invalidate('ahead', office_id)
+
+    # ==================== OFFLINE OUTBOX ====================
+
+    def flush_outbox(self):
+        """
+        Send writes queued while offline: all feedback as one bulk upsert,
+        then each cancellation / profile update as a single conditional write.
+        Stops at the first network error (still offline) and leaves the rest queued.
+        Returns {'sent', 'dropped', 'pending', 'student', 'rejected_cancels'}.
+        """
+        summary = {'sent': 0, 'dropped': 0, 'pending': 0, 'student': None, 'rejected_cancels': []}
+        if self.outbox is None or not self.outbox.count():
+            return summary
+
+        try:
+            # 1. Feedback burst -> one request. The unique index on feedback.queue_id
+            #    (sql/004_outbox_idempotency.sql) makes replays harmless.
+            batch = self.outbox.pending('feedback')
+            if batch:
+                keys = [key for key, _, _ in batch]
+                try:
+                    self.client.table('feedback') \
+                        .upsert([payload for _, _, payload in batch], on_conflict='queue_id',
+                                ignore_duplicates=True, returning='minimal') \
+                        .execute()
+                    self.outbox.remove(keys)
+                    summary['sent'] += len(keys)
+                except Exception as e:
+                    if is_network_error(e):
+                        raise
+                    summary['dropped'] += len(self.outbox.mark_failed(keys, e))
+
+            # 2. Cancellations: only applies if the queue is still waiting
+            for key, _, payload in self.outbox.pending('cancel'):
+                try:
+                    applied = self.cancel_if_waiting(payload['queue_id'], payload['student_id'],
+                                                     payload['cancelled_at'])
+                    self.outbox.remove([key])
+                    summary['sent'] += 1
+                    if not applied:
+                        summary['rejected_cancels'].append(payload['queue_id'])
+                except Exception as e:
+                    if is_network_error(e):
+                        raise
+                    summary['dropped'] += len(self.outbox.mark_failed([key], e))
+
+            # 3. Profile updates (already merged per student)
+            for key, _, payload in self.outbox.pending('student'):
+                try:
+                    res = self.client.table('students').update(payload['updates']) \
+                        .eq('student_id', payload['student_id']) \
+                        .execute()
+                    self.outbox.remove([key])
+                    summary['sent'] += 1
+                    if res.data:
+                        summary['student'] = res.data[0]
+                        summary['student'].pop('password_hash', None)
+                except Exception as e:
+                    if is_network_error(e):
+                        raise
+                    summary['dropped'] += len(self.outbox.mark_failed([key], e))
+
+        except Exception as e:
+            logger.info("Outbox flush stopped (offline?): %s", e)
+
+        if summary['sent']:
+            self.cache.clear()
+        summary['pending'] = self.outbox.count()
+        return summary
+
+
+# Every public call is timed with its round trips, bytes and errors (see utils/metrics.py)
+instrument(MobileDatabase, 'db')
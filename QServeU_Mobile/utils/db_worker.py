@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from kivy.clock import Clock
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('qserveu')
+
+
+class DatabaseRequest:
+    """Handle for one call queued on the DatabaseWorker"""
+
+    def __init__(self, worker, tag):
+        self.worker = worker
+        self.tag = tag
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        # A request that already started still finishes on the worker,
+        # but its callbacks will never reach the UI.
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+        self.worker._forget(self)
+
+
+class DatabaseWorker:
+    """Runs MobileDatabase calls on a thread pool and delivers results on the Kivy main thread"""
+
+    def __init__(self, db, max_workers=4):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='qserveu-db')
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def submit(self, method, *args, on_result=None, on_error=None, tag=None, **kwargs):
+        """
+        Queue a call in the background.
+        `method` is either the name of a MobileDatabase method or any callable.
+        `on_result(result)` / `on_error(exception)` run on the main thread.
+        `tag` groups requests so a screen can cancel them all in on_leave. Only tag reads:
+        a cancelled write that hasn't started yet is dropped, and its callback never runs.
+        """
+        func = getattr(self.db, method) if isinstance(method, str) else method
+        request = DatabaseRequest(self, tag)
+        request.queued_at = time.perf_counter()
+
+        with self.lock:
+            self.pending.setdefault(tag, set()).add(request)
+
+        request.future = self.executor.submit(self._run, request, func, args, kwargs, on_result, on_error)
+        return request
+
+    def cancel(self, tag):
+        """Cancel every pending request registered under `tag`"""
+        with self.lock:
+            requests = self.pending.pop(tag, set())
+        for request in requests:
+            request.cancel()
+
+    def shutdown(self):
+        with self.lock:
+            tags = list(self.pending)
+        for tag in tags:
+            self.cancel(tag)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------------- INTERNALS ----------------
+
+    def _run(self, request, func, args, kwargs, on_result, on_error):
+        if request.cancelled:
+            return
+        # Time spent waiting for a free worker thread
+        metrics.observe('worker.queue_wait', time.perf_counter() - request.queued_at)
+        try:
+            result = func(*args, **kwargs)
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+        Clock.schedule_once(lambda dt: self._deliver(request, result, error, on_result, on_error))
+
+    def _forget(self, request):
+        with self.lock:
+            group = self.pending.get(request.tag)
+            if group is not None:
+                group.discard(request)
+                if not group:
+                    del self.pending[request.tag]
+
+    def _deliver(self, request, result, error, on_result, on_error):
+        self._forget(request)
+        if request.cancelled:
+            return
+
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                logger.warning("Background DB error: %s", error)
+            return
+
+        if on_result:
+            on_result(result)
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.queue_numbers import parse_timestamp
+
+logger = logging.getLogger('qserveu')
+
+
+class WaitTimeModel:
+    """
+    Per-office service-time model learned from completed queues, for "about N min" ETAs.
+    The time between consecutive completions at an office is one service interval; gaps
+    longer than MAX_GAP are treated as idle counters and dropped. Intervals are grouped by
+    local hour of day (offices are slower at lunch), falling back to the whole office when
+    an hour has too few samples.
+    Completion timestamps are cached on the device and extended incrementally (only rows
+    newer than the office's watermark are fetched). Statistics are computed with NumPy,
+    imported on first use; without NumPy estimate() returns None and the UI shows no ETA.
+    """
+
+    MAX_GAP = 20 * 60
+    MAX_AGE = 30 * 24 * 3600
+    MAX_SAMPLES = 2000
+    MIN_SAMPLES = 5
+    # Re-fetch an office's new completions at most this often (seconds)
+    REFRESH_INTERVAL = 300
+    # z for an ~80% interval
+    Z = 1.28
+
+    def __init__(self, path=None):
+        self.path = path
+        self.completions = {}
+        self.watermarks = {}
+        self.refreshed_at = {}
+        self.stats = {}
+        self.numpy_missing = False
+        self.lock = threading.Lock()
+
+    # ---------------- Storage ----------------
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.completions = {k: list(v) for k, v in data.get('completions', {}).items()}
+                self.watermarks = dict(data.get('watermarks', {}))
+                self.stats = {}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Wait model load error: %s", e)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = {'completions': self.completions, 'watermarks': self.watermarks}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning("Wait model save error: %s", e)
+
+    # ---------------- Learning ----------------
+
+    def needs_refresh(self, office_id, now=None):
+        now = time.time() if now is None else now
+        return now - self.refreshed_at.get(str(office_id), 0) >= self.REFRESH_INTERVAL
+
+    def watermark(self, office_id):
+        """completed_at of the newest row already learned (None: never fetched)"""
+        return self.watermarks.get(str(office_id))
+
+    def add_completions(self, office_id, rows, now=None):
+        """Merge newly completed rows ({'completed_at': ...}) for one office"""
+        key = str(office_id)
+        now = time.time() if now is None else now
+        stamps = [parse_timestamp(row.get('completed_at')) for row in rows]
+        stamps = [t for t in stamps if t is not None]
+        with self.lock:
+            self.refreshed_at[key] = now
+            if not stamps:
+                return 0
+            merged = sorted(set(self.completions.get(key, [])) | set(stamps))
+            merged = [t for t in merged if t >= now - self.MAX_AGE][-self.MAX_SAMPLES:]
+            self.completions[key] = merged
+            latest = max(rows, key=lambda row: parse_timestamp(row.get('completed_at')) or 0)
+            self.watermarks[key] = latest.get('completed_at')
+            self.stats.pop(key, None)
+        return len(stamps)
+
+    def office_stats(self, office_id):
+        """{hour or 'all': (mean_s, std_s, samples)} from the cached completions; None without NumPy"""
+        key = str(office_id)
+        with self.lock:
+            if key in self.stats:
+                return self.stats[key]
+            stamps = list(self.completions.get(key, []))
+        if self.numpy_missing:
+            return None
+        try:
+            import numpy as np
+        except ImportError:
+            logger.info("NumPy not installed, wait-time estimates disabled")
+            self.numpy_missing = True
+            return None
+
+        stats = {}
+        ts = np.asarray(stamps, dtype=float)
+        if ts.size >= 2:
+            gaps = np.diff(ts)
+            hours = ((ts[1:] + time.localtime().tm_gmtoff) // 3600 % 24).astype(int)
+            valid = (gaps > 0) & (gaps <= self.MAX_GAP)
+            gaps, hours = gaps[valid], hours[valid]
+            if gaps.size:
+                stats['all'] = (float(gaps.mean()), float(gaps.std()), int(gaps.size))
+                counts = np.bincount(hours, minlength=24)
+                sums = np.bincount(hours, weights=gaps, minlength=24)
+                squares = np.bincount(hours, weights=gaps * gaps, minlength=24)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means = sums / counts
+                    stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+                for hour in np.nonzero(counts)[0]:
+                    stats[int(hour)] = (float(means[hour]), float(stds[hour]), int(counts[hour]))
+
+        with self.lock:
+            self.stats[key] = stats
+        return stats
+
+    # ---------------- Prediction ----------------
+
+    def estimate(self, office_id, people_ahead, now=None):
+        """
+        {'minutes', 'low_minutes', 'high_minutes', 'confidence', 'samples'} for a student
+        with `people_ahead` waiting in front, or None when there is not enough history.
+        """
+        stats = self.office_stats(office_id)
+        if not stats:
+            return None
+        now = time.time() if now is None else now
+        hour = time.localtime(now).tm_hour
+        mean, std, samples = stats.get(hour) or (0.0, 0.0, 0)
+        if samples < self.MIN_SAMPLES:
+            mean, std, samples = stats.get('all', (0.0, 0.0, 0))
+        if samples < self.MIN_SAMPLES:
+            return None
+
+        # Everyone ahead, plus on average half of the person at the counter
+        k = max(people_ahead, 0) + 0.5
+        expected = k * mean
+        spread = self.Z * std * k ** 0.5
+        cv = std / mean if mean else 1.0
+        if samples >= 30 and cv < 0.75:
+            confidence = 'high'
+        elif samples >= 10 and cv < 1.5:
+            confidence = 'medium'
+        else:
+            confidence = 'low'
+        return {
+            'minutes': round(expected / 60, 1),
+            'low_minutes': round(max(expected - spread, 0) / 60, 1),
+            'high_minutes': round((expected + spread) / 60, 1),
+            'confidence': confidence,
+            'samples': samples,
+        }
+
+
+def format_eta(eta):
+    """'~12 min (8-16, medium confidence)'; '' when there is no estimate"""
+    if not eta:
+        return ''
+    minutes = eta['minutes']
+    if minutes < 1:
+        return 'less than a minute'
+    return (f"~{minutes:.0f} min ({eta['low_minutes']:.0f}-{eta['high_minutes']:.0f}, "
+            f"{eta['confidence']} confidence)")
@@ -0,0 +1,471 @@
+import copy
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.metrics import metrics
+
+
+# Columns of the real tables that MobileDatabase reads or writes
+SCHEMA = {
+    'offices': ['id', 'name', 'queue_prefix', 'created_at'],
+    'queues': ['id', 'student_id', 'office_id', 'queue_number', 'purpose', 'status', 'notes',
+               'created_at', 'completed_at', 'cancelled_at'],
+    'feedback': ['id', 'office_id', 'student_id', 'queue_id', 'rating', 'comment', 'created_at'],
+}
+
+
+class FakeAPIError(Exception):
+    """Stands in for postgrest's APIError (same .code / .message attributes)"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeServer:
+    """
+    In-process stand-in for the Supabase project behind MobileDatabase: tables are lists of
+    dicts behind one lock. Every execute() costs one round trip of `latency` seconds
+    (+ random `jitter`), spent outside the lock so concurrent clients interleave the way
+    real requests do. RPCs are looked up in `functions` (name -> func(server, params));
+    unknown names fail with PGRST202 so MobileDatabase takes its client-side fallbacks.
+    `schema` (table -> column names) declares columns no seeded row has yet; otherwise a
+    table's columns are whatever its rows have used.
+    With a `transport` (utils.realtime.LocalTransport), every row a client inserts, updates
+    or deletes is published to it after the write, like Supabase Realtime would.
+    Setting `offline` makes every request fail with ConnectionError before it reaches a table.
+    """
+
+    def __init__(self, tables=None, latency=0.0, jitter=0.0, functions=None, schema=None, transport=None):
+        self.tables = {}
+        self.columns = {name: set(columns) for name, columns in (schema or {}).items()}
+        self.ids = {}
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.functions = dict(functions or {})
+        self.transport = transport
+        self.changes = []
+        self.offline = False
+        for name, rows in (tables or {}).items():
+            self.seed(name, rows)
+
+    def seed(self, table, rows):
+        with self.lock:
+            for row in rows:
+                self.store(table, dict(row))
+            self.changes = []
+
+    def client(self):
+        return FakeClient(self)
+
+    def rows(self, table):
+        """Snapshot of a table (for assertions / reports)"""
+        with self.lock:
+            return copy.deepcopy(self.tables.get(table, []))
+
+    # ---------------- INTERNALS ----------------
+
+    def wait(self):
+        if self.offline:
+            raise ConnectionError('fake server is offline')
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def store(self, table, row):
+        """Insert one row; caller holds the lock"""
+        rows = self.tables.setdefault(table, [])
+        counter = self.ids.setdefault(table, itertools.count(1))
+        if row.get('id') is None:
+            row['id'] = next(counter)
+        row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        self.columns.setdefault(table, set()).update(row)
+        rows.append(row)
+        self.changed(table, [row])
+        return row
+
+    def changed(self, table, rows):
+        """Note written rows for the transport; caller holds the lock"""
+        if self.transport is not None:
+            self.changes.extend((table, copy.deepcopy(row)) for row in rows)
+
+    def publish_changes(self):
+        """Deliver the rows noted by changed(), outside the lock (callbacks may query again)"""
+        with self.lock:
+            changes, self.changes = self.changes, []
+        for table, row in changes:
+            self.transport.publish(table, row)
+
+    def check_column(self, table, column):
+        known = self.columns.get(table)
+        if known and column not in known:
+            raise FakeAPIError('42703', f'column {table}.{column} does not exist')
+
+
+class FakeClient:
+    """
+    What MobileDatabase sees as `self.client`; counts its own round trips and keeps a log
+    of the table requests it made (table, method, columns, head, count, limit, data) for tests.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.round_trips = 0
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params or {})
+
+    def count_round_trip(self):
+        with self.lock:
+            self.round_trips += 1
+        metrics.note_request()
+        self.server.wait()
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client.count_round_trip()
+        server = self.client.server
+        func = server.functions.get(self.name)
+        if func is None:
+            raise FakeAPIError('PGRST202', f'Could not find the function public.{self.name}')
+        with server.lock:
+            response = FakeResponse(func(server, self.params))
+        server.publish_changes()
+        return response
+
+
+class FakeQuery:
+    """The slice of the postgrest-py request builder that MobileDatabase uses"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.server = client.server
+        self.table_name = table
+        self.method = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.count = None
+        self.head = False
+        self.returning = 'representation'
+        self.on_conflict = ''
+        self.ignore_duplicates = False
+        self.filters = []
+        self.negate_next = False
+        self.orders = []
+        self.limit_count = None
+
+    # ---------------- Verbs ----------------
+
+    def select(self, *columns, count=None, head=False):
+        self.method = 'select'
+        self.columns = ','.join(columns) or '*'
+        self.count = count
+        self.head = head
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False, default_to_null=True):
+        self.method = 'upsert' if upsert else 'insert'
+        self.payload = json
+        self.count = count
+        self.returning = returning
+        return self
+
+    def upsert(self, json, *, count=None, returning='representation', ignore_duplicates=False,
+               on_conflict='', default_to_null=True):
+        self.method = 'upsert'
+        self.payload = json
+        self.count = count
+        self.returning = returning
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.method = 'update'
+        self.payload = json
+        self.count = count
+        self.returning = returning
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.method = 'delete'
+        self.count = count
+        self.returning = returning
+        return self
+
+    # ---------------- Filters / modifiers ----------------
+
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def filter_by(self, column, op, value):
+        if self.negate_next:
+            op, self.negate_next = 'not.' + op, False
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self.filter_by(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self.filter_by(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self.filter_by(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self.filter_by(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self.filter_by(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self.filter_by(column, 'lte', value)
+
+    def in_(self, column, values):
+        return self.filter_by(column, 'in', list(values))
+
+    def is_(self, column, value):
+        return self.filter_by(column, 'is', value)
+
+    def or_(self, filters, reference_table=None):
+        self.filters.append(('', 'or', parse_logic(filters)))
+        return self
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self.limit_count = size
+        return self
+
+    # ---------------- Execution ----------------
+
+    def execute(self):
+        self.client.count_round_trip()
+        with self.server.lock:
+            response = getattr(self, 'run_' + self.method)()
+        self.server.publish_changes()
+        with self.client.lock:
+            self.client.queries.append({'table': self.table_name, 'method': self.method,
+                                        'columns': self.columns, 'head': self.head,
+                                        'count': self.count, 'limit': self.limit_count,
+                                        'data': copy.deepcopy(response.data)})
+        return response
+
+    def matching(self):
+        rows = self.server.tables.get(self.table_name, [])
+        for column, _, _ in self.filters:
+            if column:
+                self.server.check_column(self.table_name, column)
+        return [row for row in rows if all(check(row, *f) for f in self.filters)]
+
+    def run_select(self):
+        rows = self.matching()
+        total = len(rows)
+        for column, desc, nullsfirst in reversed(self.orders):
+            self.server.check_column(self.table_name, column)
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            # Postgres puts NULLs last ascending, first descending; postgrest-py only
+            # sends .nullsfirst, so nullsfirst=False leaves the default alone
+            present.sort(key=lambda r: r[column], reverse=desc)
+            first = desc or bool(nullsfirst)
+            rows = missing + present if first else present + missing
+        if self.limit_count is not None:
+            rows = rows[:self.limit_count]
+        if self.head:
+            return self.empty_body()
+        data = [self.project(row) for row in rows]
+        return FakeResponse(data, total if self.count else None)
+
+    def run_insert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        stored = [self.server.store(self.table_name, dict(row)) for row in payload]
+        return self.written(stored)
+
+    def run_upsert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = [k.strip() for k in self.on_conflict.split(',') if k.strip()] or ['id']
+        stored = []
+        for row in payload:
+            existing = next((r for r in self.server.tables.get(self.table_name, [])
+                             if all(r.get(k) == row.get(k) for k in keys)), None)
+            if existing is None:
+                stored.append(self.server.store(self.table_name, dict(row)))
+            elif not self.ignore_duplicates:
+                existing.update(row)
+                self.server.changed(self.table_name, [existing])
+                stored.append(existing)
+        return self.written(stored)
+
+    def run_update(self):
+        rows = self.matching()
+        self.server.columns.setdefault(self.table_name, set()).update(self.payload)
+        for row in rows:
+            row.update(self.payload)
+        self.server.changed(self.table_name, rows)
+        return self.written(rows)
+
+    def run_delete(self):
+        rows = self.matching()
+        table = self.server.tables.get(self.table_name, [])
+        self.server.tables[self.table_name] = [r for r in table if r not in rows]
+        self.server.changed(self.table_name, rows)
+        return self.written(rows)
+
+    def written(self, rows):
+        if self.returning == 'minimal':
+            return self.empty_body()
+        return FakeResponse([copy.deepcopy(r) for r in rows], len(rows) if self.count else None)
+
+    @staticmethod
+    def empty_body():
+        # postgrest-py 0.17 can't parse an empty body (HEAD, returning='minimal') and answers
+        # data=[] with count=0 whatever Content-Range said
+        return FakeResponse([], 0)
+
+    def project(self, row):
+        items = split_top(self.columns)
+        if not items or items == ['*']:
+            return copy.deepcopy(row)
+        out = {}
+        for item in items:
+            if item == '*':
+                out.update(copy.deepcopy(row))
+            elif '(' in item:
+                name, inner = item.split('(', 1)
+                out[name.strip()] = self.embed(row, name.strip(), inner[:-1])
+            else:
+                self.server.check_column(self.table_name, item)
+                out[item] = copy.deepcopy(row.get(item))
+        return out
+
+    def embed(self, row, table, columns):
+        """offices(name) on queues -> the office row (to-one); feedback(id) -> list (to-many)"""
+        sub = FakeQuery(self.client, table).select(columns)
+        fk = singular(table) + '_id'
+        if fk in row:
+            target = next((r for r in self.server.tables.get(table, []) if r.get('id') == row[fk]), None)
+            return sub.project(target) if target else None
+        back = singular(self.table_name) + '_id'
+        return [sub.project(r) for r in self.server.tables.get(table, []) if r.get(back) == row.get('id')]
+
+
+# ---------------- Filter evaluation ----------------
+
+def singular(name):
+    return name[:-1] if name.endswith('s') else name
+
+
+def coerce(current, value):
+    """Filter text ('3', 'true') compared against typed row values"""
+    if isinstance(value, str) and isinstance(current, bool):
+        return value.lower() == 'true'
+    if isinstance(value, str) and isinstance(current, (int, float)):
+        try:
+            return type(current)(value)
+        except ValueError:
+            return value
+    return value
+
+
+def check(row, column, op, value):
+    if op.startswith('not.'):
+        # NOT of a comparison with NULL is still NULL
+        if op != 'not.is' and row.get(column) is None:
+            return False
+        return not check(row, column, op[4:], value)
+    if op == 'or':
+        return value(row)
+    current = row.get(column)
+    if op == 'is':
+        return current is None if value in (None, 'null') else current == coerce(current, value)
+    if op == 'in':
+        return current in [coerce(current, v) for v in value]
+    if current is None:
+        return False
+    value = coerce(current, value)
+    try:
+        if op == 'eq':
+            return current == value
+        if op == 'neq':
+            return current != value
+        if op == 'gt':
+            return current > value
+        if op == 'gte':
+            return current >= value
+        if op == 'lt':
+            return current < value
+        if op == 'lte':
+            return current <= value
+    except TypeError:
+        return False
+    raise FakeAPIError('PGRST100', f'unsupported operator {op}')
+
+
+def split_top(text):
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    tail = text[start:].strip()
+    if tail:
+        parts.append(tail)
+    return parts
+
+
+def unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def parse_logic(text, combine=any):
+    """PostgREST logic tree ('a.eq.1,and(b.in.(x,y),c.gt."t")') -> predicate(row)"""
+    predicates = []
+    for part in split_top(text):
+        if part.startswith(('and(', 'or(')):
+            name, inner = part.split('(', 1)
+            predicates.append(parse_logic(inner[:-1], all if name == 'and' else any))
+            continue
+        column, op, value = part.split('.', 2)
+        if op == 'in':
+            value = [unquote(v) for v in split_top(value.strip()[1:-1])]
+        else:
+            value = unquote(value)
+        predicates.append(lambda row, c=column, o=op, v=value: check(row, c, o, v))
+    return lambda row: combine(p(row) for p in predicates)
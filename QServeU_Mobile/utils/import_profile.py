@@ -0,0 +1,61 @@
+"""
+Import-time profile of the app (`python -X importtime` report, sorted).
+
+    QSERVEU_IMPORT_PROFILE=1 python main.py
+    python -m utils.import_profile --top 30 --sort self
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+def profile(module='main', cwd=None):
+    """Import `module` in a fresh interpreter with -X importtime; returns [(self_us, cumulative_us, name)]"""
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1')
+    env.pop('QSERVEU_IMPORT_PROFILE', None)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:       123 |        456 |   package.module" (two spaces of indent per nesting level)
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((int(self_us), int(cumulative_us), name.rstrip()[1:]))
+        except ValueError:
+            continue
+
+    if proc.returncode != 0 and not rows:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+    return rows
+
+
+def report(rows, top=25, sort='cumulative'):
+    key = 0 if sort == 'self' else 1
+    total = max((row[1] for row in rows if not row[2].startswith(' ')), default=0)
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[key], reverse=True)[:top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name.strip()}")
+    print(f"{len(rows)} modules imported, top-level total {total / 1000:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--sort', choices=('cumulative', 'self'), default='cumulative')
+    args = parser.parse_args(argv if argv is not None else [])
+    report(profile(args.module), top=args.top, sort=args.sort)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
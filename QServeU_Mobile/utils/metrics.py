@@ -0,0 +1,225 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger('qserveu')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds): constant memory however many samples arrive"""
+
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self, bounds=BOUNDS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, ms):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if ms <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th sample (the max for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return float(self.bounds[i]) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 2) if self.count else 0.0,
+            'min_ms': round(self.min or 0.0, 2),
+            'max_ms': round(self.max or 0.0, 2),
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['inf'], self.buckets)),
+        }
+
+
+class Span:
+    """Network work done while one traced call runs on its thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = Counter()
+
+
+class OperationStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = Counter()
+
+    def to_dict(self):
+        calls = self.latency.count or 1
+        return dict(self.latency.to_dict(),
+                    round_trips=self.round_trips,
+                    round_trips_per_call=round(self.round_trips / calls, 2),
+                    bytes_sent=self.bytes_sent,
+                    bytes_received=self.bytes_received,
+                    errors=dict(self.errors))
+
+
+class Metrics:
+    """
+    Process-wide registry. `trace(name)` times a call and collects what the HTTP transport
+    reports while it runs (round trips, bytes, error classes) on the same thread; nested
+    traces each see their own and their children's requests. Everything is kept in
+    bounded histograms and can be dumped as JSON or read by the debug overlay.
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+
+    # ---------------- Recording ----------------
+
+    def stack(self):
+        spans = getattr(self.local, 'spans', None)
+        if spans is None:
+            spans = self.local.spans = []
+        return spans
+
+    def trace(self, name):
+        """Decorator or context manager: `with metrics.trace('db.create_queue'): ...`"""
+        return _Trace(self, name)
+
+    def note_request(self, bytes_sent=0, bytes_received=0, error=None):
+        """Called by the transport for every HTTP attempt made on this thread"""
+        for span in self.stack():
+            span.round_trips += 1
+            span.bytes_sent += bytes_sent
+            span.bytes_received += bytes_received
+            if error:
+                span.errors[error] += 1
+
+    def note_received(self, size):
+        """Response body bytes, reported as the body is read"""
+        for span in self.stack():
+            span.bytes_received += size
+
+    def observe(self, name, seconds):
+        """Record a duration measured elsewhere (no network attribution)"""
+        self.record(Span(name), seconds)
+
+    def record(self, span, seconds, error=None):
+        with self.lock:
+            stats = self.operations.get(span.name)
+            if stats is None:
+                stats = self.operations[span.name] = OperationStats()
+            stats.latency.add(seconds * 1000)
+            stats.round_trips += span.round_trips
+            stats.bytes_sent += span.bytes_sent
+            stats.bytes_received += span.bytes_received
+            stats.errors.update(span.errors)
+            if error is not None:
+                stats.errors[type(error).__name__] += 1
+
+    # ---------------- Reading ----------------
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'uptime_s': round(time.time() - self.started, 1),
+                'operations': {name: stats.to_dict() for name, stats in sorted(self.operations.items())}
+            }
+
+    def summary_lines(self, limit=12):
+        """Slowest operations by p90, one short line each (debug overlay)"""
+        operations = self.snapshot()['operations']
+        ranked = sorted(operations.items(), key=lambda item: item[1]['p90_ms'], reverse=True)[:limit]
+        lines = []
+        for name, op in ranked:
+            errors = sum(op['errors'].values())
+            lines.append(f"{name}: n={op['count']} p50={op['p50_ms']:g} p90={op['p90_ms']:g}ms "
+                         f"rt={op['round_trips_per_call']:g} {op['bytes_received'] // 1024}KB"
+                         + (f" err={errors}" if errors else ''))
+        return lines
+
+    def dump(self, path):
+        """Write the snapshot as JSON (atomically); returns the path or None on failure"""
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp_path, path)
+            return path
+        except Exception as e:
+            logger.warning("Metrics dump error: %s", e)
+            return None
+
+    def reset(self):
+        with self.lock:
+            self.operations = {}
+            self.started = time.time()
+
+
+class _Trace:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.span = Span(self.name)
+        self.registry.stack().append(self.span)
+        self.t0 = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.t0
+        stack = self.registry.stack()
+        if stack and stack[-1] is self.span:
+            stack.pop()
+        self.registry.record(self.span, elapsed, exc)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.registry.trace(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def instrument(cls, prefix, exclude=()):
+    """Trace every public method defined on `cls` as '<prefix>.<method>'"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') or name in exclude or not callable(attr) \
+                or isinstance(attr, (type, staticmethod, classmethod)):
+            continue
+        setattr(cls, name, metrics.trace(f"{prefix}.{name}")(attr))
+    return cls
+
+
+metrics = Metrics()
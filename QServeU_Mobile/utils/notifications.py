@@ -1,4 +1,4 @@
-from plyer import notification
+from utils.eta import format_eta
 
 
 class NotificationManager:
@@ -9,6 +9,8 @@ class NotificationManager:
 
     def send_notification(self, title, message):
         try:
+            # plyer resolves the platform backend on import; only pay for it when we notify
+            from plyer import notification
             notification.notify(
                 title=title,
                 message=message,
@@ -60,9 +62,11 @@ class NotificationManager:
         if current_status == 'waiting':
             # Only notify if the number of people ahead CHANGED (and it's not a skip)
             if people_ahead != self.last_people_ahead and self.last_status == 'waiting':
+                eta_text = format_eta(queue_data.get('eta'))
                 self.send_notification(
                     "QServeU Status",
                     f"Queue: {queue_number} | {people_ahead} people ahead of you."
+                    + (f" Estimated wait {eta_text}." if eta_text else "")
                 )
 
             # Special alert if you are next
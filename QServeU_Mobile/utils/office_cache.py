@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger('qserveu')
+
+
+class OfficeCache:
+    """On-device copy of the `offices` table, revalidated in the background"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offices = []
+        self.version = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Warm the cache from disk (safe to call before there is any network)"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.offices = data.get('offices', [])
+                self.version = data.get('version')
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Office cache load error: %s", e)
+
+    def save(self):
+        with self.lock:
+            data = {'version': self.version, 'offices': self.offices}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning("Office cache save error: %s", e)
+
+    def is_warm(self):
+        return self.version is not None
+
+    def replace(self, offices, version):
+        with self.lock:
+            self.offices = offices
+            self.version = version
+        self.save()
+
+    def get_all(self):
+        with self.lock:
+            return [dict(office) for office in self.offices]
+
+    def get(self, office_id):
+        with self.lock:
+            for office in self.offices:
+                if office.get('id') == office_id:
+                    return dict(office)
+        return None
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class Outbox:
+    """
+    Durable SQLite queue of writes that could not reach Supabase.
+    Each entry has an idempotency key; adding the same key again replaces the
+    pending entry, so retries and repeated taps never produce duplicate writes.
+    """
+
+    # After this many server-side rejections an entry is dropped
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.connect() as conn:
+            conn.execute('''
+                create table if not exists outbox (
+                    key        text primary key,
+                    kind       text not null,
+                    payload    text not null,
+                    created_at real not null,
+                    attempts   integer not null default 0,
+                    last_error text
+                )
+            ''')
+
+    @contextmanager
+    def connect(self):
+        """Short-lived connection: commits on success, always closes (usable from any thread)"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, kind, key, payload):
+        with self.lock, self.connect() as conn:
+            conn.execute(
+                'insert or replace into outbox (key, kind, payload, created_at) values (?, ?, ?, ?)',
+                (key, kind, json.dumps(payload), time.time())
+            )
+        return key
+
+    def get(self, key):
+        with self.lock, self.connect() as conn:
+            row = conn.execute('select payload from outbox where key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending(self, kind=None, limit=100):
+        """Oldest first: [(key, kind, payload), ...]"""
+        query = 'select key, kind, payload from outbox'
+        params = ()
+        if kind:
+            query += ' where kind = ?'
+            params = (kind,)
+        query += ' order by created_at limit ?'
+        with self.lock, self.connect() as conn:
+            rows = conn.execute(query, params + (limit,)).fetchall()
+        return [(key, kind, json.loads(payload)) for key, kind, payload in rows]
+
+    def remove(self, keys):
+        if not keys:
+            return
+        with self.lock, self.connect() as conn:
+            conn.executemany('delete from outbox where key = ?', [(key,) for key in keys])
+
+    def mark_failed(self, keys, error):
+        """Count a rejection; entries past MAX_ATTEMPTS are dropped and returned"""
+        if not keys:
+            return []
+        with self.lock, self.connect() as conn:
+            conn.executemany(
+                'update outbox set attempts = attempts + 1, last_error = ? where key = ?',
+                [(str(error), key) for key in keys]
+            )
+            marks = ','.join('?' * len(keys))
+            dead = [row[0] for row in conn.execute(
+                f'select key from outbox where attempts >= ? and key in ({marks})',
+                (self.MAX_ATTEMPTS, *keys)
+            )]
+            conn.executemany('delete from outbox where key = ?', [(key,) for key in dead])
+        return dead
+
+    def count(self):
+        with self.lock, self.connect() as conn:
+            return conn.execute('select count(*) from outbox').fetchone()[0]
@@ -0,0 +1,92 @@
+from kivy.clock import Clock
+
+
+class PollScheduler:
+    """
+    One-shot timer for the queue status fallback poll.
+    The next delay follows the queue: fast when the student is next or being served,
+    slower the further back they are, slowest with no active queue. Unchanged answers
+    stretch the delay further (up to max_delay). Paused while the app is in the
+    background or the screen is hidden, and never more than one timer is armed.
+    """
+
+    # people_ahead -> seconds between polls; the last entry covers everyone further back
+    POSITION_DELAYS = ((0, 3), (2, 5), (5, 10), (10, 20))
+    FAR_DELAY = 30
+    # Up to this many people ahead the position cadence is never stretched
+    NEAR_AHEAD = 2
+    SERVING_DELAY = 5
+    IDLE_DELAY = 60
+    # Estimated minutes until the student's turn -> seconds between polls (see utils/eta.py)
+    ETA_DELAYS = ((2, 3), (5, 5), (15, 10), (30, 20))
+
+    def __init__(self, callback, max_delay=120, backoff=1.5):
+        self.callback = callback
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.event = None
+        self.paused = False
+        self.unchanged = 0
+        self.delay = None
+
+    # ---------------- PUBLIC ----------------
+
+    def base_delay(self, queue):
+        """Seconds until the next poll for this queue state, before the unchanged backoff"""
+        if not queue:
+            return self.IDLE_DELAY
+        if queue.get('status') == 'serving':
+            return self.SERVING_DELAY
+        ahead = queue.get('people_ahead') or 0
+        delay = next((d for limit, d in self.POSITION_DELAYS if ahead <= limit), self.FAR_DELAY)
+        eta = queue.get('eta')
+        if eta:
+            # A fast-moving line is close even with many people ahead; take the sooner of the two
+            # (the optimistic end of the estimate, so the turn is not missed)
+            minutes = eta['low_minutes']
+            delay = min(delay, next((d for limit, d in self.ETA_DELAYS if minutes <= limit), self.FAR_DELAY))
+        return delay
+
+    def schedule(self, queue, changed=False):
+        """Arm the timer from the latest answer (replaces any timer already armed)"""
+        self.unchanged = 0 if changed else self.unchanged + 1
+        base = self.base_delay(queue)
+        # Only stretch slow lanes: near the front or being served the cadence is never backed off
+        near = bool(queue) and (queue.get('status') == 'serving'
+                                or (queue.get('people_ahead') or 0) <= self.NEAR_AHEAD)
+        if not near and base > self.POSITION_DELAYS[0][1]:
+            base = min(base * self.backoff ** min(self.unchanged, 4), self.max_delay)
+        self.delay = base
+        self.arm()
+
+    def cancel(self):
+        if self.event:
+            self.event.cancel()
+            self.event = None
+
+    def pause(self):
+        self.paused = True
+        self.cancel()
+
+    def resume(self, poll_now=True):
+        """Leave the paused state; by default poll right away to catch up"""
+        self.paused = False
+        self.unchanged = 0
+        if poll_now:
+            self.cancel()
+            self.callback()
+        elif self.delay is not None:
+            self.arm()
+
+    # ---------------- INTERNALS ----------------
+
+    def arm(self):
+        self.cancel()
+        if self.paused:
+            return
+        self.event = Clock.schedule_once(self.fire, self.delay)
+
+    def fire(self, dt):
+        self.event = None
+        if not self.paused:
+            self.callback()
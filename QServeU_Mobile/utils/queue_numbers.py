@@ -0,0 +1,135 @@
+import heapq
+import time
+from datetime import datetime
+
+
+class QueueNumberAllocator:
+    """
+    Free-number pool for one office: always hands out the lowest number that is neither
+    active nor in its cooldown.
+    Released numbers sit in a time-ordered cooldown heap, move to a min-heap of free
+    numbers when their cooldown ends, and numbers above `high_water` have never been used,
+    so acquire/release are O(log n) instead of a scan from 1. A pool rebuilt from rows
+    doesn't list its gaps up front: they are found lazily, walking up from 1 past the numbers
+    the rows blocked, so from_rows is O(rows) rather than O(high_water).
+    There is no upper limit: past 999 the formatted number simply gets wider (A999 -> A1000).
+    Same rule as sql/005_queue_number_pool.sql: cooldown only matters while the office
+    still has active numbers; once the line is empty, numbering starts again from 1.
+    """
+
+    COOLDOWN = 600
+    WIDTH = 3
+
+    def __init__(self, prefix='Q', cooldown=COOLDOWN, width=WIDTH):
+        self.prefix = prefix
+        self.cooldown = cooldown
+        self.width = width
+        self.active = set()
+        self.free = []
+        self.cooling = []
+        self.high_water = 0
+        # Gap scan for pools rebuilt by from_rows(): numbers below `unscanned` are accounted
+        # for; from there up to high_water, every number not in `blocked` is free.
+        self.blocked = set()
+        self.unscanned = 1
+
+    @classmethod
+    def from_rows(cls, prefix, rows, now=None, cooldown=COOLDOWN, width=WIDTH):
+        """
+        Rebuild the pool from queue rows (status, queue_number, completed_at, cancelled_at),
+        e.g. one office's active and recently finished queues. Rows of other prefixes are ignored.
+        """
+        allocator = cls(prefix, cooldown=cooldown, width=width)
+        now = time.time() if now is None else now
+        cooling = {}
+        for row in rows:
+            num = allocator.parse(row.get('queue_number'))
+            if num is None:
+                continue
+            allocator.high_water = max(allocator.high_water, num)
+            if row.get('status') in ('waiting', 'serving'):
+                allocator.active.add(num)
+                continue
+            finished = parse_timestamp(row.get('completed_at') or row.get('cancelled_at'))
+            if finished is not None and finished + cooldown > now:
+                cooling[num] = max(cooling.get(num, 0), finished + cooldown)
+
+        if not allocator.active:
+            return allocator.reset()
+        allocator.cooling = [(available_at, num) for num, available_at in cooling.items()
+                             if num not in allocator.active]
+        heapq.heapify(allocator.cooling)
+        allocator.blocked = allocator.active | cooling.keys()
+        return allocator
+
+    # ---------------- PUBLIC ----------------
+
+    def acquire(self, now=None):
+        """Take the lowest available number (an int; see format())"""
+        if not self.active:
+            self.reset()
+        self.expire(time.time() if now is None else now)
+        gap = self.next_gap()
+        if self.free and (gap is None or self.free[0] < gap):
+            num = heapq.heappop(self.free)
+        elif gap is not None:
+            num = gap
+            self.unscanned = gap + 1
+        else:
+            self.high_water += 1
+            num = self.high_water
+            self.unscanned = num + 1
+        self.active.add(num)
+        return num
+
+    def release(self, num, now=None, cooldown=True):
+        """A queue finished (completed / cancelled): its number comes back after the cooldown"""
+        if num not in self.active:
+            return
+        self.active.discard(num)
+        if cooldown and self.cooldown > 0:
+            now = time.time() if now is None else now
+            heapq.heappush(self.cooling, (now + self.cooldown, num))
+        else:
+            heapq.heappush(self.free, num)
+
+    def format(self, num):
+        return f"{self.prefix}{num:0{self.width}d}"
+
+    def parse(self, queue_number):
+        """'R007' -> 7 for prefix 'R'; None if it doesn't belong to this prefix"""
+        if not isinstance(queue_number, str) or not queue_number.startswith(self.prefix):
+            return None
+        digits = queue_number[len(self.prefix):]
+        return int(digits) if digits.isdigit() else None
+
+    # ---------------- INTERNALS ----------------
+
+    def expire(self, now):
+        while self.cooling and self.cooling[0][0] <= now:
+            _, num = heapq.heappop(self.cooling)
+            heapq.heappush(self.free, num)
+
+    def next_gap(self):
+        """Lowest never-handed-out number below high_water (from_rows gaps), or None"""
+        while self.unscanned <= self.high_water and self.unscanned in self.blocked:
+            self.unscanned += 1
+        return self.unscanned if self.unscanned <= self.high_water else None
+
+    def reset(self):
+        self.free = []
+        self.cooling = []
+        self.high_water = 0
+        self.blocked = set()
+        self.unscanned = 1
+        return self
+
+
+def parse_timestamp(value):
+    """ISO timestamp from PostgREST -> epoch seconds (None if missing / unparseable)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+
+from kivy.clock import Clock
+
+logger = logging.getLogger('qserveu')
+
+
+class LocalTransport:
+    """
+    In-process change feed: utils/fake_supabase.FakeServer(transport=...) publishes every
+    row its clients write, so QueueFeed can be exercised without a Supabase project.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.on_status = None
+
+    def start(self, on_status):
+        self.on_status = on_status
+        on_status(True)
+
+    def stop(self):
+        with self.lock:
+            self.subscriptions.clear()
+        if self.on_status:
+            self.on_status(False)
+
+    def subscribe(self, table, column, value, callback):
+        key = object()
+        with self.lock:
+            self.subscriptions[key] = (table, column, value, callback)
+        return key
+
+    def unsubscribe(self, key):
+        with self.lock:
+            self.subscriptions.pop(key, None)
+
+    def publish(self, table, record):
+        """Push a row change, as the database would after an INSERT or UPDATE"""
+        with self.lock:
+            targets = list(self.subscriptions.values())
+        for sub_table, column, value, callback in targets:
+            if sub_table == table and record.get(column) == value:
+                callback(record)
+
+
+class SupabaseRealtimeTransport:
+    """Supabase Realtime (postgres_changes) on a private asyncio loop thread"""
+
+    def __init__(self, url, key, max_backoff=60):
+        base = url.rstrip('/').replace('https://', 'wss://').replace('http://', 'ws://')
+        self.realtime_url = f"{base}/realtime/v1"
+        self.key = key
+        self.max_backoff = max_backoff
+        self.loop = None
+        self.runner = None
+        self.client = None
+        self.subscriptions = {}
+        self.channels = {}
+        self.stopped = False
+        self.on_status = None
+
+    def start(self, on_status):
+        self.on_status = on_status
+        self.stopped = False
+        # One loop thread for the transport's lifetime; a restart after stop() reuses it
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name='qserveu-realtime', daemon=True).start()
+        # A connection loop still winding down from stop() sees stopped=False and reconnects
+        if self.runner is None or self.runner.done():
+            self.runner = asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    def stop(self):
+        self.stopped = True
+        self.subscriptions.clear()
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop)
+
+    def subscribe(self, table, column, value, callback):
+        key = object()
+        self.subscriptions[key] = (table, column, value, callback)
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._join(key), self.loop)
+        return key
+
+    def unsubscribe(self, key):
+        self.subscriptions.pop(key, None)
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._leave(key), self.loop)
+
+    # ---------------- INTERNALS (loop thread) ----------------
+
+    async def _run(self):
+        from realtime import AsyncRealtimeClient
+
+        delay = 1
+        while not self.stopped:
+            try:
+                self.client = AsyncRealtimeClient(self.realtime_url, self.key)
+                await self.client.connect()
+                self.channels = {}
+                for key in list(self.subscriptions):
+                    await self._join(key)
+                self.on_status(True)
+                delay = 1
+                await self.client.listen()
+            except Exception as e:
+                logger.warning("Realtime error: %s", e)
+
+            self.client = None
+            if self.stopped:
+                break
+            self.on_status(False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    async def _join(self, key):
+        if self.client is None or key not in self.subscriptions or key in self.channels:
+            return
+        table, column, value, callback = self.subscriptions[key]
+        channel = self.client.channel(f"qserveu-{table}-{column}-{value}")
+        channel.on_postgres_changes(
+            '*',
+            schema='public',
+            table=table,
+            filter=f"{column}=eq.{value}",
+            callback=lambda payload: self._dispatch(payload, callback)
+        )
+        await channel.subscribe()
+        self.channels[key] = channel
+
+    async def _leave(self, key):
+        channel = self.channels.pop(key, None)
+        if channel is not None:
+            try:
+                await channel.unsubscribe()
+            except Exception as e:
+                logger.warning("Realtime unsubscribe error: %s", e)
+
+    async def _close(self):
+        for key in list(self.channels):
+            await self._leave(key)
+        if self.client is not None:
+            try:
+                await self.client.close()
+            except Exception as e:
+                logger.warning("Realtime close error: %s", e)
+        if self.on_status:
+            self.on_status(False)
+
+    @staticmethod
+    def _dispatch(payload, callback):
+        data = payload.get('data', payload) if isinstance(payload, dict) else {}
+        record = data.get('record') or data.get('new') or data.get('old_record')
+        if record:
+            callback(record)
+
+
+def create_transport():
+    """
+    Pick the change-feed transport.
+    QSERVEU_REALTIME=off disables push (polling only).
+    """
+    mode = os.getenv('QSERVEU_REALTIME', 'supabase').lower()
+    if mode == 'off':
+        return None
+
+    url = os.getenv('SUPABASE_URL')
+    key = os.getenv('SUPABASE_KEY')
+    if not url or not key:
+        return None
+    return SupabaseRealtimeTransport(url, key)
+
+
+class QueueFeed:
+    """
+    Watches the student's own `queues` rows, plus their office's summary row while waiting
+    (office_queue_state, sql/006_office_line_feed.sql: counts only, no other students' rows),
+    and calls back on the Kivy main thread only when a row actually changed: on_change(row)
+    for the student's rows, on_line(previous, summary) for the office summary (on_change
+    when no on_line is given). A line movement reaches every phone at the office at once,
+    so those are coalesced and delivered after a random LINE_DELAY to spread the refreshes
+    the ones advance_position can't resolve still cause.
+    """
+
+    # Seconds (min, max) before a line change is delivered
+    LINE_DELAY = (0.5, 3.0)
+
+    def __init__(self, transport, on_change, on_status=None, line_delay=LINE_DELAY, on_line=None):
+        self.transport = transport
+        self.on_change = on_change
+        self.on_line = on_line
+        self.on_status = on_status
+        self.line_delay = line_delay
+        self.connected = False
+        self.started = False
+        self.rows = {}
+        self.student_id = None
+        self.student_key = None
+        self.office_id = None
+        self.office_key = None
+        self.line_event = None
+        self.line_record = None
+
+    def watch_student(self, student_id):
+        if not self.started:
+            self.transport.start(self._status_changed)
+            self.started = True
+        if student_id == self.student_id:
+            return
+        self.watch_office(None)
+        if self.student_key is not None:
+            self.transport.unsubscribe(self.student_key)
+        self.rows = {}
+        self.student_id = student_id
+        self.student_key = self.transport.subscribe('queues', 'student_id', student_id, self._row_changed)
+
+    def watch_office(self, office_id):
+        """Follow the office's line summary so position changes arrive too (None to stop)"""
+        if office_id == self.office_id:
+            return
+        if self.office_key is not None:
+            self.transport.unsubscribe(self.office_key)
+            self.office_key = None
+        self.cancel_line()
+        # A summary from an earlier visit is no baseline for the next one
+        self.rows.pop(('office', self.office_id), None)
+        self.office_id = office_id
+        if office_id is not None:
+            self.office_key = self.transport.subscribe('office_queue_state', 'office_id', str(office_id),
+                                                       self._line_changed)
+
+    def stop(self):
+        if self.started:
+            self.transport.stop()
+        self.cancel_line()
+        self.started = False
+        self.student_id = self.student_key = None
+        self.office_id = self.office_key = None
+        self.rows = {}
+
+    # ---------------- INTERNALS ----------------
+
+    def _status_changed(self, connected):
+        Clock.schedule_once(lambda dt: self._apply_status(connected))
+
+    def _apply_status(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if self.on_status:
+            self.on_status(connected)
+
+    def cancel_line(self):
+        if self.line_event is not None:
+            self.line_event.cancel()
+        self.line_event = None
+        self.line_record = None
+
+    def _row_changed(self, record):
+        Clock.schedule_once(lambda dt: self._apply_row(('queues', record.get('id')), record))
+
+    def _line_changed(self, record):
+        Clock.schedule_once(lambda dt: self._queue_line(record))
+
+    def _queue_line(self, record):
+        # Keep only the newest summary; one delivery per burst
+        self.line_record = record
+        if self.line_event is None:
+            self.line_event = Clock.schedule_once(self._deliver_line, random.uniform(*self.line_delay))
+
+    def _deliver_line(self, dt):
+        record = self.line_record
+        self.line_event = None
+        self.line_record = None
+        if record is None or str(record.get('office_id')) != str(self.office_id):
+            return
+        key = ('office', self.office_id)
+        if self.on_line is None:
+            self._apply_row(key, record)
+            return
+        previous = self.rows.get(key)
+        if previous == record:
+            return
+        self.rows[key] = record
+        self.on_line(previous, record)
+
+    def _apply_row(self, key, record):
+        if key[1] is not None and self.rows.get(key) == record:
+            return
+        self.rows[key] = record
+        self.on_change(record)
+
+
+def advance_position(queue, previous, summary):
+    """
+    The waiting `queue` after its office's line moved from summary `previous` to `summary`
+    (office_queue_state rows), or None when the summaries can't tell and the student's
+    rows have to be read again. A new serving_number is someone ahead being called;
+    newcomers join behind. A waiting count that drops further than the calls explain is a
+    cancellation that may be ahead or behind, so that is re-read.
+    """
+    if not queue or queue.get('status') != 'waiting' or previous is None:
+        return None
+    waiting = summary.get('waiting_count') or 0
+    left = (previous.get('waiting_count') or 0) - waiting
+    called = summary.get('serving_number') not in (None, previous.get('serving_number'))
+    if left > int(called):
+        return None
+    ahead = min((queue.get('people_ahead') or 0) - int(called), waiting - 1)
+    if ahead < 0:
+        return None
+    if ahead == queue.get('people_ahead'):
+        return queue
+    moved = dict(queue, people_ahead=ahead)
+    # The estimate was for the old position
+    moved.pop('eta', None)
+    return moved
@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers of the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Set by invalidate(): the answer may predate a write, so nobody gets it
+        self.stale = False
+
+
+class ResponseCache:
+    """
+    Short-lived cache of query results inside MobileDatabase.
+    Keys are tuples such as ('queues', student_id, 'dashboard'); each entry has its own TTL
+    and the least recently used entries are evicted past max_entries.
+    Concurrent misses on the same key share one network call (single-flight).
+    invalidate(prefix) drops every key starting with the prefix, including loads still in
+    flight: their answer may predate the write, so it is neither stored nor handed to anyone,
+    and the callers load again. Errors are passed to every waiter and never cached.
+    Every caller gets its own copy of a cached dict or list.
+    """
+
+    def __init__(self, max_entries=128, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # ---------------- PUBLIC ----------------
+
+    def get_or_load(self, key, loader, ttl):
+        while True:
+            flight, result = self.join(key)
+            if flight is None:
+                return result
+            leader = result
+            if leader:
+                self.load(key, flight, loader, ttl)
+            else:
+                flight.done.wait()
+            if flight.stale:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value if leader else copy.deepcopy(flight.value)
+
+    def invalidate(self, *prefix):
+        """Forget keys starting with `prefix` (everything when no prefix is given)"""
+        size = len(prefix)
+        with self.lock:
+            for key in [k for k in self.entries if k[:size] == prefix]:
+                del self.entries[key]
+            for key in [k for k in self.flights if k[:size] == prefix]:
+                self.flights.pop(key).stale = True
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits,
+                    'misses': self.misses, 'coalesced': self.coalesced}
+
+    # ---------------- INTERNALS ----------------
+
+    def join(self, key):
+        """(None, cached value) on a hit, else (flight, True if this caller runs the load)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return None, copy.deepcopy(value)
+                del self.entries[key]
+
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self.flights[key] = _Flight()
+            self.misses += 1
+            return flight, True
+
+    def load(self, key, flight, loader, ttl):
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self.lock:
+                # Still ours only if nobody invalidated the key while we were loading
+                if not flight.stale:
+                    del self.flights[key]
+                    if flight.error is None and ttl > 0:
+                        self.entries[key] = (self.clock() + ttl, copy.deepcopy(flight.value))
+                        self.entries.move_to_end(key)
+                        while len(self.entries) > self.max_entries:
+                            self.entries.popitem(last=False)
+            flight.done.set()
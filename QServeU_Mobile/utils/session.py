@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('qserveu')
+
+
+class SessionStore:
+    """
+    Saved login on the device, so a relaunch can skip the login lookup and bcrypt.
+    Holds the student profile (never the password hash) and an expiry. It is a convenience,
+    not a credential: anyone who can write the app's files can edit it, so the server must
+    not trust a student id just because the app sends it.
+    The file lives in the app's private user_data_dir and is created owner-only.
+    """
+
+    # Sessions slide: every resume pushes the expiry out again
+    LIFETIME = 14 * 24 * 3600
+
+    PROFILE_FIELDS = ('id', 'student_id', 'full_name', 'email', 'course', 'year_level')
+
+    def __init__(self, directory, lifetime=LIFETIME):
+        self.path = os.path.join(directory, 'session.json')
+        # Signing key written by earlier versions, removed on the next save
+        self.legacy_key_path = os.path.join(directory, 'session.key')
+        self.lifetime = lifetime
+        self.data = None
+
+    # ---------------- PUBLIC ----------------
+
+    def load(self):
+        """Return the saved session dict, or None if missing / expired / malformed"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Session load error: %s", e)
+            self.clear()
+            return None
+
+        body = stored.get('body') if isinstance(stored, dict) else None
+        student = body.get('student') if isinstance(body, dict) else None
+        if not isinstance(student, dict) or student.get('id') is None:
+            logger.warning("Session file malformed, ignoring saved login")
+            self.clear()
+            return None
+        if body.get('expires_at', 0) < time.time():
+            self.clear()
+            return None
+
+        self.data = body
+        return body
+
+    def save(self, student, **extra):
+        """Start (or refresh) the session for `student`; extra keys (selected_office, ...) are kept"""
+        body = dict(self.data or {})
+        if not self.data or self.data.get('student', {}).get('id') != student.get('id'):
+            body = {}
+        body.pop('token', None)
+        body.update(extra)
+        body['student'] = {k: student.get(k) for k in self.PROFILE_FIELDS}
+        body['expires_at'] = time.time() + self.lifetime
+        self.write(body)
+
+    def update(self, **extra):
+        """Change extra keys of the current session (no-op when logged out)"""
+        if self.data:
+            self.write(dict(self.data, **extra))
+
+    def clear(self):
+        self.data = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Session clear error: %s", e)
+
+    # ---------------- INTERNALS ----------------
+
+    def write(self, body):
+        self.data = body
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'body': body}, f)
+            os.replace(tmp_path, self.path)
+            if os.path.exists(self.legacy_key_path):
+                os.remove(self.legacy_key_path)
+        except Exception as e:
+            logger.warning("Session save error: %s", e)
@@ -0,0 +1,298 @@
+import array
+import logging
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+
+logger = logging.getLogger('qserveu')
+
+
+# All known providers, filled by @register_provider
+PROVIDERS = []
+
+
+def register_provider(cls):
+    PROVIDERS.append(cls)
+    return cls
+
+
+class SSIDProvider:
+    """
+    One way of reading the current WiFi SSID.
+    `cost` is the relative price of a single probe (0 = free, 20+ = spawns a process);
+    the cheapest available provider for the platform wins.
+    """
+    name = 'base'
+    cost = 100
+    platforms = ()
+
+    def available(self):
+        return False
+
+    def get_ssid(self):
+        return None
+
+
+@register_provider
+class FakeProvider(SSIDProvider):
+    """Fixed SSID from QSERVEU_FAKE_SSID (tests, headless kiosks)"""
+    name = 'fake'
+    cost = 0
+    platforms = ('android', 'win', 'linux', 'macosx', 'ios', 'unknown')
+
+    def __init__(self, ssid=None):
+        self.ssid = ssid if ssid is not None else os.getenv('QSERVEU_FAKE_SSID')
+
+    def available(self):
+        return self.ssid is not None
+
+    def get_ssid(self):
+        return self.ssid or None
+
+
+@register_provider
+class AndroidProvider(SSIDProvider):
+    name = 'android-wifimanager'
+    cost = 1
+    platforms = ('android',)
+
+    def __init__(self):
+        self.wifi_manager = None
+
+    def available(self):
+        try:
+            from jnius import autoclass
+            Context = autoclass('android.content.Context')
+            activity = autoclass('org.kivy.android.PythonActivity').mActivity
+            self.wifi_manager = activity.getSystemService(Context.WIFI_SERVICE)
+            return self.wifi_manager is not None
+        except Exception as e:
+            logger.warning("Android WiFi error: %s", e)
+            return False
+
+    def get_ssid(self):
+        try:
+            if not self.wifi_manager.isWifiEnabled():
+                return None
+
+            info = self.wifi_manager.getConnectionInfo()
+            ssid = info.getSSID()
+            if ssid and ssid != "<unknown ssid>":
+                return ssid.strip('"')
+        except Exception as e:
+            logger.warning("Android WiFi error: %s", e)
+        return None
+
+
+@register_provider
+class LinuxWirelessProvider(SSIDProvider):
+    """Wireless-extensions ioctl on the interfaces listed in /proc/net/wireless (no process spawn)"""
+    name = 'linux-wext'
+    cost = 2
+    platforms = ('linux',)
+
+    PROC_PATH = '/proc/net/wireless'
+    SIOCGIWESSID = 0x8B1B
+    ESSID_MAX = 32
+
+    def interfaces(self):
+        try:
+            with open(self.PROC_PATH) as f:
+                lines = f.readlines()[2:]
+        except OSError:
+            return []
+        return [line.split(':', 1)[0].strip() for line in lines if ':' in line]
+
+    def available(self):
+        # The file alone proves little: nl80211-only drivers list their interfaces there but
+        # answer no WEXT ioctl, so probe for real and let iw / NetworkManager take over if it fails
+        return any(self.read_essid(ifname) is not None for ifname in self.interfaces())
+
+    def get_ssid(self):
+        for ifname in self.interfaces():
+            ssid = self.read_essid(ifname)
+            if ssid:
+                return ssid
+        return None
+
+    def read_essid(self, ifname):
+        """SSID of `ifname`, '' when not associated, None when the ioctl isn't supported"""
+        try:
+            import fcntl
+            buf = array.array('B', bytes(self.ESSID_MAX + 1))
+            addr, _ = buf.buffer_info()
+            # struct iwreq: char ifr_name[16]; struct iw_point { void *pointer; __u16 length; __u16 flags; }
+            request = struct.pack('16sPHH', ifname.encode()[:15], addr, len(buf), 0)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                result = fcntl.ioctl(sock.fileno(), self.SIOCGIWESSID, request)
+            length = struct.unpack('16sPHH', result)[2]
+            return buf.tobytes()[:length].rstrip(b'\0').decode(errors='replace')
+        except Exception:
+            # Interface is gone / driver without WEXT
+            return None
+
+
+@register_provider
+class NetworkManagerProvider(SSIDProvider):
+    """NetworkManager over the system D-Bus (needs dbus-python)"""
+    name = 'networkmanager-dbus'
+    cost = 3
+    platforms = ('linux',)
+
+    NM = 'org.freedesktop.NetworkManager'
+    NM_PATH = '/org/freedesktop/NetworkManager'
+    PROPS = 'org.freedesktop.DBus.Properties'
+    DEVICE_TYPE_WIFI = 2
+
+    def __init__(self):
+        self.bus = None
+
+    def available(self):
+        try:
+            import dbus
+            self.bus = dbus.SystemBus()
+            self.bus.get_object(self.NM, self.NM_PATH)
+            return True
+        except Exception:
+            return False
+
+    def get_ssid(self):
+        try:
+            nm = self.bus.get_object(self.NM, self.NM_PATH)
+            for device_path in nm.GetDevices(dbus_interface=self.NM):
+                device = self.bus.get_object(self.NM, device_path)
+                props = device.GetAll(self.NM + '.Device', dbus_interface=self.PROPS)
+                if props.get('DeviceType') != self.DEVICE_TYPE_WIFI:
+                    continue
+                ap_path = device.Get(self.NM + '.Device.Wireless', 'ActiveAccessPoint', dbus_interface=self.PROPS)
+                if ap_path == '/':
+                    continue
+                ap = self.bus.get_object(self.NM, ap_path)
+                ssid = bytes(ap.Get(self.NM + '.AccessPoint', 'Ssid', dbus_interface=self.PROPS))
+                if ssid:
+                    return ssid.decode(errors='replace')
+        except Exception as e:
+            logger.warning("NetworkManager WiFi error: %s", e)
+        return None
+
+
+@register_provider
+class MacCoreWLANProvider(SSIDProvider):
+    """CoreWLAN through PyObjC (no process spawn)"""
+    name = 'macos-corewlan'
+    cost = 2
+    platforms = ('macosx',)
+
+    def __init__(self):
+        self.client = None
+
+    def available(self):
+        try:
+            import CoreWLAN
+            self.client = CoreWLAN.CWWiFiClient.sharedWiFiClient()
+            return self.client is not None
+        except Exception:
+            return False
+
+    def get_ssid(self):
+        try:
+            interface = self.client.interface()
+            return interface.ssid() if interface else None
+        except Exception as e:
+            logger.warning("macOS WiFi error: %s", e)
+            return None
+
+
+class CommandProvider(SSIDProvider):
+    """Base for providers that have to spawn a tool for every probe"""
+    command = ()
+    pattern = None
+
+    def available(self):
+        return shutil.which(self.command[0]) is not None
+
+    def get_ssid(self):
+        try:
+            output = subprocess.check_output(
+                list(self.command),
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=5,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+            )
+        except Exception as e:
+            logger.warning("%s WiFi error: %s", self.name, e)
+            return None
+        match = re.search(self.pattern, output, re.MULTILINE)
+        if match:
+            ssid = match.group(1).strip()
+            if ssid and ssid.lower() != "name":
+                return ssid
+        return None
+
+
+@register_provider
+class WindowsNetshProvider(CommandProvider):
+    name = 'windows-netsh'
+    cost = 20
+    platforms = ('win',)
+    command = ('netsh', 'wlan', 'show', 'interfaces')
+    pattern = r"^\s*SSID\s*:\s(.+)$"
+
+
+@register_provider
+class LinuxIwProvider(CommandProvider):
+    name = 'linux-iw'
+    cost = 20
+    platforms = ('linux',)
+    command = ('iw', 'dev')
+    pattern = r"^\s*ssid\s+(.+)$"
+
+
+@register_provider
+class MacNetworksetupProvider(CommandProvider):
+    name = 'macos-networksetup'
+    cost = 25
+    platforms = ('macosx',)
+    command = ('networksetup', '-getairportnetwork')
+    pattern = r"Current Wi-Fi Network:\s*(.+)$"
+
+    def available(self):
+        # The Wi-Fi device isn't always en0 (Macs with built-in Ethernet, USB adapters)
+        if not super().available():
+            return False
+        device = self.wifi_device()
+        if device is None:
+            return False
+        self.command = type(self).command + (device,)
+        return True
+
+    def wifi_device(self):
+        try:
+            output = subprocess.check_output(
+                ['networksetup', '-listallhardwareports'],
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=5
+            )
+        except Exception as e:
+            logger.warning("%s WiFi error: %s", self.name, e)
+            return None
+        match = re.search(r"^Hardware Port:\s*(?:Wi-Fi|AirPort)\s*\nDevice:\s*(\S+)", output, re.MULTILINE)
+        return match.group(1) if match else None
+
+
+def select_provider(platform):
+    """Cheapest provider that works on this platform, or None"""
+    candidates = sorted((cls for cls in PROVIDERS if platform in cls.platforms), key=lambda cls: cls.cost)
+    for cls in candidates:
+        provider = cls()
+        try:
+            if provider.available():
+                return provider
+        except Exception as e:
+            logger.warning("SSID provider %s failed: %s", cls.name, e)
+    return None
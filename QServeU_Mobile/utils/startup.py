@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from kivy.clock import Clock
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('qserveu')
+
+
+class StartupPipeline:
+    """
+    Warm-up work that runs behind the splash screen.
+    Phases run in parallel on their own threads (a phase can wait for others with `after`),
+    each one is timed, and `on_done(pipeline)` fires on the main thread when all are finished.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.order = []
+        self.timings = {}
+        self.errors = {}
+        self.results = {}
+        self.lock = threading.Lock()
+        self.started = None
+        self.on_done = None
+        self.done_events = {}
+        self.remaining = 0
+
+    def add(self, name, func, after=()):
+        self.phases[name] = (func, tuple(after))
+        self.order.append(name)
+
+    def run_inline(self, name, func):
+        """Time a phase that has to run on the main thread before anything is built"""
+        t0 = time.perf_counter()
+        try:
+            self.results[name] = func()
+        except Exception as e:
+            self.errors[name] = e
+            logger.warning("Startup phase '%s' failed: %s", name, e)
+        self.timings[name] = time.perf_counter() - t0
+
+    def run(self, on_done):
+        self.started = time.perf_counter()
+        self.on_done = on_done
+        self.done_events = {name: threading.Event() for name in self.order}
+        self.remaining = len(self.order)
+
+        if not self.order:
+            Clock.schedule_once(lambda dt: self._finish())
+            return
+
+        for name in self.order:
+            threading.Thread(target=self._run_phase, args=(name,), name=f'qserveu-startup-{name}', daemon=True).start()
+
+    # ---------------- INTERNALS ----------------
+
+    def _run_phase(self, name):
+        func, after = self.phases[name]
+        for dependency in after:
+            self.done_events[dependency].wait()
+
+        t0 = time.perf_counter()
+        try:
+            self.results[name] = func()
+        except Exception as e:
+            self.errors[name] = e
+            logger.warning("Startup phase '%s' failed: %s", name, e)
+        self.timings[name] = time.perf_counter() - t0
+        self.done_events[name].set()
+
+        with self.lock:
+            self.remaining -= 1
+            last = self.remaining == 0
+        if last:
+            Clock.schedule_once(lambda dt: self._finish())
+
+    def _finish(self):
+        self.timings['total'] = time.perf_counter() - self.started
+        # Into the metrics dump with everything else, and one summary line in the log
+        for name, seconds in self.timings.items():
+            metrics.observe(f'startup.{name}', seconds)
+        logger.info("Startup: %s", " | ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.timings.items()))
+        self.on_done(self)
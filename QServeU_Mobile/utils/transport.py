@@ -0,0 +1,125 @@
+import random
+import time
+
+import httpx
+
+from utils.metrics import metrics
+
+
+# Seconds. A stuck request fails fast instead of hanging until the OS gives up.
+TIMEOUT = httpx.Timeout(connect=5.0, read=10.0, write=10.0, pool=5.0)
+
+# One warm TLS connection is enough for polling; a few more cover bursts (startup, outbox flush)
+LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=4, keepalive_expiry=120)
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUS = {502, 503, 504}
+
+
+class RetryTransport(httpx.BaseTransport):
+    """
+    Retries idempotent requests (reads) on connection errors, timeouts and 502/503/504,
+    with capped exponential backoff and full jitter. Writes are never replayed here;
+    the offline outbox owns that.
+    """
+
+    def __init__(self, transport, retries=2, backoff=0.25, max_backoff=2.0):
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def handle_request(self, request):
+        retryable = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                if not retryable or attempt >= self.retries or response.status_code not in RETRY_STATUS:
+                    return response
+                response.close()
+
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class CountingStream(httpx.SyncByteStream):
+    """Response body that reports its size to the metrics registry as it is read"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __iter__(self):
+        for chunk in self.stream:
+            metrics.note_received(len(chunk))
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Counts every HTTP attempt (round trip, request bytes, error class) for utils.metrics"""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def handle_request(self, request):
+        try:
+            sent = len(request.content)
+        except httpx.RequestNotRead:
+            sent = 0  # streamed upload; MobileDatabase never sends one
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TransportError as e:
+            metrics.note_request(sent, error=type(e).__name__)
+            raise
+        error = f"HTTP {response.status_code}" if response.status_code >= 400 else None
+        metrics.note_request(sent, error=error)
+        response.stream = CountingStream(response.stream)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client(base_url='', headers=None, timeout=TIMEOUT, limits=LIMITS, retries=2):
+    """Shared keep-alive client: HTTP/2 when h2 is installed, pooled connections, timeouts, read retries"""
+    http2 = http2_available()
+    # Metering sits under the retries so every attempt is counted as a round trip
+    transport = RetryTransport(MeteredTransport(httpx.HTTPTransport(http2=http2, limits=limits)), retries=retries)
+    return httpx.Client(
+        base_url=base_url,
+        headers=headers,
+        timeout=timeout,
+        transport=transport,
+        follow_redirects=True
+    )
+
+
+def install(client):
+    """
+    Swap the PostgREST session of a supabase client for the pooled transport,
+    keeping its base URL and auth headers. Returns the new httpx.Client.
+    """
+    postgrest = client.postgrest
+    old = postgrest.session
+    session = create_http_client(base_url=str(old.base_url), headers=dict(old.headers))
+    postgrest.session = session
+    old.close()
+    return session
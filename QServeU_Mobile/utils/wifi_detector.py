@@ -1,14 +1,36 @@
 from kivy.utils import platform
-import subprocess
-import re
+from kivy.clock import Clock
+import logging
+import threading
+import time
+
+from utils.ssid_providers import select_provider
+
+logger = logging.getLogger('qserveu')
 
 
 class WiFiDetector:
-    def __init__(self):
+    def __init__(self, ttl=5):
         self.platform = platform
         if self.platform == 'android':
             self.request_android_permissions()
 
+        # Background monitor state: the SSID is probed off the UI thread and cached
+        self.ttl = ttl
+        self.cached_ssid = None
+        self.cached_at = 0
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = None
+        self.monitor_thread = None
+        self.monitoring = False
+        self.paused = False
+        self.receiver = None
+
+        self.provider = None
+        self.provider_selected = False
+
     # ---------------- ANDROID PERMISSIONS ----------------
     def request_android_permissions(self):
         try:
@@ -25,56 +47,131 @@ class WiFiDetector:
         except Exception as e:
             print("Android permission error:", e)
 
-    # ---------------- WINDOWS WIFI ----------------
-    def get_windows_ssid(self):
+    # ---------------- SSID PROVIDER ----------------
+    def select_provider(self):
+        """Pick the cheapest working SSID provider once and keep it"""
+        if not self.provider_selected:
+            self.provider = select_provider(self.platform)
+            self.provider_selected = True
+            name = self.provider.name if self.provider else 'none'
+            logger.info("SSID provider: %s", name)
+        return self.provider
+
+    # ---------------- MAIN METHOD ----------------
+    def get_current_ssid(self):
+        provider = self.select_provider()
+        return provider.get_ssid() if provider else None
+
+    # ---------------- BACKGROUND MONITOR ----------------
+    # Runs only while someone is subscribed and the app is in the foreground:
+    # subscribe() starts it, the last unsubscribe() and pause() stop it.
+    def start_monitor(self):
+        """Probe the SSID on a daemon thread every `ttl` seconds (or on a network event)"""
+        if self.monitoring or self.paused:
+            return
+        self.monitoring = True
+        self.start_network_events()
+        # Each thread gets its own stop flag, so a quick stop/start never leaves two running
+        self.stop_event = threading.Event()
+        self.monitor_thread = threading.Thread(target=self.monitor_loop, args=(self.stop_event,),
+                                               name='qserveu-wifi', daemon=True)
+        self.monitor_thread.start()
+
+    def stop_monitor(self):
+        self.monitoring = False
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.stop_event = None
+        self.wake.set()
+        if self.receiver is not None:
+            try:
+                self.receiver.stop()
+            except Exception as e:
+                logger.warning("WiFi receiver error: %s", e)
+            self.receiver = None
+
+    def start_network_events(self):
+        # Android tells us when WiFi changes, so the TTL poll is only a safety net there
+        if self.platform != 'android':
+            return
         try:
-            output = subprocess.check_output(
-                ["netsh", "wlan", "show", "interfaces"],
-                stderr=subprocess.DEVNULL,
-                shell=True,
-                text=True
+            from android.broadcast import BroadcastReceiver
+            self.receiver = BroadcastReceiver(
+                lambda context, intent: self.refresh_now(),
+                actions=['android.net.wifi.STATE_CHANGE', 'android.net.conn.CONNECTIVITY_CHANGE']
             )
-            match = re.search(r"SSID\s*:\s(.+)", output)
-            if match:
-                ssid = match.group(1).strip()
-                if ssid.lower() != "name":
-                    return ssid
+            self.receiver.start()
         except Exception as e:
-            print("Windows WiFi error:", e)
-        return None
+            logger.warning("WiFi receiver error: %s", e)
+            self.receiver = None
 
-    # ---------------- ANDROID WIFI ----------------
-    def get_android_ssid(self):
-        try:
-            from jnius import autoclass
-            from kivy.android import PythonActivity
-            Context = autoclass('android.content.Context')
-            activity = PythonActivity.mActivity
-            wifi_manager = activity.getSystemService(Context.WIFI_SERVICE)
-
-            if not wifi_manager.isWifiEnabled():
-                return None
-
-            info = wifi_manager.getConnectionInfo()
-            ssid = info.getSSID()
-            if ssid and ssid != "<unknown ssid>":
-                return ssid.strip('"')
-        except Exception as e:
-            print("Android WiFi error:", e)
-        return None
+    def refresh_now(self):
+        """Wake the monitor for an immediate re-probe (safe from any thread)"""
+        self.wake.set()
 
-    # ---------------- MAIN METHOD ----------------
-    def get_current_ssid(self):
-        if self.platform == 'android':
-            return self.get_android_ssid()
-        elif self.platform == 'win':
-            return self.get_windows_ssid()
-        else:
-            return None
-
-    def get_connection_status(self, target_ssid):
-        current_ssid = self.get_current_ssid()
-        print(f"🔎 WiFi Check - Current: {current_ssid} | Target: {target_ssid}")
+    def pause(self):
+        """App went to the background: no probing until resume()"""
+        self.paused = True
+        self.stop_monitor()
+
+    def resume(self):
+        self.paused = False
+        with self.lock:
+            wanted = bool(self.subscribers)
+        if wanted:
+            self.start_monitor()
+
+    def monitor_loop(self, stop):
+        while not stop.is_set():
+            ssid = self.get_current_ssid()
+            if stop.is_set():
+                break
+            with self.lock:
+                changed = ssid != self.cached_ssid or not self.cached_at
+                self.cached_ssid = ssid
+                self.cached_at = time.monotonic()
+                subscribers = list(self.subscribers)
+            if changed:
+                logger.debug("WiFi changed - current: %s", ssid)
+                for callback in subscribers:
+                    Clock.schedule_once(lambda dt, cb=callback: cb(ssid))
+            self.wake.wait(self.ttl)
+            self.wake.clear()
+
+    def subscribe(self, callback):
+        """callback(ssid) runs on the main thread whenever the SSID changes"""
+        with self.lock:
+            if callback not in self.subscribers:
+                self.subscribers.append(callback)
+        self.start_monitor()
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+            idle = not self.subscribers
+        if idle:
+            self.stop_monitor()
+
+    def get_cached_ssid(self):
+        """
+        Last probed SSID without touching the OS; probes inline if the monitor isn't running
+        or hasn't finished its first probe yet
+        """
+        with self.lock:
+            probed = self.monitoring and self.cached_at
+        if not probed:
+            # Not stored: the monitor's own first probe still notifies the subscribers
+            return self.get_current_ssid()
+        with self.lock:
+            if time.monotonic() - self.cached_at > self.ttl * 2:
+                # Monitor fell behind (e.g. app was paused): ask for a fresh probe, serve what we have
+                self.wake.set()
+            return self.cached_ssid
+
+    def get_connection_status(self, target_ssid, current_ssid=None):
+        if current_ssid is None:
+            current_ssid = self.get_cached_ssid()
 
         if not current_ssid:
             return {'connected': False, 'message': "Not connected to WiFi"}